@@ -75,6 +75,232 @@ if ! exists( "g:localcomplete#AdditionalKeywordChars" )
     let g:localcomplete#AdditionalKeywordChars = ''
 endif
 
+if ! exists( "g:localcomplete#WantKeywordIndex" )
+    " Look up all-buffer matches in an index of the unique keywords of each
+    " buffer instead of searching through all lines for every completion.
+    " The index of a buffer is rebuilt after it changed.  Keywords are found
+    " once in the order of their first occurrence.
+    " Override buffer locally with b:LocalCompleteWantKeywordIndex
+    let g:localcomplete#WantKeywordIndex = 0
+endif
+
+if ! exists( "g:localcomplete#MatchMode" )
+    " Configure which keywords from localcomplete#localMatches and
+    " localcomplete#allBufferMatches match the keyword base:
+    " 1 - prefix: keywords that start with the keyword base
+    " 2 - substring: keywords that contain the keyword base anywhere, like
+    "     'getBufferRanges' for 'Ranges'.  Infercase is not applied.
+    " 3 - abbreviation: keywords whose segment initials are the keyword base
+    "     ignoring case, like 'get_buffer_ranges' or 'getBufferRanges' for
+    "     'gbr'.  Infercase is not applied.
+    " 4 - fuzzy: keywords that contain the characters of the keyword base in
+    "     order, like 'get_buffer_ranges' for 'gbfr'.  Matches are ranked by
+    "     consecutive characters and segment starts.  Infercase is not
+    "     applied.
+    "
+    " All modes except prefix always use the keyword index.  Local matches
+    " stay in the configured result order.
+    " Override buffer locally with b:LocalCompleteMatchMode
+    let g:localcomplete#MatchMode = 1
+endif
+
+if ! exists( "g:localcomplete#WantLocalRanking" )
+    " Rank prefix matches from localcomplete#localMatches instead of listing
+    " them in the result order.  Every occurrence of a match adds to its
+    " score, occurrences close to the cursor a lot more.  Every match is
+    " listed once.  Matches with equal scores stay in the result order.
+    " Override buffer locally with b:LocalCompleteWantLocalRanking
+    let g:localcomplete#WantLocalRanking = 0
+endif
+
+if ! exists( "g:localcomplete#ResultLimit" )
+    " The maximum count of ranked matches.  Only the best matches are kept.
+    " This applies to the fuzzy match mode, to ranked local matches and to
+    " local matches with visible lines first.  Dictionary searches stop
+    " reading the dictionary after this many different matches.  Set it to 0
+    " for no limit.
+    " Override buffer locally with b:LocalCompleteResultLimit
+    let g:localcomplete#ResultLimit = 0
+endif
+
+if ! exists( "g:localcomplete#WantIgnoreAccents" )
+    " When ignoring case, also ignore accents in keyword index lookups:
+    " 'uber' finds 'über'.  This only works with the keyword index.
+    " Override buffer locally with b:LocalCompleteWantIgnoreAccents
+    let g:localcomplete#WantIgnoreAccents = 0
+endif
+
+if ! exists( "g:localcomplete#WantLinePrefilter" )
+    " Skip blocks of lines in local searches that cannot contain the keyword
+    " base.  A summary of the bytes in every block of 64 lines is kept for
+    " each buffer.  After the buffer changed, only the changed blocks are
+    " summarized again.
+    " Override buffer locally with b:LocalCompleteWantLinePrefilter
+    let g:localcomplete#WantLinePrefilter = 0
+endif
+
+if ! exists( "g:localcomplete#WantVisibleFirst" )
+    " Search the lines in the current window before the other lines of the
+    " configured range.  Both parts keep the result order.  Local prefix
+    " searches stop reading lines as soon as localcomplete#ResultLimit
+    " different matches are found, so usually only the window is read.
+    " Override buffer locally with b:LocalCompleteWantVisibleFirst
+    let g:localcomplete#WantVisibleFirst = 0
+endif
+
+if ! exists( "g:localcomplete#WantLineTokenCache" )
+    " Keep the keywords of the lines that the last local prefix search looked
+    " at.  The next search only splits lines into keywords that entered the
+    " searched range or have been edited.  This pays off with large ranges.
+    " Override buffer locally with b:LocalCompleteWantLineTokenCache
+    let g:localcomplete#WantLineTokenCache = 0
+endif
+
+if ! exists( "g:localcomplete#IndexCacheMaxMegabytes" )
+    " The memory ceiling for the cached keyword indexes, line summaries and
+    " line keywords of all buffers.  The indexes of the least recently
+    " searched buffers are dropped first.  The cache counters are returned by
+    " localcomplete#indexCacheStatistics()
+    let g:localcomplete#IndexCacheMaxMegabytes = 64
+endif
+
+if ! exists( "g:localcomplete#WantSharedLineTokenCache" )
+    " Keep the keywords of lines by their content in a cache that all buffers
+    " share.  Identical lines, for example in vendored copies or generated
+    " files, are only split into keywords once.  This is used by
+    " localcomplete#allBufferMatches without the keyword index and by the
+    " match modes other than prefix matching in local searches.
+    " Override buffer locally with b:LocalCompleteWantSharedLineTokenCache
+    let g:localcomplete#WantSharedLineTokenCache = 0
+endif
+
+if ! exists( "g:localcomplete#SharedLineTokenCacheMaxMegabytes" )
+    " The memory ceiling for the shared line keywords.  The least recently
+    " used lines are dropped first.  The cache counters are returned by
+    " localcomplete#lineTokenCacheStatistics()
+    let g:localcomplete#SharedLineTokenCacheMaxMegabytes = 16
+endif
+
+if ! exists( "g:localcomplete#MaxLineScanBytes" )
+    " Only search the first bytes of every line up to this count.  A keyword
+    " at the cut is searched in full.  Lines of minified or generated files
+    " can be megabytes long.  Set it to 0 to search whole lines.  Lines are
+    " searched in chunks between keywords in any case, so a search can stop
+    " early in the middle of a long line.
+    " Override buffer locally with b:LocalCompleteMaxLineScanBytes
+    let g:localcomplete#MaxLineScanBytes = 0
+endif
+
+if ! exists( "g:localcomplete#SkipBufferLineBytes" )
+    " Leave other buffers out of localcomplete#allBufferMatches if one of
+    " their first lines is longer than this count of bytes.  This keeps
+    " minified or generated files out of the search.  Set it to 0 to search
+    " all buffers.
+    " Override buffer locally with b:LocalCompleteSkipBufferLineBytes
+    let g:localcomplete#SkipBufferLineBytes = 0
+endif
+
+if ! exists( "g:localcomplete#WantListedBuffersOnly" )
+    " Leave unlisted buffers out of localcomplete#allBufferMatches, like help
+    " buffers and buffers that have been deleted with :bdelete.
+    " Override buffer locally with b:LocalCompleteWantListedBuffersOnly
+    let g:localcomplete#WantListedBuffersOnly = 0
+endif
+
+if ! exists( "g:localcomplete#SkipBufferTypes" )
+    " A comma separated list of 'buftype' values of buffers to leave out of
+    " localcomplete#allBufferMatches.  For example 'help,terminal,quickfix'.
+    " Override buffer locally with b:LocalCompleteSkipBufferTypes
+    let g:localcomplete#SkipBufferTypes = ''
+endif
+
+if ! exists( "g:localcomplete#WantSameFiletypeOnly" )
+    " Only search other buffers with the 'filetype' of the current buffer in
+    " localcomplete#allBufferMatches.
+    " Override buffer locally with b:LocalCompleteWantSameFiletypeOnly
+    let g:localcomplete#WantSameFiletypeOnly = 0
+endif
+
+if ! exists( "g:localcomplete#MaxBufferLineCount" )
+    " Leave other buffers with more lines out of
+    " localcomplete#allBufferMatches, like huge logs.  Set it to 0 to search
+    " buffers of any size.
+    " Override buffer locally with b:LocalCompleteMaxBufferLineCount
+    let g:localcomplete#MaxBufferLineCount = 0
+endif
+
+if ! exists( "g:localcomplete#WantRecentBuffersFirst" )
+    " Search the other buffers in localcomplete#allBufferMatches by the time
+    " they were last used, the most recent one first.  The current buffer is
+    " always searched first.  Buffers used at the same time keep the order of
+    " their distance to the current buffer number.  This needs a Vim with
+    " the 'lastused' entry in getbufinfo().
+    " Override buffer locally with b:LocalCompleteWantRecentBuffersFirst
+    let g:localcomplete#WantRecentBuffersFirst = 0
+endif
+
+if ! exists( "g:localcomplete#WantUnloadedBuffers" )
+    " Add the words of buffers that are not loaded, for example those added
+    " with :badd, to localcomplete#allBufferMatches.  Their files are read
+    " from disk as UTF-8 and their words are cached until the modification
+    " time or the size of the file changes.  They come after the matches of
+    " the loaded buffers.  The buffer filters and the recency order apply to
+    " them, too.  Only words are looked up, so keyword bases with other
+    " characters find nothing in them.
+    " Override buffer locally with b:LocalCompleteWantUnloadedBuffers
+    let g:localcomplete#WantUnloadedBuffers = 0
+endif
+
+" =============================================================================
+
+if ! exists( "g:localcomplete#ProjectRoot" )
+    " The directory below which localcomplete#projectMatches searches all
+    " files.  Leave it empty for the current working directory.
+    " Override buffer locally with b:LocalCompleteProjectRoot
+    let g:localcomplete#ProjectRoot = ''
+endif
+
+if ! exists( "g:localcomplete#CacheDirectory" )
+    " The directory where the keywords of projects and buffers are saved for
+    " the next session.  Leave it empty to start every session from scratch.
+    let g:localcomplete#CacheDirectory =
+                \ (empty($XDG_CACHE_HOME) ? '~/.cache' : $XDG_CACHE_HOME)
+                \ . '/vim-localcomplete'
+endif
+
+if ! exists( "g:localcomplete#WantWarmStartCache" )
+    " Save the keyword indexes of buffers that are used for completion in
+    " the cache directory, and load them again in the next session instead of
+    " splitting the buffers into keywords.  Only buffers without unsaved
+    " changes are saved and loaded.  Saved indexes are discarded when the
+    " file or the buffer content changed or they are damaged.
+    let g:localcomplete#WantWarmStartCache = 0
+endif
+
+if ! exists( "g:localcomplete#ProjectIndexWorkers" )
+    " The number of processes that read the files of the project in the
+    " background.  With 0, Vim reads them itself and waits for it.  Where
+    " Python cannot fork, the workers are started with the Python interpreter
+    " of Vim's Python installation.  Vim reads the files itself if there is
+    " none.
+    let g:localcomplete#ProjectIndexWorkers = 4
+endif
+
+if ! exists( "g:localcomplete#ProjectMaxFileBytes" )
+    " Leave out files of the project that are larger than this many bytes.
+    " Specify 0 to read all files.  Hidden files and directories and binary
+    " files are always left out.
+    let g:localcomplete#ProjectMaxFileBytes = 1048576
+endif
+
+if ! exists( "g:localcomplete#ProjectRefreshSeconds" )
+    " Look for changed files of the project again when the last refresh
+    " started this many seconds ago.  Only files with a new modification time
+    " or size are read again.  Specify 0 to only refresh on the first
+    " completion of a session and with localcomplete#refreshProjectIndex().
+    let g:localcomplete#ProjectRefreshSeconds = 300
+endif
+
 " =============================================================================
 
 " XXX Note that all the length variables take effect _after_ the ACP-meets
@@ -98,6 +324,18 @@ if ! exists( "g:localcomplete#AllBuffersMinPrefixLength" )
     let g:localcomplete#AllBuffersMinPrefixLength = 1
 endif
 
+if ! exists( "g:localcomplete#TagMinPrefixLength" )
+    " Add tag matches if the prefix has this length minimum
+    " Override buffer locally with b:LocalCompleteTagMinPrefixLength
+    let g:localcomplete#TagMinPrefixLength = 3
+endif
+
+if ! exists( "g:localcomplete#ProjectMinPrefixLength" )
+    " Add project matches if the prefix has this length minimum
+    " Override buffer locally with b:LocalCompleteProjectMinPrefixLength
+    let g:localcomplete#ProjectMinPrefixLength = 3
+endif
+
 " =============================================================================
 
 if ! exists( "g:localcomplete#OriginNoteLocalcomplete" )
@@ -110,6 +348,16 @@ if ! exists( "g:localcomplete#OriginNoteAllBuffers" )
     let g:localcomplete#OriginNoteAllBuffers = '<+ all-buffers'
 endif
 
+if ! exists( "g:localcomplete#OriginNoteProject" )
+    " Change the project result origin sign.
+    let g:localcomplete#OriginNoteProject = '<# project'
+endif
+
+if ! exists( "g:localcomplete#OriginNoteTags" )
+    " Change the tags result origin sign.
+    let g:localcomplete#OriginNoteTags = '<@ tags'
+endif
+
 if ! exists( "g:localcomplete#OriginNoteDictionary" )
     " Change the dictionary result origin sign.
     let g:localcomplete#OriginNoteDictionary = '<* dict'
@@ -201,6 +449,22 @@ function localcomplete#getAllBufferMinPrefixLength()
     return s:numericVariableFallback(l:variableList, 1)
 endfunction
 
+function localcomplete#getTagMinPrefixLength()
+    let l:variableList = [
+                \ "b:LocalCompleteTagMinPrefixLength",
+                \ "g:localcomplete#TagMinPrefixLength"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getProjectMinPrefixLength()
+    let l:variableList = [
+                \ "b:LocalCompleteProjectMinPrefixLength",
+                \ "g:localcomplete#ProjectMinPrefixLength"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
 function localcomplete#getWantIgnoreCase()
     let l:variableList = [
                 \ "b:LocalCompleteWantIgnoreCase",
@@ -225,6 +489,218 @@ function localcomplete#getMatchResultOrder()
     return s:numericVariableFallback(l:variableList, 1)
 endfunction
 
+function localcomplete#getWantKeywordIndex()
+    let l:variableList = [
+                \ "b:LocalCompleteWantKeywordIndex",
+                \ "g:localcomplete#WantKeywordIndex"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getMatchMode()
+    let l:variableList = [
+                \ "b:LocalCompleteMatchMode",
+                \ "g:localcomplete#MatchMode"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantLocalRanking()
+    let l:variableList = [
+                \ "b:LocalCompleteWantLocalRanking",
+                \ "g:localcomplete#WantLocalRanking"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getResultLimit()
+    let l:variableList = [
+                \ "b:LocalCompleteResultLimit",
+                \ "g:localcomplete#ResultLimit"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantIgnoreAccents()
+    let l:variableList = [
+                \ "b:LocalCompleteWantIgnoreAccents",
+                \ "g:localcomplete#WantIgnoreAccents"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantLinePrefilter()
+    let l:variableList = [
+                \ "b:LocalCompleteWantLinePrefilter",
+                \ "g:localcomplete#WantLinePrefilter"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantVisibleFirst()
+    let l:variableList = [
+                \ "b:LocalCompleteWantVisibleFirst",
+                \ "g:localcomplete#WantVisibleFirst"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantLineTokenCache()
+    let l:variableList = [
+                \ "b:LocalCompleteWantLineTokenCache",
+                \ "g:localcomplete#WantLineTokenCache"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantSharedLineTokenCache()
+    let l:variableList = [
+                \ "b:LocalCompleteWantSharedLineTokenCache",
+                \ "g:localcomplete#WantSharedLineTokenCache"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getSharedLineTokenCacheMaxMegabytes()
+    let l:variableList = [
+                \ "g:localcomplete#SharedLineTokenCacheMaxMegabytes"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getMaxLineScanBytes()
+    let l:variableList = [
+                \ "b:LocalCompleteMaxLineScanBytes",
+                \ "g:localcomplete#MaxLineScanBytes"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getSkipBufferLineBytes()
+    let l:variableList = [
+                \ "b:LocalCompleteSkipBufferLineBytes",
+                \ "g:localcomplete#SkipBufferLineBytes"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantListedBuffersOnly()
+    let l:variableList = [
+                \ "b:LocalCompleteWantListedBuffersOnly",
+                \ "g:localcomplete#WantListedBuffersOnly"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getSkipBufferTypes()
+    let l:variableList = [
+                \ "b:LocalCompleteSkipBufferTypes",
+                \ "g:localcomplete#SkipBufferTypes"
+                \ ]
+    return s:variableFallback(l:variableList)
+endfunction
+
+function localcomplete#getWantSameFiletypeOnly()
+    let l:variableList = [
+                \ "b:LocalCompleteWantSameFiletypeOnly",
+                \ "g:localcomplete#WantSameFiletypeOnly"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getMaxBufferLineCount()
+    let l:variableList = [
+                \ "b:LocalCompleteMaxBufferLineCount",
+                \ "g:localcomplete#MaxBufferLineCount"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantRecentBuffersFirst()
+    let l:variableList = [
+                \ "b:LocalCompleteWantRecentBuffersFirst",
+                \ "g:localcomplete#WantRecentBuffersFirst"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getWantUnloadedBuffers()
+    let l:variableList = [
+                \ "b:LocalCompleteWantUnloadedBuffers",
+                \ "g:localcomplete#WantUnloadedBuffers"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getUnloadedBufferFiles()
+    " Return [bufnr, path] for every buffer that is not loaded and has a
+    " readable file.
+    return map(filter(getbufinfo(),
+                \ '!v:val.loaded && filereadable(v:val.name)'),
+                \ '[v:val.bufnr, v:val.name]')
+endfunction
+
+function localcomplete#getProjectRoot()
+    let l:variableList = [
+                \ "b:LocalCompleteProjectRoot",
+                \ "g:localcomplete#ProjectRoot"
+                \ ]
+    let l:root = s:variableFallback(l:variableList)
+    return empty(l:root) ? getcwd() : fnamemodify(l:root, ':p')
+endfunction
+
+function localcomplete#getCacheDirectory()
+    let l:variableList = [
+                \ "g:localcomplete#CacheDirectory"
+                \ ]
+    return s:variableFallback(l:variableList)
+endfunction
+
+function localcomplete#getWantWarmStartCache()
+    let l:variableList = [
+                \ "g:localcomplete#WantWarmStartCache"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getProjectIndexWorkers()
+    let l:variableList = [
+                \ "g:localcomplete#ProjectIndexWorkers"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getProjectMaxFileBytes()
+    let l:variableList = [
+                \ "g:localcomplete#ProjectMaxFileBytes"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getProjectRefreshSeconds()
+    let l:variableList = [
+                \ "g:localcomplete#ProjectRefreshSeconds"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
+function localcomplete#getBufferInfo()
+    " Return [bufnr, listed, lastused, linecount, buftype, filetype] for every
+    " buffer in one go.  The whole getbufinfo() result with all buffer
+    " variables would be too much to transfer.
+    return map(getbufinfo(), '[v:val.bufnr, v:val.listed,'
+                \ . ' get(v:val, "lastused", 0), get(v:val, "linecount", 0),'
+                \ . ' getbufvar(v:val.bufnr, "&buftype"),'
+                \ . ' getbufvar(v:val.bufnr, "&filetype")]')
+endfunction
+
+function localcomplete#getIndexCacheMaxMegabytes()
+    let l:variableList = [
+                \ "g:localcomplete#IndexCacheMaxMegabytes"
+                \ ]
+    return s:numericVariableFallback(l:variableList, 1)
+endfunction
+
 function localcomplete#getWantOriginNote()
     let l:variableList = [
                 \ "b:LocalCompleteShowOriginNote",
@@ -268,11 +744,11 @@ function localcomplete#localMatches(findstart, keyword_base)
     " Suggest matches looking at the region around the current cursor position
     " or the whole file.  The configuration at the top of this file applies.
     if a:findstart
-        LCPython import localcomplete
+        call s:preparePython()
         LCPython localcomplete.findstart_local_matches()
         return s:__localcomplete_lookup_result_findstart
     else
-        LCPython import localcomplete
+        call s:preparePython()
         LCPython localcomplete.complete_local_matches()
         return s:__localcomplete_lookup_result
     endif
@@ -283,16 +759,49 @@ function localcomplete#allBufferMatches(findstart, keyword_base)
     " come first.  The ignore-case and keyword-chars configuration from the
     " top of this file will be respected.
     if a:findstart
-        LCPython import localcomplete
+        call s:preparePython()
         LCPython localcomplete.findstart_local_matches()
         return s:__localcomplete_lookup_result_findstart
     else
-        LCPython import localcomplete
+        call s:preparePython()
         LCPython localcomplete.complete_all_buffer_matches()
         return s:__buffercomplete_lookup_result
     endif
 endfunction
 
+function localcomplete#projectMatches(findstart, keyword_base)
+    " Search all files below the project root for matches.  Their keywords
+    " are indexed in the background and saved for the next session.  The
+    " ignore-case, keyword-chars and match mode configuration from the top of
+    " this file will be respected.
+    if a:findstart
+        call s:preparePython()
+        LCPython localcomplete.findstart_local_matches()
+        return s:__localcomplete_lookup_result_findstart
+    else
+        call s:preparePython()
+        LCPython localcomplete.complete_project_matches()
+        return s:__projectcomplete_lookup_result
+    endif
+endfunction
+
+function localcomplete#tagMatches(findstart, keyword_base)
+    " Search the tag files of the 'tags' option for tag names.  Sorted tag
+    " files are searched with a binary search.  Case-insensitive searches
+    " are only fast in tag files sorted with folded case.  The ignore-case,
+    " keyword-chars and result limit configuration from the top of this file
+    " will be respected.
+    if a:findstart
+        call s:preparePython()
+        LCPython localcomplete.findstart_local_matches()
+        return s:__localcomplete_lookup_result_findstart
+    else
+        call s:preparePython()
+        LCPython localcomplete.complete_tag_matches()
+        return s:__tagcomplete_lookup_result
+    endif
+endfunction
+
 function localcomplete#dictMatches(findstart, keyword_base)
     " Search the file specified in the dictionary option for matches.  The
     " search is always performed case-insensitively.  The dictionary has
@@ -304,23 +813,75 @@ function localcomplete#dictMatches(findstart, keyword_base)
                     \ localcomplete#getDictMinPrefixLength())
             return []
         endif
-        LCPython import localcomplete
+        call s:preparePython()
         LCPython localcomplete.complete_dictionary_matches()
         return s:__dictcomplete_lookup_result
     endif
 endfunction
 
+" Cache maintenance
+" -----------------
+
+function localcomplete#purgeBufferCaches(bufnr)
+    " Drop everything cached for the buffer.  Nothing is cached before the
+    " first completion.
+    if !s:isPythonPrepared
+        return
+    endif
+    LCPython localcomplete.purge_buffer_caches(int(vim.eval("a:bufnr")))
+endfunction
+
+function localcomplete#refreshProjectIndex()
+    " Look for changed files of the current project in the background
+    call s:preparePython()
+    LCPython localcomplete.refresh_project_index()
+endfunction
+
+function localcomplete#indexCacheStatistics()
+    " Return a dictionary with the size, hit, miss and eviction counters and
+    " the hit rate of the keyword index cache
+    call s:preparePython()
+    LCPython localcomplete.transmit_cache_statistics_to_vim()
+    return s:__localcomplete_cache_statistics
+endfunction
+
+function localcomplete#lineTokenCacheStatistics()
+    " Return a dictionary with the size, hit, miss and eviction counters and
+    " the hit rate of the shared line keywords cache
+    call s:preparePython()
+    LCPython localcomplete.transmit_line_tokens_cache_statistics_to_vim()
+    return s:__localcomplete_line_tokens_cache_statistics
+endfunction
+
+augroup localcompletecaches
+    autocmd!
+    autocmd BufWipeout * call localcomplete#purgeBufferCaches(expand('<abuf>'))
+augroup END
+
 " ----------- Python prep
 
-if has('python')
-    command! -nargs=1 LCPython python <args>
-elseif has('python3')
-    command! -nargs=1 LCPython python3 <args>
-else
-    echoerr "No Python support found"
-end
-
-LCPython << PYTHONEOF
-import sys, os, vim
-sys.path.insert(0, os.path.join(vim.eval("expand('<sfile>:p:h:h')"), 'pylibs'))
-PYTHONEOF
+" Python is only initialized by the first function that needs it, which keeps
+" sourcing this file cheap.  <sfile> is only known while it is sourced.
+let s:pylibsDirectory = expand('<sfile>:p:h:h') . '/pylibs'
+let s:isPythonPrepared = get(s:, 'isPythonPrepared', 0)
+
+function s:preparePython()
+    " Define LCPython and import localcomplete from pylibs on the first call.
+    " The module stays bound, so later calls use it directly.
+    if s:isPythonPrepared
+        return
+    endif
+    if has('python')
+        command! -nargs=1 LCPython python <args>
+    elseif has('python3')
+        command! -nargs=1 LCPython python3 <args>
+    else
+        echoerr "No Python support found"
+        return
+    endif
+    let l:pylibsDirectory = s:pylibsDirectory
+    LCPython import sys, vim
+    LCPython sys.path.insert(0, vim.eval("l:pylibsDirectory"))
+    LCPython import localcomplete
+    let s:isPythonPrepared = 1
+endfunction
@@ -0,0 +1,90 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure memory and query time of the keyword indexes for many buffers.
+
+Execute from the root directory:
+
+    $> python -m benchmarks.bench_keywordindex [buffer_count]
+
+The storage of each index is compared with a set of unicode keywords per
+buffer, the naive way to cache them.
+"""
+
+import random
+import sys
+import time
+
+from pylibs import keywordindex
+
+
+DEFAULT_BUFFER_COUNT = 300
+KEYWORDS_PER_BUFFER = 5000
+VOCABULARY_SIZE = 60000
+SEED = 4711
+
+
+def make_vocabulary(rnd):
+    alphabet = u"abcdefghijklmnopqrstuvwxyz_ABCDEFGHIJKLMNOPQRSTUVWXYZ\u00fc"
+    return [u''.join(rnd.choice(alphabet)
+            for i in range(rnd.randint(3, 14)))
+            for j in range(VOCABULARY_SIZE)]
+
+def generate_buffer_keywords(rnd, vocabulary):
+    # Every buffer decodes its own copies of the words
+    return [u''.join(list(rnd.choice(vocabulary)))
+            for i in range(KEYWORDS_PER_BUFFER)]
+
+def get_set_size(keyword_set):
+    return sys.getsizeof(keyword_set) + sum(
+            sys.getsizeof(keyword) for keyword in keyword_set)
+
+def report(name, total_bytes, keyword_count):
+    sys.stdout.write("%-24s %12d bytes %8.1f bytes/keyword\n" % (
+            name, total_bytes, float(total_bytes) / max(1, keyword_count)))
+
+def main(argv):
+    buffer_count = int(argv[1]) if len(argv) > 1 else DEFAULT_BUFFER_COUNT
+    rnd = random.Random(SEED)
+    vocabulary = make_vocabulary(rnd)
+
+    set_bytes = 0
+    index_bytes = 0
+    keyword_count = 0
+    indexes = []
+    for i in range(buffer_count):
+        keywords = generate_buffer_keywords(rnd, vocabulary)
+        keyword_set = set(keywords)
+        keyword_count += len(keyword_set)
+        set_bytes += get_set_size(keyword_set)
+        keyword_index = keywordindex.KeywordIndex(keywords)
+        index_bytes += keyword_index.memory_size()
+        indexes.append(keyword_index)
+
+    sys.stdout.write("%d buffers, %d unique keywords per buffer on average\n"
+            % (buffer_count, keyword_count // buffer_count))
+    report("set of unicode", set_bytes, keyword_count)
+    report("KeywordIndex", index_bytes, keyword_count)
+
+    prefixes = [word[:2] for word in rnd.sample(vocabulary, 100)]
+    start = time.time()
+    for prefix in prefixes:
+        for keyword_index in indexes:
+            keyword_index.find_prefix_matches(prefix)
+    elapsed = (time.time() - start) / len(prefixes)
+    sys.stdout.write("prefix query over all buffers: %.2f ms\n"
+            % (elapsed * 1000))
+
+if __name__ == '__main__':
+    main(sys.argv)
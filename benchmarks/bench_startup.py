@@ -0,0 +1,124 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the cost of loading the plugin and of the first completions in Vim.
+
+Execute from the root directory, optionally with the Vim to measure:
+
+    $> python -m benchmarks.bench_startup [vim_executable]
+
+Vim starts without any vimrc and with this directory in 'runtimepath'.  The
+sourcing time of autoload/localcomplete.vim is taken from the --startuptime
+log.  The first completion initializes Python and imports the modules, the
+second one shows the steady state.  Both are timed in Vim with reltime().
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_COUNT = 2000
+KEYWORD_BASE = 'pri'
+
+# The --startuptime line of a sourced file: clock, self+sourced, self
+SOURCING_PATTERN = re.compile(
+        r'^\s*[\d.]+\s+([\d.]+)\s+[\d.]+:\s+sourcing\s+(.*)$')
+
+
+def write_buffer_file(path):
+    with open(path, 'w') as file_object:
+        for i in range(LINE_COUNT):
+            file_object.write('primary_%d = prize(priory_%d)\n' % (i, i))
+
+def get_sourcing_milliseconds(startuptime_path, script_suffix):
+    """
+    Return the milliseconds spent sourcing the script or None if it has not
+    been sourced.
+    """
+    with open(startuptime_path) as file_object:
+        for line in file_object:
+            match_object = SOURCING_PATTERN.match(line)
+            if (match_object is not None
+                    and match_object.group(2).strip().endswith(
+                            script_suffix)):
+                return float(match_object.group(1))
+    return None
+
+def get_vim_commands(timings_path):
+    """
+    Return the -c arguments that load the plugin and time two completions.
+    """
+    completion = ("call localcomplete#localMatches(1, '') | "
+            "call localcomplete#localMatches(0, '%s')" % KEYWORD_BASE)
+    return [
+        'set runtimepath^=%s' % ROOT_DIRECTORY,
+        'call localcomplete#getResultLimit()',
+        'normal! G',
+        'let g:benchTimings = [] | let v:errmsg = ""',
+        'let g:benchStart = reltime() | %s | '
+                'call add(g:benchTimings, reltimestr(reltime(g:benchStart)))'
+                % completion,
+        'let g:benchStart = reltime() | %s | '
+                'call add(g:benchTimings, reltimestr(reltime(g:benchStart)))'
+                % completion,
+        'call writefile([v:errmsg] + g:benchTimings, "%s")' % timings_path,
+        'qall!',
+    ]
+
+def report(name, milliseconds):
+    if milliseconds is None:
+        sys.stdout.write("%-28s %s\n" % (name, "not measured"))
+    else:
+        sys.stdout.write("%-28s %8.2f ms\n" % (name, milliseconds))
+
+def main(argv):
+    vim_executable = argv[1] if len(argv) > 1 else 'vim'
+    directory = tempfile.mkdtemp()
+    try:
+        buffer_path = os.path.join(directory, 'buffer.py')
+        startuptime_path = os.path.join(directory, 'startuptime.log')
+        timings_path = os.path.join(directory, 'timings.txt')
+        write_buffer_file(buffer_path)
+
+        arguments = [vim_executable, '-u', 'NONE', '-i', 'NONE', '-N',
+                '-es', '--startuptime', startuptime_path]
+        for command in get_vim_commands(timings_path):
+            arguments.extend(['-c', command])
+        arguments.append(buffer_path)
+        subprocess.call(arguments)
+
+        report("sourcing localcomplete.vim", get_sourcing_milliseconds(
+                startuptime_path, os.path.join('autoload',
+                        'localcomplete.vim')))
+        completion_timings = [None, None]
+        with open(timings_path) as file_object:
+            error_message = file_object.readline().strip()
+            if error_message:
+                sys.stdout.write("The completions failed: %s\n"
+                        % error_message)
+            else:
+                completion_timings = [float(seconds) * 1000
+                        for seconds in file_object.read().split()]
+        report("first completion", completion_timings[0])
+        report("second completion", completion_timings[1])
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(sys.argv)
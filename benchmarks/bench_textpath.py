@@ -0,0 +1,105 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare the local search on encoded lines with the one on decoded lines.
+
+Python 2 Vim passes buffer lines as bytes, which are decoded chunk by chunk
+during the search.  Python 3 Vim passes them as str, which are searched as
+they are.  Both paths run here on the same generated lines.  Execute from the
+root directory with both interpreters to compare them across versions, too:
+
+    $> python -m benchmarks.bench_textpath [line_count]
+    $> python3 -m benchmarks.bench_textpath [line_count]
+
+The modules are imported from pylibs like the plugin imports them, with a
+minimal stand-in for the vim module.
+"""
+
+import os
+import random
+import sys
+import time
+import types
+
+
+DEFAULT_LINE_COUNT = 20000
+WORDS_PER_LINE = 8
+REPETITIONS = 20
+SEED = 4711
+
+VIM_EVAL_RESULTS = {
+    "&encoding": "utf-8",
+    "localcomplete#getAdditionalKeywordChars()": "-",
+    "localcomplete#getMaxLineScanBytes()": "0",
+    "localcomplete#getWantIgnoreCase()": "0",
+    "&ignorecase": "0",
+    "&infercase": "0",
+}
+
+
+def import_localcomplete(keyword_base):
+    vim_module = types.ModuleType('vim')
+    eval_results = dict(VIM_EVAL_RESULTS)
+    eval_results["a:keyword_base"] = keyword_base
+    vim_module.eval = eval_results.__getitem__
+    sys.modules['vim'] = vim_module
+    sys.path.insert(0, os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            'pylibs'))
+    import localcomplete
+    return localcomplete
+
+def pick(rnd, items):
+    # random.choice differs between Python 2 and 3, random.random does not
+    return items[int(rnd.random() * len(items))]
+
+def make_lines(rnd, line_count):
+    alphabet = u"abcdefghijklmnopqrstuvwxyz_-\u00fc\u00df"
+    vocabulary = [u''.join(pick(rnd, alphabet)
+            for i in range(3 + int(rnd.random() * 10)))
+            for j in range(5000)]
+    return [u'    ' + u' '.join(pick(rnd, vocabulary)
+            for i in range(WORDS_PER_LINE)) + u';'
+            for j in range(line_count)]
+
+def measure(localcomplete, lines, passes_text):
+    localcomplete.vimtext.VIM_PASSES_TEXT = passes_text
+    start = time.time()
+    for i in range(REPETITIONS):
+        found_matches = localcomplete.find_matches_in_lines(lines, 0)
+    elapsed = (time.time() - start) / REPETITIONS
+    return elapsed, found_matches
+
+def main(argv):
+    line_count = int(argv[1]) if len(argv) > 1 else DEFAULT_LINE_COUNT
+    localcomplete = import_localcomplete("ab")
+    text_lines = make_lines(random.Random(SEED), line_count)
+    encoded_lines = [line.encode('utf-8') for line in text_lines]
+
+    encoded_elapsed, encoded_matches = measure(localcomplete,
+            encoded_lines, False)
+    text_elapsed, text_matches = measure(localcomplete, text_lines, True)
+    if encoded_matches != text_matches:
+        raise RuntimeError("The paths found different matches")
+
+    sys.stdout.write("Python %d.%d, %d lines, %d matches\n"
+            % (sys.version_info[0], sys.version_info[1], line_count,
+                    len(text_matches)))
+    sys.stdout.write("encoded lines: %8.2f ms per search\n"
+            % (encoded_elapsed * 1000))
+    sys.stdout.write("decoded lines: %8.2f ms per search\n"
+            % (text_elapsed * 1000))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,228 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compile word lists into dictionary index files.
+
+Even the cached index of a compressed dictionary has to be built once per
+session, which takes seconds for big word lists.  A dictionary index file
+contains that index already: the sorted unique lines of the word list and
+the same lines folded for case-insensitive searches, each with an offset
+table.  Loading it maps the file into memory and reads the tables as arrays.
+Nothing is parsed or decoded.
+
+Compile a word list from the command line:
+
+    $> python pylibs/dictcompile.py words.txt -o words.lcidx
+
+The word list may be compressed like a dictionary.  Set 'dictionary' to the
+index file to use it.
+
+An index file starts with a fixed header:
+
+    magic, version, word count, length of the words, length of the folded
+    words, length of the fold name
+
+The fold name follows, then the word offsets, the first line numbers, the
+folded word offsets, the folded word indexes, the words and the folded words.
+Offsets are positions in the file, so the tables index into the mapping
+directly.  All numbers are little-endian.
+"""
+
+import mmap
+import os
+import struct
+import sys
+
+import filebuffers
+import indexstore
+import keywordindex
+
+INDEX_MAGIC = b'LCDICT\0\0'
+INDEX_VERSION = 1
+INDEX_FILE_SUFFIX = '.lcidx'
+
+# magic, version, word count, words length, folded words length, fold name
+# length
+HEADER = struct.Struct('<8sIIIII')
+
+OFFSET_BYTES = indexstore.OFFSET_BYTES
+
+
+class DictCompileError(Exception):
+    """
+    The base exception for this module.
+    """
+
+def get_fold_name():
+    """
+    Return the name of the case folding of this Python.  Folded tables of
+    other foldings are not used.
+    """
+    return keywordindex.get_fold_version()
+
+def is_index_file(path):
+    return os.path.splitext(path)[1].lower() == INDEX_FILE_SUFFIX
+
+def generate_word_list_lines(path):
+    """
+    Generate the non-empty lines of the word list at path, which may be
+    compressed.
+    """
+    opener = filebuffers.get_decompressing_opener(path) or open
+    for line in filebuffers.generate_decompressed_lines(path, opener):
+        if line:
+            yield line
+
+def compile_dictionary_index(lines):
+    """
+    Return the KeywordIndex of the lines with a table for fold_case.
+    """
+    return keywordindex.KeywordIndex(lines, (keywordindex.fold_case,))
+
+def dump_dictionary_index(dictionary_index):
+    """
+    Return the content of the index file for the KeywordIndex returned by
+    compile_dictionary_index.
+    """
+    words = dictionary_index.words
+    folded_words, word_indexes = dictionary_index.folded_tables[
+            keywordindex.fold_case]
+    fold_name = get_fold_name()
+    word_count = len(words)
+    blob = indexstore.get_blob(words)
+    folded_blob = indexstore.get_blob(folded_words)
+
+    blob_start = (HEADER.size
+            + len(fold_name)
+            + (4 * word_count + 2) * OFFSET_BYTES)
+    folded_blob_start = blob_start + len(blob)
+    return b''.join([
+            HEADER.pack(INDEX_MAGIC,
+                    INDEX_VERSION,
+                    word_count,
+                    len(blob),
+                    len(folded_blob),
+                    len(fold_name)),
+            fold_name,
+            indexstore.array_to_bytes(
+                    indexstore.get_absolute_offsets(words, blob_start)),
+            indexstore.array_to_bytes(dictionary_index.positions),
+            indexstore.array_to_bytes(indexstore.get_absolute_offsets(
+                    folded_words, folded_blob_start)),
+            indexstore.array_to_bytes(word_indexes),
+            blob,
+            folded_blob])
+
+def parse_dictionary_index(data):
+    """
+    Return the KeywordIndex in the index file content data with a table for
+    fold_case.  The words are looked up in data directly, which may be a
+    memory map.  Raise DictCompileError if data is no valid index file.
+    """
+    if len(data) < HEADER.size:
+        raise DictCompileError("Truncated dictionary index header")
+    (magic, version, word_count, blob_length, folded_blob_length,
+            fold_name_length) = HEADER.unpack(data[:HEADER.size])
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise DictCompileError("Unknown dictionary index format")
+
+    offsets_start = HEADER.size + fold_name_length
+    table_bytes = (word_count + 1) * OFFSET_BYTES
+    positions_start = offsets_start + table_bytes
+    folded_offsets_start = positions_start + table_bytes - OFFSET_BYTES
+    word_indexes_start = folded_offsets_start + table_bytes
+    blob_start = word_indexes_start + table_bytes - OFFSET_BYTES
+    folded_blob_start = blob_start + blob_length
+    if folded_blob_start + folded_blob_length != len(data):
+        raise DictCompileError(
+                "Dictionary index sections do not match the size")
+
+    offsets = indexstore.bytes_to_array(data[offsets_start:positions_start])
+    folded_offsets = indexstore.bytes_to_array(
+            data[folded_offsets_start:word_indexes_start])
+    if (offsets[0] != blob_start
+            or offsets[-1] != folded_blob_start
+            or folded_offsets[0] != folded_blob_start
+            or folded_offsets[-1] != len(data)):
+        raise DictCompileError("Corrupt dictionary index offsets")
+
+    dictionary_index = keywordindex.KeywordIndex.from_packed(
+            keywordindex.PackedWords(data, offsets),
+            indexstore.bytes_to_array(
+                    data[positions_start:folded_offsets_start]))
+    if data[HEADER.size:offsets_start] == get_fold_name():
+        dictionary_index.add_folded_table(keywordindex.fold_case,
+                keywordindex.PackedWords(data, folded_offsets),
+                indexstore.bytes_to_array(data[word_indexes_start:blob_start]))
+    else:
+        # Compiled by a Python that folds differently
+        dictionary_index = keywordindex.KeywordIndex.from_packed(
+                dictionary_index.words,
+                dictionary_index.positions,
+                (keywordindex.fold_case,))
+    return dictionary_index
+
+def load_dictionary_index(path):
+    """
+    Map the index file at path into memory and return its KeywordIndex.
+    Raise DictCompileError if the file is no valid index file.
+    """
+    with open(path, 'rb') as file_object:
+        try:
+            data = mmap.mmap(file_object.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            raise DictCompileError("Empty dictionary index")
+    try:
+        return parse_dictionary_index(data)
+    except DictCompileError:
+        data.close()
+        raise
+
+def compile_word_list(word_list_path, index_path):
+    """
+    Compile the word list into the index file and return the number of
+    unique words.
+    """
+    dictionary_index = compile_dictionary_index(
+            generate_word_list_lines(word_list_path))
+    filebuffers.write_file_atomically(index_path,
+            dump_dictionary_index(dictionary_index))
+    return len(dictionary_index)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+            description="Compile a word list into a dictionary index file.")
+    parser.add_argument('word_list',
+            help="the UTF-8 word list, optionally compressed")
+    parser.add_argument('-o', '--output',
+            help="the index file, by default the word list path with the "
+                    "suffix %s" % INDEX_FILE_SUFFIX)
+    args = parser.parse_args(argv)
+    index_path = args.output
+    if index_path is None:
+        index_path = os.path.splitext(args.word_list)[0] + INDEX_FILE_SUFFIX
+    try:
+        word_count = compile_word_list(args.word_list, index_path)
+    except filebuffers.DECOMPRESSION_ERRORS as err:
+        sys.stderr.write("dictcompile: %s\n" % err)
+        return 1
+    sys.stdout.write("%s: %d words\n" % (index_path, word_count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
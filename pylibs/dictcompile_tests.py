@@ -0,0 +1,122 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from pylibs import dictcompile
+from pylibs import keywordindex
+
+
+class DictCompileTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestDictionaryIndex(unittest.TestCase):
+
+    WORD_LIST = u"priory\nprize\n\nPriority\nprize\ngr\u00fc\u00dfe\n"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.word_list_path = os.path.join(self.directory, 'words.txt')
+        self.index_path = os.path.join(self.directory, 'words.lcidx')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_write_word_list(self, path=None):
+        path = path or self.word_list_path
+        opener = dictcompile.filebuffers.get_decompressing_opener(path)
+        opener = opener or open
+        with opener(path, 'wb') as file_object:
+            file_object.write(self.WORD_LIST.encode('utf-8'))
+        return path
+
+    def _helper_compile(self, word_list_path=None):
+        dictcompile.compile_word_list(
+                self._helper_write_word_list(word_list_path),
+                self.index_path)
+        return dictcompile.load_dictionary_index(self.index_path)
+
+    def _helper_assert_index(self, dictionary_index):
+        self.assertEqual(len(dictionary_index), 4)
+        self.assertEqual(dictionary_index.find_prefix_matches(u"pri"),
+                [u"priory", u"prize"])
+        self.assertEqual(dictionary_index.find_prefix_matches(u"PRI",
+                        keywordindex.fold_case),
+                [u"priory", u"prize", u"Priority"])
+        self.assertEqual(dictionary_index.find_prefix_matches(u"GR\u00dc",
+                        keywordindex.fold_case),
+                [u"gr\u00fc\u00dfe"])
+
+    def test_compiled_index_is_loaded(self):
+        self._helper_assert_index(self._helper_compile())
+
+    def test_compressed_word_lists_are_compiled(self):
+        self._helper_assert_index(self._helper_compile(
+                os.path.join(self.directory, 'words.txt.gz')))
+
+    def test_empty_word_list_is_compiled(self):
+        self.WORD_LIST = u""
+        dictionary_index = self._helper_compile()
+        self.assertEqual(len(dictionary_index), 0)
+        self.assertEqual(dictionary_index.find_prefix_matches(u"a",
+                keywordindex.fold_case), [])
+
+    def test_folded_table_of_another_folding_is_rebuilt(self):
+        self._helper_write_word_list()
+        with mock.patch.object(dictcompile, 'get_fold_name',
+                return_value=b'other'):
+            dictcompile.compile_word_list(self.word_list_path,
+                    self.index_path)
+        self._helper_assert_index(
+                dictcompile.load_dictionary_index(self.index_path))
+
+    def test_invalid_index_files_raise_an_error(self):
+        self._helper_compile()
+        with open(self.index_path, 'rb') as file_object:
+            data = file_object.read()
+        offsets_start = (dictcompile.HEADER.size
+                + len(dictcompile.get_fold_name()))
+        for content in [b"", data[:10], data[:-1], b"X" + data[1:],
+                data[:offsets_start] + b"\xff" * 4
+                        + data[offsets_start + 4:]]:
+            with open(self.index_path, 'wb') as file_object:
+                file_object.write(content)
+            self.assertRaises(dictcompile.DictCompileError,
+                    dictcompile.load_dictionary_index, self.index_path)
+
+    def test_index_files_are_recognized_by_suffix(self):
+        self.assertTrue(dictcompile.is_index_file('words.LCIDX'))
+        self.assertFalse(dictcompile.is_index_file('words.txt'))
+
+    def test_main_writes_the_index_next_to_the_word_list(self):
+        self._helper_write_word_list()
+        with mock.patch('sys.stdout'):
+            self.assertEqual(dictcompile.main([self.word_list_path]), 0)
+        self._helper_assert_index(
+                dictcompile.load_dictionary_index(self.index_path))
+
+    def test_main_reports_unreadable_word_lists(self):
+        with mock.patch('sys.stderr') as stderr_mock:
+            self.assertEqual(dictcompile.main([
+                    os.path.join(self.directory, 'missing.txt'),
+                    '-o', self.index_path]), 1)
+        self.assertTrue(stderr_mock.write.called)
+        self.assertFalse(os.path.exists(self.index_path))
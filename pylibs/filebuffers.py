@@ -0,0 +1,153 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The keywords of files that are not loaded into Vim.
+
+Buffers that are listed but not loaded have no lines in Vim, and loading
+hundreds of them just for completion would be far too expensive.  Their files
+are memory-mapped instead and decoded as UTF-8 in chunks of whole lines, so
+the text of a big file never has to be held in memory at once.
+
+Compressed files cannot be mapped.  They are decompressed as a stream of
+lines instead.
+"""
+
+import bz2
+import gzip
+import mmap
+import os
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    # Python 2 has no lzma module
+    lzma = None
+
+import tokenizer
+
+FILE_CHUNK_BYTES = 2 ** 20
+
+# The functions that open compressed files for reading by file name suffix
+DECOMPRESSING_OPENERS = {
+    '.gz': gzip.GzipFile,
+    '.bz2': bz2.BZ2File,
+}
+if lzma is not None:
+    DECOMPRESSING_OPENERS['.xz'] = lzma.LZMAFile
+
+# The errors raised for unreadable or corrupt compressed files
+DECOMPRESSION_ERRORS = (IOError, OSError, EOFError, zlib.error)
+if lzma is not None:
+    DECOMPRESSION_ERRORS += (lzma.LZMAError,)
+
+
+class FileBuffersError(Exception):
+    """
+    The base exception for this module.
+    """
+
+def encode_path(path):
+    """
+    Return the path as bytes.  Python 3 paths are decoded with the
+    surrogateescape error handler.
+    """
+    if isinstance(path, bytes):
+        return path
+    return path.encode('utf-8', 'surrogateescape')
+
+def decode_path(encoded_path):
+    """
+    Return the encoded path as a native string path.
+    """
+    if str is bytes:
+        return encoded_path
+    return encoded_path.decode('utf-8', 'surrogateescape')
+
+def write_file_atomically(path, data):
+    """
+    Replace the file at path with data, so that readers never see a partial
+    file.  Existing memory maps of the old file stay intact.
+    """
+    temporary_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary_path, 'wb') as file_object:
+        file_object.write(data)
+    try:
+        os.rename(temporary_path, path)
+    except OSError:
+        # Windows does not replace existing files
+        os.remove(path)
+        os.rename(temporary_path, path)
+
+def get_file_stamp(path):
+    """
+    Return (mtime, size) of the file.  A cached result for the file is valid
+    as long as they do not change.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+def generate_line_chunks(data, chunk_bytes):
+    """
+    Generate slices of about chunk_bytes of the bytes data.  They are cut
+    after line breaks, so neither keywords nor UTF-8 sequences are cut.
+    Lines longer than chunk_bytes are never cut.
+    """
+    start = 0
+    size = len(data)
+    while start < size:
+        end = start + chunk_bytes
+        if end < size:
+            cut = data.rfind(b'\n', start, end)
+            if cut < 0:
+                cut = data.find(b'\n', end)
+            end = size if cut < 0 else cut + 1
+        yield data[start:end]
+        start = end
+
+def tokenize_file(path, punctuation_chars, chunk_bytes=FILE_CHUNK_BYTES):
+    """
+    Return the list of keywords in the UTF-8 file at path.  Invalid bytes
+    separate keywords.
+    """
+    with open(path, 'rb') as file_object:
+        # Empty files cannot be mapped.
+        if not os.fstat(file_object.fileno()).st_size:
+            return []
+        data = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        keywords = []
+        for chunk in generate_line_chunks(data, chunk_bytes):
+            keywords.extend(tokenizer.tokenize(
+                    chunk.decode('utf-8', 'replace'), punctuation_chars))
+        return keywords
+    finally:
+        data.close()
+
+def get_decompressing_opener(path):
+    """
+    Return the function that opens the compressed file at path for reading
+    or None if the suffix of path names no supported compression.
+    """
+    return DECOMPRESSING_OPENERS.get(os.path.splitext(path)[1].lower())
+
+def generate_decompressed_lines(path, opener):
+    """
+    Generate the lines of the compressed UTF-8 file at path without their
+    line breaks.  The file is opened with opener and decompressed while the
+    lines are consumed.  Invalid bytes are replaced.
+    """
+    with opener(path, 'rb') as file_object:
+        for line in file_object:
+            yield line.rstrip(b'\r\n').decode('utf-8', 'replace')
@@ -0,0 +1,142 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pylibs import filebuffers
+
+
+class FileBuffersTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestGenerateLineChunks(unittest.TestCase):
+
+    def _helper_chunks(self, data, chunk_bytes):
+        return list(filebuffers.generate_line_chunks(data, chunk_bytes))
+
+    def test_short_data_is_one_chunk(self):
+        self.assertEqual(self._helper_chunks(b"ab\ncd", 8), [b"ab\ncd"])
+
+    def test_chunks_are_cut_after_the_last_line_break(self):
+        self.assertEqual(self._helper_chunks(b"ab\ncd\nef\ngh", 7),
+                [b"ab\ncd\n", b"ef\ngh"])
+
+    def test_long_lines_are_not_cut(self):
+        self.assertEqual(self._helper_chunks(b"abcdefgh\nij\nklmnopq", 4),
+                [b"abcdefgh\n", b"ij\n", b"klmnopq"])
+
+    def test_empty_data_has_no_chunks(self):
+        self.assertEqual(self._helper_chunks(b"", 4), [])
+
+
+class TestTokenizeFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_write_file(self, content):
+        path = os.path.join(self.directory, 'file.txt')
+        with open(path, 'wb') as file_object:
+            file_object.write(content)
+        return path
+
+    def test_keywords_of_all_chunks_are_returned(self):
+        path = self._helper_write_file(b"one two\nthree-four\nfive\n")
+        self.assertEqual(filebuffers.tokenize_file(path, u"-", 9),
+                [u"one", u"two", u"three-four", u"five"])
+
+    def test_file_is_decoded_as_utf8(self):
+        path = self._helper_write_file(
+                u"gr\u00fc\u00dfe \u00e4\n".encode('utf-8'))
+        self.assertEqual(filebuffers.tokenize_file(path, u""),
+                [u"gr\u00fc\u00dfe", u"\u00e4"])
+
+    def test_invalid_bytes_separate_keywords(self):
+        path = self._helper_write_file(b"ab\xffcd")
+        self.assertEqual(filebuffers.tokenize_file(path, u""),
+                [u"ab", u"cd"])
+
+    def test_empty_file_has_no_keywords(self):
+        path = self._helper_write_file(b"")
+        self.assertEqual(filebuffers.tokenize_file(path, u""), [])
+
+    def test_missing_file_raises_an_io_error(self):
+        self.assertRaises(IOError, filebuffers.tokenize_file,
+                os.path.join(self.directory, 'missing'), u"")
+
+    def test_file_stamp_changes_with_the_size(self):
+        path = self._helper_write_file(b"ab")
+        first_stamp = filebuffers.get_file_stamp(path)
+        self._helper_write_file(b"abc")
+        self.assertNotEqual(filebuffers.get_file_stamp(path), first_stamp)
+
+
+class TestGenerateDecompressedLines(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_lines(self, suffix, content):
+        path = os.path.join(self.directory, 'words' + suffix)
+        opener = filebuffers.get_decompressing_opener(path)
+        with opener(path, 'wb') as file_object:
+            file_object.write(content)
+        return list(filebuffers.generate_decompressed_lines(path, opener))
+
+    def test_gzip_lines_are_decoded_without_line_breaks(self):
+        self.assertEqual(
+                self._helper_lines('.gz',
+                        u"gr\u00fc\u00dfe\r\nab\n\nlast".encode('utf-8')),
+                [u"gr\u00fc\u00dfe", u"ab", u"", u"last"])
+
+    def test_bzip2_lines_are_decompressed(self):
+        self.assertEqual(self._helper_lines('.bz2', b"one\ntwo\n"),
+                [u"one", u"two"])
+
+    @unittest.skipIf(filebuffers.lzma is None, "lzma is not available")
+    def test_xz_lines_are_decompressed(self):
+        self.assertEqual(self._helper_lines('.xz', b"one\ntwo\n"),
+                [u"one", u"two"])
+
+    def test_invalid_bytes_are_replaced(self):
+        self.assertEqual(self._helper_lines('.gz', b"ab\xffcd"),
+                [u"ab\ufffdcd"])
+
+    def test_suffix_case_is_ignored(self):
+        self.assertIs(filebuffers.get_decompressing_opener('words.GZ'),
+                filebuffers.DECOMPRESSING_OPENERS['.gz'])
+
+    def test_plain_files_have_no_opener(self):
+        self.assertIsNone(filebuffers.get_decompressing_opener('words.txt'))
+        self.assertIsNone(filebuffers.get_decompressing_opener('words'))
+
+    def test_corrupt_file_raises_a_decompression_error(self):
+        path = os.path.join(self.directory, 'words.gz')
+        with open(path, 'wb') as file_object:
+            file_object.write(b"no gzip data")
+        with self.assertRaises(filebuffers.DECOMPRESSION_ERRORS):
+            list(filebuffers.generate_decompressed_lines(path,
+                    filebuffers.get_decompressing_opener(path)))
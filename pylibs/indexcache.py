@@ -0,0 +1,140 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A least-recently-used cache with a memory ceiling for per-buffer data.
+
+Buffers come and go all day long.  Without a limit, everything that was ever
+cached for them would stay in memory until Vim exits.
+"""
+
+import collections
+
+
+class IndexCacheError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class CacheItem(object):
+    """
+    A cached value together with the state it has been derived from.
+    """
+
+    __slots__ = ('validity', 'value', 'size')
+
+    def __init__(self, validity, value, size):
+        self.validity = validity
+        self.value = value
+        self.size = size
+
+
+class IndexCache(object):
+    """
+    Map keys (usually buffer numbers) to values.  Each value is stored with a
+    validity token that has to match on lookup, for example the changedtick of
+    the buffer it was built from.
+
+    When the sizes of all values exceed max_bytes, the least recently used
+    values are evicted.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, validity):
+        """
+        Return the value for key if it has been stored with an equal validity
+        token or None otherwise.
+        """
+        item = self.items.get(key)
+        if item is None or item.validity != validity:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Mark as most recently used
+        del self.items[key]
+        self.items[key] = item
+        return item.value
+
+    def peek(self, key):
+        """
+        Return the value for key whatever its validity token or None if there
+        is none, as a starting point for a new value.  Neither the counters
+        nor the order of use change.
+        """
+        item = self.items.get(key)
+        if item is None:
+            return None
+        return item.value
+
+    def put(self, key, validity, value, size):
+        """
+        Store value for key.  Values larger than the whole cache are not
+        stored at all.
+        """
+        self.purge(key)
+        if size > self.max_bytes:
+            self.evictions += 1
+            return
+        self.items[key] = CacheItem(validity, value, size)
+        self.total_bytes += size
+        self._evict_to(self.max_bytes)
+
+    def purge(self, key):
+        """
+        Remove the value for key if there is one.
+        """
+        item = self.items.pop(key, None)
+        if item is not None:
+            self.total_bytes -= item.size
+
+    def clear(self):
+        self.items.clear()
+        self.total_bytes = 0
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict_to(max_bytes)
+
+    def _evict_to(self, max_bytes):
+        while self.total_bytes > max_bytes:
+            key, item = self.items.popitem(last=False)
+            self.total_bytes -= item.size
+            self.evictions += 1
+
+    def statistics(self):
+        """
+        Return a dictionary with the counters of this cache.
+        """
+        lookups = self.hits + self.misses
+        return dict(
+                entries=len(self.items),
+                bytes=self.total_bytes,
+                max_bytes=self.max_bytes,
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=float(self.hits) / lookups if lookups else 0.0,
+                evictions=self.evictions)
@@ -0,0 +1,109 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from pylibs import indexcache
+
+
+class IndexCacheTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestIndexCache(unittest.TestCase):
+
+    def test_stored_values_are_found_with_the_same_validity(self):
+        cache = indexcache.IndexCache(100)
+        cache.put(1, 'tick1', 'value', 10)
+        self.assertEqual(cache.get(1, 'tick1'), 'value')
+        self.assertEqual(cache.statistics()['hits'], 1)
+
+    def test_values_with_another_validity_are_a_miss(self):
+        cache = indexcache.IndexCache(100)
+        cache.put(1, 'tick1', 'value', 10)
+        self.assertIsNone(cache.get(1, 'tick2'))
+        self.assertIsNone(cache.get(2, 'tick1'))
+        self.assertEqual(cache.statistics()['misses'], 2)
+
+    def test_peek_ignores_the_validity(self):
+        cache = indexcache.IndexCache(100)
+        cache.put(1, 'tick1', 'value', 10)
+        self.assertEqual(cache.peek(1), 'value')
+        self.assertIsNone(cache.peek(2))
+        self.assertEqual(cache.statistics()['hits'], 0)
+        self.assertEqual(cache.statistics()['misses'], 0)
+
+    def test_replacing_a_value_updates_the_size(self):
+        cache = indexcache.IndexCache(100)
+        cache.put(1, 'tick1', 'value', 10)
+        cache.put(1, 'tick2', 'other', 30)
+        self.assertEqual(cache.statistics()['bytes'], 30)
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_values_are_evicted_first(self):
+        cache = indexcache.IndexCache(30)
+        cache.put(1, 'v', 'one', 10)
+        cache.put(2, 'v', 'two', 10)
+        cache.put(3, 'v', 'three', 10)
+        cache.get(1, 'v')
+        cache.put(4, 'v', 'four', 10)
+        self.assertNotIn(2, cache)
+        self.assertEqual([k for k in (1, 3, 4) if k in cache], [1, 3, 4])
+        self.assertEqual(cache.statistics()['evictions'], 1)
+
+    def test_values_larger_than_the_cache_are_not_stored(self):
+        cache = indexcache.IndexCache(30)
+        cache.put(1, 'v', 'one', 10)
+        cache.put(2, 'v', 'huge', 31)
+        self.assertNotIn(2, cache)
+        self.assertIn(1, cache)
+
+    def test_purge_removes_a_value(self):
+        cache = indexcache.IndexCache(30)
+        cache.put(1, 'v', 'one', 10)
+        cache.purge(1)
+        cache.purge(2)
+        self.assertNotIn(1, cache)
+        self.assertEqual(cache.statistics()['bytes'], 0)
+
+    def test_lowering_the_ceiling_evicts(self):
+        cache = indexcache.IndexCache(30)
+        cache.put(1, 'v', 'one', 10)
+        cache.put(2, 'v', 'two', 10)
+        cache.set_max_bytes(15)
+        self.assertEqual([k for k in (1, 2) if k in cache], [2])
+
+    def test_clear(self):
+        cache = indexcache.IndexCache(30)
+        cache.put(1, 'v', 'one', 10)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.statistics()['bytes'], 0)
+
+    def test_statistics_keys(self):
+        self.assertEqual(sorted(indexcache.IndexCache(1).statistics()),
+                sorted(['entries', 'bytes', 'max_bytes', 'hits', 'misses',
+                        'hit_rate', 'evictions']))
+
+    def test_hit_rate_is_the_share_of_hits_in_all_lookups(self):
+        cache = indexcache.IndexCache(100)
+        self.assertEqual(cache.statistics()['hit_rate'], 0.0)
+        cache.put(1, 'v', 'one', 10)
+        cache.get(1, 'v')
+        cache.get(2, 'v')
+        cache.get(1, 'v')
+        cache.get(3, 'v')
+        self.assertEqual(cache.statistics()['hit_rate'], 0.5)
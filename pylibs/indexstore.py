@@ -0,0 +1,313 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Keyword indexes of files that are kept across Vim sessions.
+
+After a restart, the first completion in all buffers would have to split
+every buffer into keywords again.  Instead, the keyword index of a buffer
+that matches its file is saved to a store file in a cache directory, with
+the words, their positions and the folded tables.  The next session maps the
+store file into memory and looks the words up in the mapping directly.
+Nothing has to be decoded or folded again unless another folding is
+requested.
+
+A store is only used for an unmodified buffer with the modification time and
+size of the file and the CRC-32 of the buffer content that it was saved
+with.  The file may have changed on disk without the buffer being read
+again, so the file stamp alone does not tell what the buffer contains.  The
+checksum is a single pass over the lines, far cheaper than splitting them
+into keywords.
+
+A store file starts with a fixed header:
+
+    magic, version, mtime and size of the source file, CRC-32 of the buffer
+    content, section lengths, word count, CRC-32 of the payload
+
+The payload follows: the validity text (path, encoding and keyword
+characters) and the names of the folded tables.  Then the word offsets and
+the first positions, and for each folded table the folded word offsets and
+the word indexes.  The packed words and the packed folded words come last.
+Offsets are positions in the file, so the tables index into the mapping
+directly.  All numbers are little-endian.  A store file that is corrupt or
+does not match the buffer anymore is removed.
+"""
+
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+import filebuffers
+import keywordindex
+
+STORE_MAGIC = b'LCKWIDX\0'
+STORE_VERSION = 3
+
+# magic, version, mtime, size, content CRC-32, validity length, fold names
+# length, word count, payload CRC-32
+HEADER = struct.Struct('<8sIdQIIIII')
+
+# The bytes per step of the payload checksum
+CRC_PIECE_BYTES = 2 ** 20
+
+OFFSET_BYTES = 4
+
+# The folding functions whose tables are saved
+STORED_FOLDS = (keywordindex.fold_case,
+        keywordindex.fold_case_and_accents,
+        keywordindex.get_initials)
+
+
+class IndexStoreError(Exception):
+    """
+    The base exception for this module.
+    """
+
+def get_store_path(directory, file_path):
+    digest = hashlib.sha1(filebuffers.encode_path(file_path)).hexdigest()
+    return os.path.join(directory, 'buffer-%s.kwi' % digest)
+
+def get_validity_text(file_path, encoding, punctuation_chars):
+    """
+    Return what else has to be equal for a store file to be valid.
+    """
+    return b'\0'.join([filebuffers.encode_path(file_path),
+            encoding.encode('ascii'),
+            punctuation_chars.encode('utf-8')])
+
+def array_to_bytes(values):
+    """
+    Return the offsets or positions in values as little-endian bytes.
+    """
+    values = array.array(keywordindex.OFFSET_TYPECODE, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    if hasattr(values, 'tobytes'):
+        return values.tobytes()
+    return values.tostring()
+
+def bytes_to_array(data):
+    """
+    Return the array of offsets or positions in the little-endian bytes.
+    """
+    values = array.array(keywordindex.OFFSET_TYPECODE)
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+def get_lines_crc(lines):
+    """
+    Return the CRC-32 of the encoded or decoded lines joined with line
+    breaks.  Decoded lines are checksummed in UTF-8.
+    """
+    lines = list(lines)
+    if lines and not isinstance(lines[0], bytes):
+        data = u'\n'.join(lines).encode('utf-8', 'surrogatepass')
+    else:
+        data = b'\n'.join(lines)
+    return zlib.crc32(data) & 0xffffffff
+
+try:
+    buffer
+except NameError:
+    # Python 3
+    def get_crc(data, start):
+        """
+        Return the CRC-32 of data from start on.  A memory map is read
+        through views of CRC_PIECE_BYTES instead of being copied as a whole.
+        """
+        crc = 0
+        with memoryview(data) as view:
+            for offset in range(start, len(data), CRC_PIECE_BYTES):
+                crc = zlib.crc32(view[offset:offset + CRC_PIECE_BYTES], crc)
+        return crc & 0xffffffff
+else:
+    # Python 2 slices of a memory map are copies, and memoryview does not
+    # support them
+    def get_crc(data, start):
+        crc = 0
+        for offset in range(start, len(data), CRC_PIECE_BYTES):
+            crc = zlib.crc32(buffer(data, offset, CRC_PIECE_BYTES), crc)
+        return crc & 0xffffffff
+
+def get_absolute_offsets(words, start):
+    """
+    Return the offsets of the PackedWords moved to start at start.
+    """
+    first_offset = words.offsets[0]
+    return (offset - first_offset + start for offset in words.offsets)
+
+def get_blob(words):
+    return words.blob[words.offsets[0]:words.offsets[-1]]
+
+def get_fold_name(fold):
+    """
+    Return the name of a folded table of fold in a store file.
+    """
+    return fold.__name__.encode('ascii') + b' ' + (
+            keywordindex.get_fold_version())
+
+def dump_keyword_index(keyword_index, file_stamp, content_crc, validity):
+    """
+    Return the content of the store file for the KeywordIndex.  Its folded
+    tables of the STORED_FOLDS are saved as well.
+    """
+    words = keyword_index.words
+    folded_tables = sorted((get_fold_name(fold), table)
+            for fold, table in keyword_index.folded_tables.items()
+            if fold in STORED_FOLDS)
+    fold_names = b'\n'.join(name for name, table in folded_tables)
+    tables = [(words, keyword_index.positions)] + [table
+            for name, table in folded_tables]
+
+    blob_start = (HEADER.size
+            + len(validity)
+            + len(fold_names)
+            + len(tables) * (2 * len(words) + 1) * OFFSET_BYTES)
+    sections = [validity, fold_names]
+    blobs = []
+    for table_words, indexes in tables:
+        sections.append(array_to_bytes(
+                get_absolute_offsets(table_words, blob_start)))
+        sections.append(array_to_bytes(indexes))
+        blobs.append(get_blob(table_words))
+        blob_start += len(blobs[-1])
+    payload = b''.join(sections + blobs)
+    mtime, size = file_stamp
+    header = HEADER.pack(STORE_MAGIC,
+            STORE_VERSION,
+            mtime,
+            size,
+            content_crc,
+            len(validity),
+            len(fold_names),
+            len(words),
+            get_crc(payload, 0))
+    return header + payload
+
+def parse_keyword_index(data, file_stamp, content_crc, validity,
+        folds=(), want_trigrams=False, want_char_masks=False):
+    """
+    Return the KeywordIndex in the store file content data.  The words are
+    looked up in data directly, which may be a memory map.  Raise
+    IndexStoreError if data is corrupt or has been saved for another file
+    stamp, content or validity.
+    """
+    if len(data) < HEADER.size:
+        raise IndexStoreError("Truncated store header")
+    (magic, version, mtime, size, stored_content_crc, validity_length,
+            fold_names_length, word_count, crc) = HEADER.unpack(
+                    data[:HEADER.size])
+    if magic != STORE_MAGIC or version != STORE_VERSION:
+        raise IndexStoreError("Unknown store format")
+
+    fold_names_start = HEADER.size + validity_length
+    tables_start = fold_names_start + fold_names_length
+    if tables_start > len(data):
+        raise IndexStoreError("Store sections do not match the size")
+    fold_names = []
+    if fold_names_length:
+        fold_names = data[fold_names_start:tables_start].split(b'\n')
+    indexes_length = word_count * OFFSET_BYTES
+    table_length = 2 * indexes_length + OFFSET_BYTES
+    blob_start = tables_start + (len(fold_names) + 1) * table_length
+    if blob_start > len(data):
+        raise IndexStoreError("Store sections do not match the size")
+    if get_crc(data, HEADER.size) != crc:
+        raise IndexStoreError("Store checksum mismatch")
+    if ((mtime, size) != tuple(file_stamp)
+            or stored_content_crc != content_crc
+            or data[HEADER.size:fold_names_start] != validity):
+        raise IndexStoreError("Stale store")
+
+    # The blobs follow each other in the order of the tables
+    tables = []
+    next_blob_start = blob_start
+    for table_start in range(tables_start, blob_start, table_length):
+        indexes_start = table_start + table_length - indexes_length
+        offsets = bytes_to_array(data[table_start:indexes_start])
+        if offsets[0] != next_blob_start:
+            raise IndexStoreError("Corrupt store offsets")
+        next_blob_start = offsets[-1]
+        tables.append((keywordindex.PackedWords(data, offsets),
+                bytes_to_array(
+                        data[indexes_start:table_start + table_length])))
+    if next_blob_start != len(data):
+        raise IndexStoreError("Store sections do not match the size")
+
+    stored_folds = dict((get_fold_name(fold), fold) for fold in STORED_FOLDS)
+    words, positions = tables[0]
+    return keywordindex.KeywordIndex.from_packed(words,
+            positions,
+            folds,
+            want_trigrams,
+            want_char_masks,
+            dict((stored_folds[name], table)
+                    for name, table in zip(fold_names, tables[1:])
+                    if name in stored_folds))
+
+def remove_store(store_path):
+    try:
+        os.remove(store_path)
+    except OSError:
+        pass
+
+def load_keyword_index(store_path, file_stamp, content_crc, validity,
+        folds=(), want_trigrams=False, want_char_masks=False):
+    """
+    Map the store file into memory and return its KeywordIndex or None if
+    there is no valid one.  Invalid store files are removed.
+    """
+    try:
+        with open(store_path, 'rb') as file_object:
+            data = mmap.mmap(file_object.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+    except (IOError, OSError):
+        return None
+    except ValueError:
+        # Empty files cannot be mapped
+        remove_store(store_path)
+        return None
+    try:
+        return parse_keyword_index(data, file_stamp, content_crc,
+                validity, folds, want_trigrams, want_char_masks)
+    except IndexStoreError:
+        data.close()
+        remove_store(store_path)
+        return None
+
+def save_keyword_index(store_path, keyword_index, file_stamp,
+        content_crc, validity):
+    """
+    Save the KeywordIndex to the store file.  Failures are ignored, the next
+    session just has to build the index again.
+    """
+    try:
+        directory = os.path.dirname(store_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        filebuffers.write_file_atomically(store_path,
+                dump_keyword_index(keyword_index,
+                        file_stamp,
+                        content_crc,
+                        validity))
+    except (IOError, OSError):
+        pass
@@ -0,0 +1,160 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from pylibs import indexstore
+from pylibs import keywordindex
+
+
+class IndexStoreTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestIndexStore(unittest.TestCase):
+
+    FILE_STAMP = (1234.5, 42)
+    CONTENT_CRC = indexstore.get_lines_crc([b"beta Alpha", b"alpine"])
+    VALIDITY = indexstore.get_validity_text('/file.txt', 'utf-8', u'-')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store_path = indexstore.get_store_path(
+                os.path.join(self.directory, 'buffers'), '/file.txt')
+        self.keyword_index = keywordindex.KeywordIndex(
+                u"beta Alpha alpine beta gr\u00fc\u00dfe".split(),
+                (keywordindex.fold_case, keywordindex.get_initials))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_save(self):
+        indexstore.save_keyword_index(self.store_path, self.keyword_index,
+                self.FILE_STAMP, self.CONTENT_CRC, self.VALIDITY)
+
+    def _helper_load(self, file_stamp=FILE_STAMP, content_crc=CONTENT_CRC,
+            validity=VALIDITY, folds=()):
+        return indexstore.load_keyword_index(self.store_path, file_stamp,
+                content_crc, validity, folds)
+
+    def _helper_corrupt(self, position, replacement):
+        with open(self.store_path, 'rb') as file_object:
+            data = file_object.read()
+        with open(self.store_path, 'wb') as file_object:
+            file_object.write(data[:position] + replacement
+                    + data[position + len(replacement):])
+
+    def test_saved_index_is_loaded(self):
+        self._helper_save()
+        fold = keywordindex.fold_case
+        loaded = self._helper_load(folds=(fold,))
+        self.assertEqual(loaded.find_prefix_matches(u"AL", fold),
+                [u"Alpha", u"alpine"])
+        self.assertEqual(loaded.find_prefix_matches(u"gr"),
+                [u"gr\u00fc\u00dfe"])
+        self.assertEqual(list(loaded.positions),
+                list(self.keyword_index.positions))
+
+    def test_saved_folded_tables_are_not_computed_again(self):
+        self._helper_save()
+        create_mock = mock.Mock(
+                side_effect=keywordindex.KeywordIndex._create_folded_table)
+        with mock.patch.object(keywordindex.KeywordIndex,
+                '_create_folded_table', create_mock):
+            loaded = self._helper_load(folds=(keywordindex.get_initials,
+                    keywordindex.fold_case_and_accents))
+        self.assertEqual(create_mock.call_count, 1)
+        self.assertIs(create_mock.call_args[0][0],
+                keywordindex.fold_case_and_accents)
+        self.assertEqual(loaded.find_abbreviation_matches(u"a"),
+                [u"Alpha", u"alpine"])
+        self.assertEqual(
+                loaded.find_prefix_matches(u"GRU",
+                        keywordindex.fold_case_and_accents),
+                [u"gr\u00fc\u00dfe"])
+
+    def test_folded_tables_of_another_folding_are_computed_again(self):
+        with mock.patch.object(keywordindex, 'get_fold_version',
+                mock.Mock(return_value=b"other/1.0")):
+            self._helper_save()
+        create_mock = mock.Mock(
+                side_effect=keywordindex.KeywordIndex._create_folded_table)
+        with mock.patch.object(keywordindex.KeywordIndex,
+                '_create_folded_table', create_mock):
+            loaded = self._helper_load(folds=(keywordindex.fold_case,))
+        self.assertEqual(create_mock.call_count, 1)
+        self.assertEqual(
+                loaded.find_prefix_matches(u"al", keywordindex.fold_case),
+                [u"Alpha", u"alpine"])
+
+    def test_loaded_index_can_be_saved_again(self):
+        self._helper_save()
+        self.keyword_index = self._helper_load()
+        self._helper_save()
+        self.assertEqual(self._helper_load().find_prefix_matches(u"b"),
+                [u"beta"])
+
+    def test_missing_store_loads_nothing(self):
+        self.assertIsNone(self._helper_load())
+
+    def test_stale_stores_are_discarded(self):
+        for stale_args in [dict(file_stamp=(1234.5, 43)),
+                dict(content_crc=self.CONTENT_CRC + 1),
+                dict(validity=indexstore.get_validity_text(
+                        '/file.txt', 'latin1', u'-'))]:
+            self._helper_save()
+            self.assertIsNone(self._helper_load(**stale_args))
+            self.assertFalse(os.path.exists(self.store_path))
+
+    def test_corrupt_stores_are_discarded(self):
+        for position, replacement in [(0, b"X"),
+                (indexstore.HEADER.size + 3, b"\xff"),
+                (-1, b"")]:
+            self._helper_save()
+            if replacement:
+                self._helper_corrupt(position, replacement)
+            else:
+                with open(self.store_path, 'ab') as file_object:
+                    file_object.write(b"x")
+            self.assertIsNone(self._helper_load())
+            self.assertFalse(os.path.exists(self.store_path))
+
+    def test_empty_and_truncated_stores_are_discarded(self):
+        os.makedirs(os.path.dirname(self.store_path))
+        for content in [b"", indexstore.STORE_MAGIC]:
+            with open(self.store_path, 'wb') as file_object:
+                file_object.write(content)
+            self.assertIsNone(self._helper_load())
+            self.assertFalse(os.path.exists(self.store_path))
+
+
+class TestChecksums(unittest.TestCase):
+
+    def test_encoded_and_decoded_lines_have_the_same_crc(self):
+        self.assertEqual(indexstore.get_lines_crc([b"a", b"gr\xc3\xbc"]),
+                indexstore.get_lines_crc([u"a", u"gr\u00fc"]))
+        self.assertNotEqual(indexstore.get_lines_crc([b"a", b"b"]),
+                indexstore.get_lines_crc([b"ab"]))
+
+    def test_crc_is_computed_in_pieces(self):
+        data = b"header" + b"payload" * 5
+        with mock.patch.object(indexstore, 'CRC_PIECE_BYTES', 4):
+            self.assertEqual(indexstore.get_crc(data, 6),
+                    indexstore.get_lines_crc([b"payload" * 5]))
@@ -0,0 +1,590 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A sorted store of unique keywords that answers prefix queries.
+
+Once the keywords of a buffer are extracted, completion is a prefix query.
+Keeping them sorted makes that a binary search followed by a walk over the
+matching keywords only.
+
+The keywords are not kept as individual Python objects, which would cost
+around a hundred bytes each.  They are packed into one UTF-8 encoded blob
+with array based offset tables instead.  UTF-8 preserves the code point order
+and turns a unicode prefix into a byte prefix, so all comparisons work on the
+encoded bytes directly.
+
+For substring queries, an index can additionally map every trigram of the
+keywords to the keywords that contain it.  A query only visits the keywords
+in the posting lists of its own trigrams.
+
+Abbreviations like 'gbr' for 'get_buffer_ranges' are answered from a table
+of the segment initials of all keywords, which works like any other folded
+table.
+
+Fuzzy queries look for the typed characters in order but not necessarily next
+to each other.  A 32 bit mask of the characters in each key rejects most
+keywords with a single AND before the order of the characters is checked.
+"""
+
+import array
+import bisect
+import heapq
+import re
+import sys
+import unicodedata
+
+# The array typecode for offsets and positions.  Four bytes on all relevant
+# platforms.
+OFFSET_TYPECODE = 'I'
+
+# The length of the substrings in a TrigramTable
+GRAM_LENGTH = 3
+
+# The array typecode for character masks.  Masks have CHAR_MASK_BITS bits.
+CHAR_MASK_TYPECODE = 'I'
+CHAR_MASK_BITS = 32
+
+# Fuzzy match scores per matched character
+FUZZY_SCORE_CONSECUTIVE = 20
+FUZZY_SCORE_SEGMENT_START = 30
+
+
+class KeywordIndexError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class PackedWords(object):
+    """
+    A read-only sequence view of the encoded words in a blob.  Item i is the
+    byte string between offsets[i] and offsets[i + 1].
+    """
+
+    __slots__ = ('blob', 'offsets')
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.offsets) - 1:
+            raise IndexError("PackedWords index out of range")
+        return self.blob[self.offsets[index]:self.offsets[index + 1]]
+
+    def memory_size(self):
+        """
+        Return the approximate amount of bytes used for the storage.
+        """
+        return (sys.getsizeof(self.blob)
+                + self.offsets.buffer_info()[1] * self.offsets.itemsize)
+
+
+def pack_words(encoded_words):
+    """
+    Pack the iterable of encoded words into a PackedWords object.
+    """
+    offsets = array.array(OFFSET_TYPECODE, [0])
+    chunks = []
+    end = 0
+    for word in encoded_words:
+        chunks.append(word)
+        end += len(word)
+        offsets.append(end)
+    return PackedWords(b''.join(chunks), offsets)
+
+
+def generate_grams(text):
+    """
+    Generate the unique substrings of GRAM_LENGTH characters of text.
+    """
+    seen = set()
+    for start in range(len(text) - GRAM_LENGTH + 1):
+        gram = text[start:start + GRAM_LENGTH]
+        if gram not in seen:
+            seen.add(gram)
+            yield gram
+
+
+class TrigramTable(object):
+    """
+    Posting lists of the rows of a PackedWords table by trigram.  The sorted
+    encoded trigrams are packed into grams.  The rows that contain
+    grams[i] are rows[row_offsets[i]:row_offsets[i + 1]] in ascending order.
+    """
+
+    __slots__ = ('grams', 'row_offsets', 'rows')
+
+    def __init__(self, table):
+        """
+        table: the PackedWords with the encoded keys to index
+        """
+        postings = {}
+        for row in range(len(table)):
+            for gram in generate_grams(table[row].decode('utf-8')):
+                postings.setdefault(gram.encode('utf-8'), []).append(row)
+        self.grams = pack_words(sorted(postings))
+        self.row_offsets = array.array(OFFSET_TYPECODE, [0])
+        self.rows = array.array(OFFSET_TYPECODE)
+        for index in range(len(self.grams)):
+            self.rows.extend(postings[self.grams[index]])
+            self.row_offsets.append(len(self.rows))
+
+    def memory_size(self):
+        """
+        Return the approximate amount of bytes used by this table.
+        """
+        return (self.grams.memory_size()
+                + self.row_offsets.buffer_info()[1] * self.row_offsets.itemsize
+                + self.rows.buffer_info()[1] * self.rows.itemsize)
+
+    def get_rows(self, encoded_gram):
+        """
+        Return the ascending rows that contain the encoded trigram.
+        """
+        index = bisect.bisect_left(self.grams, encoded_gram)
+        if index == len(self.grams) or self.grams[index] != encoded_gram:
+            return self.rows[0:0]
+        return self.rows[self.row_offsets[index]:self.row_offsets[index + 1]]
+
+    def find_candidate_rows(self, text):
+        """
+        Return the rows that contain all trigrams of the unicode text.  The
+        text has to have at least GRAM_LENGTH characters.
+        """
+        posting_lists = sorted(
+                (self.get_rows(gram.encode('utf-8'))
+                        for gram in generate_grams(text)),
+                key=len)
+        candidates = set(posting_lists[0])
+        for rows in posting_lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(rows)
+        return candidates
+
+
+def find_rows_containing(table, encoded_text):
+    """
+    Return the rows of the PackedWords table that contain encoded_text.  The
+    blob is searched directly and every occurrence is mapped to its row.
+    """
+    if not encoded_text:
+        return set(range(len(table)))
+    blob = table.blob
+    offsets = table.offsets
+    # The words do not have to start at the beginning of the blob.
+    end = offsets[-1]
+    rows = set()
+    start = blob.find(encoded_text, offsets[0], end)
+    while start != -1:
+        row = bisect.bisect_right(offsets, start) - 1
+        if start + len(encoded_text) <= offsets[row + 1]:
+            rows.add(row)
+        start = blob.find(encoded_text, start + 1, end)
+    return rows
+
+
+def _fold_char(char):
+    folded = _full_fold(char)
+    if len(folded) != 1:
+        folded = char.lower()
+    if len(folded) != 1:
+        folded = char
+    return folded
+
+def _full_fold(text):
+    try:
+        return text.casefold()
+    except AttributeError:
+        # Python 2 has no casefold
+        return text.lower()
+
+def fold_case(text):
+    """
+    Return a case-insensitive key for text.
+
+    Characters are folded one by one like re.IGNORECASE compares them, so a
+    key has the length of its text and prefixes of the text fold to prefixes
+    of the key.
+    """
+    folded = _full_fold(text)
+    if len(folded) == len(text):
+        # No character expanded, so none was folded to multiple characters
+        return folded
+    return u''.join(_fold_char(char) for char in text)
+
+def fold_case_and_accents(text):
+    """
+    Return a key for text that ignores case and accents.  The NFKD
+    decomposition splits accented characters into a base character and
+    combining marks.  The marks are dropped.
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return fold_case(u''.join(char for char in decomposed
+            if not unicodedata.combining(char)))
+
+def get_fold_version():
+    """
+    Return the name of the case folding of this Python.  Python 2 folds with
+    lower() instead of casefold(), and the Unicode database changes between
+    versions.  Saved folded tables of other foldings cannot be used.
+    """
+    method = 'casefold' if hasattr(u'', 'casefold') else 'lower'
+    return ('%s/%s' % (method, unicodedata.unidata_version)).encode('ascii')
+
+
+def _starts_segment(keyword, index):
+    char = keyword[index]
+    if index == 0:
+        return True
+    previous = keyword[index - 1]
+    if not previous.isalnum():
+        return True
+    if not char.isupper():
+        return False
+    if not previous.isupper():
+        # camelCase
+        return True
+    # The last capital of an acronym starts the next word, as in HTTPServer
+    return index + 1 < len(keyword) and keyword[index + 1].islower()
+
+def get_initials(keyword):
+    """
+    Return the lowercase first characters of the segments of keyword.
+    Segments are separated by non-alphanumeric characters like '_' and start
+    at capitals in camelCase: 'getAllBufferMatches' and 'get_all_buffer_m'
+    both have the initials 'gabm'.
+    """
+    return fold_case(u''.join(char for index, char in enumerate(keyword)
+            if char.isalnum() and _starts_segment(keyword, index)))
+
+
+def get_char_mask(text):
+    """
+    Return a mask with a bit set for every character in text.  Characters
+    share bits, so a mask can only tell that a character is missing.
+    """
+    mask = 0
+    for char in set(text):
+        mask |= 1 << (ord(char) % CHAR_MASK_BITS)
+    return mask
+
+def create_char_masks(table):
+    """
+    Return an array with the character mask of every row of the PackedWords
+    table.
+    """
+    return array.array(CHAR_MASK_TYPECODE,
+            [get_char_mask(table[row].decode('utf-8'))
+                    for row in range(len(table))])
+
+def score_fuzzy_match(query, key, keyword):
+    """
+    Return the score of the leftmost match of the characters of query in
+    order in key or None if they do not occur in that order.
+
+    Matched characters that follow the previous match or start a segment of
+    keyword add to the score.  Longer keys score slightly lower.
+    """
+    # Folding functions that change the length hide the segments
+    segment_text = keyword if len(keyword) == len(key) else key
+    score = -len(key)
+    position = -1
+    for char in query:
+        found = key.find(char, position + 1)
+        if found == -1:
+            return None
+        if found == position + 1:
+            score += FUZZY_SCORE_CONSECUTIVE
+        if key[found].isalnum() and _starts_segment(segment_text, found):
+            score += FUZZY_SCORE_SEGMENT_START
+        position = found
+    return score
+
+
+class KeywordIndex(object):
+    """
+    The unique keywords of a text in sorted order, each with the position of
+    its first occurrence.
+
+    For case- or accent-insensitive queries, the index additionally stores the
+    folded keys of all keywords in sorted order together with the index of the
+    original keyword.  Pass the folding functions that will be used in
+    queries at construction.
+
+    Substring queries need trigram tables and fuzzy queries need character
+    masks, which are only built on request.  Abbreviation queries need the
+    table for the get_initials folding.
+    """
+
+    __slots__ = ('words', 'positions', 'folded_tables', 'trigram_tables',
+            'char_masks')
+
+    def __init__(self, keywords, folds=(), want_trigrams=False,
+            want_char_masks=False):
+        """
+        keywords: an iterable of unicode keywords in the order they occur in
+        the text
+        folds: the folding functions, like fold_case, to prepare tables for
+        want_trigrams: prepare substring queries for all tables
+        want_char_masks: prepare fuzzy queries for all tables
+        """
+        first_positions = {}
+        for position, keyword in enumerate(keywords):
+            if keyword not in first_positions:
+                first_positions[keyword] = position
+        encoded = sorted((keyword.encode('utf-8'), position, keyword)
+                for keyword, position in first_positions.items())
+        self.words = pack_words(word for word, position, keyword in encoded)
+        self.positions = array.array(OFFSET_TYPECODE,
+                [position for word, position, keyword in encoded])
+        self._create_tables([keyword for word, position, keyword in encoded],
+                folds,
+                want_trigrams,
+                want_char_masks)
+
+    @classmethod
+    def from_packed(cls, words, positions, folds=(), want_trigrams=False,
+            want_char_masks=False, folded_tables=None):
+        """
+        Create an index from the words and positions of another one, for
+        example one that has been saved to disk.  Only the tables for the
+        folds and query types are computed again.  folded_tables maps folds
+        to the (folded_words, word_indexes) that have been saved as well.
+        The words are only decoded for the folds without one.
+        """
+        folded_tables = folded_tables or {}
+        keyword_index = cls.__new__(cls)
+        keyword_index.words = words
+        keyword_index.positions = positions
+        keyword_index._create_tables(
+                [words[index].decode('utf-8') for index in range(len(words))]
+                        if set(folds) - set(folded_tables) else [],
+                folds,
+                want_trigrams,
+                want_char_masks,
+                folded_tables)
+        return keyword_index
+
+    def add_folded_table(self, fold, folded_words, word_indexes):
+        """
+        Add a folded table that has been computed before, for example by the
+        dictionary compiler.  folded_words are the sorted folded keys and
+        word_indexes the indexes of their words.
+        """
+        self.folded_tables[fold] = (folded_words, word_indexes)
+
+    def _create_tables(self, keywords, folds, want_trigrams,
+            want_char_masks, known_folded_tables=None):
+        """
+        Create the folded tables, the trigram tables and the character masks.
+        keywords are the decoded words.  They are only needed for folds
+        without a table in known_folded_tables.
+        """
+        if known_folded_tables is None:
+            known_folded_tables = {}
+        self.folded_tables = {}
+        for fold in folds:
+            if fold in known_folded_tables:
+                self.folded_tables[fold] = known_folded_tables[fold]
+            else:
+                self.folded_tables[fold] = self._create_folded_table(
+                        fold, keywords)
+        self.trigram_tables = {}
+        if want_trigrams:
+            self.trigram_tables[None] = TrigramTable(self.words)
+            for fold, (folded_words, word_indexes) in (
+                    self.folded_tables.items()):
+                self.trigram_tables[fold] = TrigramTable(folded_words)
+        self.char_masks = {}
+        if want_char_masks:
+            self.char_masks[None] = create_char_masks(self.words)
+            for fold, (folded_words, word_indexes) in (
+                    self.folded_tables.items()):
+                self.char_masks[fold] = create_char_masks(folded_words)
+
+    @staticmethod
+    def _create_folded_table(fold, keywords):
+        """
+        Return (folded_words, word_indexes) for the sorted keywords.
+        """
+        folded = sorted((fold(keyword).encode('utf-8'), word_index)
+                for word_index, keyword in enumerate(keywords))
+        return (pack_words(key for key, word_index in folded),
+                array.array(OFFSET_TYPECODE,
+                        [word_index for key, word_index in folded]))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def memory_size(self):
+        """
+        Return the approximate amount of bytes used by this index.
+        """
+        size = (sys.getsizeof(self)
+                + self.words.memory_size()
+                + self.positions.buffer_info()[1] * self.positions.itemsize)
+        for folded_words, word_indexes in self.folded_tables.values():
+            size += (folded_words.memory_size()
+                    + word_indexes.buffer_info()[1] * word_indexes.itemsize)
+        for trigram_table in self.trigram_tables.values():
+            size += trigram_table.memory_size()
+        for masks in self.char_masks.values():
+            size += masks.buffer_info()[1] * masks.itemsize
+        return size
+
+    def _get_table(self, fold):
+        """
+        Return (table, word_indexes) for queries with the folding function
+        fold.  word_indexes is None for the unfolded words.
+        """
+        if fold is None:
+            return (self.words, None)
+        try:
+            return self.folded_tables[fold]
+        except KeyError:
+            raise KeywordIndexError("No table for the requested folding")
+
+    def _get_ordered_words(self, rows, word_indexes):
+        """
+        Return the words of the table rows in the order of their first
+        occurrence.
+        """
+        found = []
+        for row in rows:
+            word_index = row if word_indexes is None else word_indexes[row]
+            found.append((self.positions[word_index], word_index))
+        found.sort()
+        return [self.words[word_index].decode('utf-8')
+                for position, word_index in found]
+
+    def find_prefix_matches(self, keyword_base, fold=None):
+        """
+        Return all keywords that start with keyword_base and are longer than
+        it.  They are returned in the order of their first occurrence.
+
+        fold: compare the keys produced by this folding function instead of
+        the keywords.  The index has to be built for it.
+        """
+        table, word_indexes = self._get_table(fold)
+        if fold is not None:
+            keyword_base = fold(keyword_base)
+
+        encoded_base = keyword_base.encode('utf-8')
+        rows = []
+        index = bisect.bisect_left(table, encoded_base)
+        while index < len(table):
+            key = table[index]
+            if not key.startswith(encoded_base):
+                break
+            if len(key) > len(encoded_base):
+                rows.append(index)
+            index += 1
+        return self._get_ordered_words(rows, word_indexes)
+
+    def find_abbreviation_matches(self, abbreviation):
+        """
+        Return all keywords other than abbreviation whose segment initials are
+        the abbreviation ignoring case.  They are returned in the order of
+        their first occurrence.  The index has to be built for the
+        get_initials folding.
+        """
+        table, word_indexes = self._get_table(get_initials)
+        encoded_key = fold_case(abbreviation).encode('utf-8')
+        rows = []
+        index = bisect.bisect_left(table, encoded_key)
+        while index < len(table) and table[index] == encoded_key:
+            rows.append(index)
+            index += 1
+        return [word for word in self._get_ordered_words(rows, word_indexes)
+                if word != abbreviation]
+
+    def find_substring_matches(self, keyword_base, fold=None):
+        """
+        Return all keywords that contain keyword_base anywhere and are longer
+        than it in the order of their first occurrence.  The index has to be
+        built with want_trigrams.
+
+        fold: compare the keys produced by this folding function instead of
+        the keywords.  The index has to be built for it.
+        """
+        table, word_indexes = self._get_table(fold)
+        try:
+            trigram_table = self.trigram_tables[fold]
+        except KeyError:
+            raise KeywordIndexError("No trigram table for the requested table")
+        if fold is not None:
+            keyword_base = fold(keyword_base)
+
+        encoded_base = keyword_base.encode('utf-8')
+        if len(keyword_base) < GRAM_LENGTH:
+            # Too short for trigrams.  Search the blob of all keys instead.
+            candidates = find_rows_containing(table, encoded_base)
+        else:
+            candidates = [row
+                    for row in trigram_table.find_candidate_rows(keyword_base)
+                    if encoded_base in table[row]]
+        return self._get_ordered_words(
+                [row for row in candidates
+                        if len(table[row]) > len(encoded_base)],
+                word_indexes)
+
+    def find_fuzzy_matches(self, keyword_base, fold=None, limit=0):
+        """
+        Return (score, keyword) for the keywords that contain the characters
+        of keyword_base in order and are longer than it.  They are returned by
+        descending score and in the order of their first occurrence for equal
+        scores.  The index has to be built with want_char_masks.
+
+        fold: compare the keys produced by this folding function instead of
+        the keywords.  The index has to be built for it.
+        limit: only return this many of the best matches, 0 for all
+        """
+        table, word_indexes = self._get_table(fold)
+        try:
+            masks = self.char_masks[fold]
+        except KeyError:
+            raise KeywordIndexError("No character masks for the requested "
+                    "table")
+        query = keyword_base if fold is None else fold(keyword_base)
+        query_mask = get_char_mask(query)
+        # The characters in order on the encoded keys.  UTF-8 sequences
+        # cannot match in the middle of other characters.
+        needle = re.compile(b'.*?'.join(re.escape(char.encode('utf-8'))
+                for char in query), re.DOTALL)
+
+        ranked = []
+        for row in [row for row, mask in enumerate(masks)
+                if mask & query_mask == query_mask]:
+            if needle.search(table[row]) is None:
+                continue
+            key = table[row].decode('utf-8')
+            if len(key) <= len(query):
+                continue
+            word_index = row if word_indexes is None else word_indexes[row]
+            keyword = self.words[word_index].decode('utf-8')
+            ranked.append((-score_fuzzy_match(query, key, keyword),
+                    self.positions[word_index],
+                    keyword))
+
+        if limit:
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [(-negated_score, keyword)
+                for negated_score, position, keyword in ranked]
@@ -0,0 +1,370 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import array
+import unittest
+
+from pylibs import keywordindex
+
+
+class KeywordIndexTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestKeywordIndex(unittest.TestCase):
+
+    def _helper_prefix_test(self, keywords, keyword_base, expected_result):
+        keyword_index = keywordindex.KeywordIndex(keywords.split())
+        self.assertEqual(keyword_index.find_prefix_matches(keyword_base),
+                expected_result.split())
+
+    def test_keywords_are_unique(self):
+        keyword_index = keywordindex.KeywordIndex(u"b a b c a".split())
+        self.assertEqual(len(keyword_index), 3)
+
+    def test_matches_are_in_the_order_of_their_first_occurrence(self):
+        self._helper_prefix_test(
+                keywords=u"prize none priory prize primary priory",
+                keyword_base=u"pri",
+                expected_result=u"prize priory primary")
+
+    def test_the_keyword_base_itself_is_no_match(self):
+        self._helper_prefix_test(
+                keywords=u"pri prize pr",
+                keyword_base=u"pri",
+                expected_result=u"prize")
+
+    def test_matches_are_case_sensitive(self):
+        self._helper_prefix_test(
+                keywords=u"Priory prize PRIMARY primary",
+                keyword_base=u"pri",
+                expected_result=u"prize primary")
+
+    def test_an_empty_keyword_base_matches_everything(self):
+        self._helper_prefix_test(
+                keywords=u"b a b c",
+                keyword_base=u"",
+                expected_result=u"b a c")
+
+    def test_unicode_keywords(self):
+        self._helper_prefix_test(
+                keywords=u"\u00fcber \u00fcberfu\u00df uber \u00dcber",
+                keyword_base=u"\u00fcb",
+                expected_result=u"\u00fcber \u00fcberfu\u00df")
+
+    def test_no_matches_beyond_the_last_keyword(self):
+        self._helper_prefix_test(
+                keywords=u"a b c",
+                keyword_base=u"z",
+                expected_result=u"")
+
+    def test_case_insensitive_matches_keep_their_spelling(self):
+        keyword_index = keywordindex.KeywordIndex(
+                u"Priory prize PRIMARY pri Pr".split(),
+                (keywordindex.fold_case,))
+        self.assertEqual(keyword_index.find_prefix_matches(
+                u"pRI", keywordindex.fold_case),
+                u"Priory prize PRIMARY".split())
+
+    def test_accent_insensitive_matches(self):
+        keyword_index = keywordindex.KeywordIndex(
+                u"\u00dcber uber \u00fcberfu\u00df ubel".split(),
+                (keywordindex.fold_case_and_accents,))
+        self.assertEqual(keyword_index.find_prefix_matches(
+                u"\u00fcbe", keywordindex.fold_case_and_accents),
+                u"\u00dcber uber \u00fcberfu\u00df ubel".split())
+
+    def test_queries_need_a_prepared_folding(self):
+        keyword_index = keywordindex.KeywordIndex(u"a b".split())
+        with self.assertRaises(keywordindex.KeywordIndexError):
+            keyword_index.find_prefix_matches(u"a", keywordindex.fold_case)
+
+    def test_folded_tables_are_part_of_the_memory_size(self):
+        keywords = u"a b c".split()
+        self.assertLess(
+                keywordindex.KeywordIndex(keywords).memory_size(),
+                keywordindex.KeywordIndex(
+                        keywords, (keywordindex.fold_case,)).memory_size())
+
+    def test_memory_size_is_far_below_a_set_of_unicode_objects(self):
+        keywords = [u"keyword%d" % i for i in range(1000)]
+        keyword_index = keywordindex.KeywordIndex(keywords)
+        self.assertLess(keyword_index.memory_size(), 1000 * 30)
+
+
+class TestFolding(unittest.TestCase):
+
+    def test_fold_case(self):
+        self.assertEqual(keywordindex.fold_case(u"\u00dcBer_1"),
+                u"\u00fcber_1")
+
+    def test_fold_case_keeps_the_length(self):
+        text = u"Stra\u00dfe \u0130stanbul \ufb01x"
+        self.assertEqual(len(keywordindex.fold_case(text)), len(text))
+
+    def test_fold_case_and_accents(self):
+        self.assertEqual(keywordindex.fold_case_and_accents(u"\u00dcB\u00e9r"),
+                u"uber")
+
+
+class TestPackWords(unittest.TestCase):
+
+    def test_items_are_the_packed_words(self):
+        packed = keywordindex.pack_words([b"a", b"", b"bcd"])
+        self.assertEqual(len(packed), 3)
+        self.assertEqual([packed[i] for i in range(3)], [b"a", b"", b"bcd"])
+
+    def test_index_out_of_range(self):
+        packed = keywordindex.pack_words([b"a"])
+        with self.assertRaises(IndexError):
+            packed[1]
+
+    def test_empty_sequence(self):
+        self.assertEqual(len(keywordindex.pack_words([])), 0)
+
+
+class TestFromPacked(unittest.TestCase):
+
+    KEYWORDS = u"beta Alpha alpine beta gamma".split()
+
+    def test_queries_are_answered_like_the_original(self):
+        original = keywordindex.KeywordIndex(self.KEYWORDS)
+        fold = keywordindex.fold_case
+        copy = keywordindex.KeywordIndex.from_packed(original.words,
+                original.positions, (fold,), True, True)
+        self.assertEqual(copy.find_prefix_matches(u"al", fold),
+                [u"Alpha", u"alpine"])
+        self.assertEqual(copy.find_substring_matches(u"amm"), [u"gamma"])
+        self.assertEqual(copy.find_fuzzy_matches(u"gm", fold),
+                [(copy.find_fuzzy_matches(u"gm")[0][0], u"gamma")])
+
+    def test_words_may_start_inside_the_blob(self):
+        words = keywordindex.PackedWords(b"xxxabcbcd",
+                array.array(keywordindex.OFFSET_TYPECODE, [3, 6, 9]))
+        keyword_index = keywordindex.KeywordIndex.from_packed(words,
+                array.array(keywordindex.OFFSET_TYPECODE, [0, 1]))
+        self.assertEqual(keyword_index.find_prefix_matches(u"a"), [u"abc"])
+        self.assertEqual(keywordindex.find_rows_containing(words, b"x"),
+                set())
+        self.assertEqual(keywordindex.find_rows_containing(words, b"bc"),
+                set([0, 1]))
+
+
+class TestSubstringMatches(unittest.TestCase):
+
+    def _helper_substring_test(self, keywords, keyword_base, expected_result,
+            fold=None):
+        folds = () if fold is None else (fold,)
+        keyword_index = keywordindex.KeywordIndex(
+                keywords.split(), folds, want_trigrams=True)
+        self.assertEqual(
+                keyword_index.find_substring_matches(keyword_base, fold),
+                expected_result.split())
+
+    def test_matches_in_the_middle_of_keywords(self):
+        self._helper_substring_test(
+                keywords=u"getBufferRanges ranges Ranges RangesX noRange",
+                keyword_base=u"Ranges",
+                expected_result=u"getBufferRanges RangesX")
+
+    def test_short_keyword_bases_without_trigrams(self):
+        self._helper_substring_test(
+                keywords=u"abc bcd cab b ab",
+                keyword_base=u"ab",
+                expected_result=u"abc cab")
+
+    def test_matches_do_not_span_keywords(self):
+        self._helper_substring_test(
+                keywords=u"xa bx ab",
+                keyword_base=u"ab",
+                expected_result=u"")
+
+    def test_all_trigrams_have_to_match(self):
+        self._helper_substring_test(
+                keywords=u"abcd bcde abce xabcde",
+                keyword_base=u"abcde",
+                expected_result=u"xabcde")
+
+    def test_an_empty_keyword_base_matches_everything(self):
+        self._helper_substring_test(
+                keywords=u"b a b",
+                keyword_base=u"",
+                expected_result=u"b a")
+
+    def test_case_insensitive_matches(self):
+        self._helper_substring_test(
+                keywords=u"getBufferRanges RANGED ranges",
+                keyword_base=u"rAnge",
+                expected_result=u"getBufferRanges RANGED ranges",
+                fold=keywordindex.fold_case)
+
+    def test_unicode_keywords(self):
+        self._helper_substring_test(
+                keywords=u"gr\u00fc\u00dfe gr\u00fcn \u00fc\u00dfx",
+                keyword_base=u"\u00fc\u00df",
+                expected_result=u"gr\u00fc\u00dfe \u00fc\u00dfx")
+
+    def test_queries_need_trigram_tables(self):
+        keyword_index = keywordindex.KeywordIndex(u"abc".split())
+        with self.assertRaises(keywordindex.KeywordIndexError):
+            keyword_index.find_substring_matches(u"abc")
+
+    def test_trigram_tables_are_part_of_the_memory_size(self):
+        keywords = u"abcd bcde".split()
+        self.assertLess(
+                keywordindex.KeywordIndex(keywords).memory_size(),
+                keywordindex.KeywordIndex(
+                        keywords, want_trigrams=True).memory_size())
+
+
+class TestTrigramTable(unittest.TestCase):
+
+    def test_posting_lists_are_ascending_rows(self):
+        table = keywordindex.TrigramTable(
+                keywordindex.pack_words([b"abcd", b"xbcd", b"abc"]))
+        self.assertEqual(list(table.get_rows(b"bcd")), [0, 1])
+        self.assertEqual(list(table.get_rows(b"abc")), [0, 2])
+        self.assertEqual(list(table.get_rows(b"zzz")), [])
+
+
+class TestAbbreviationMatches(unittest.TestCase):
+
+    def _helper_abbreviation_test(self, keywords, abbreviation,
+            expected_result):
+        keyword_index = keywordindex.KeywordIndex(
+                keywords.split(), (keywordindex.get_initials,))
+        self.assertEqual(
+                keyword_index.find_abbreviation_matches(abbreviation),
+                expected_result.split())
+
+    def test_snake_case_and_camel_case(self):
+        self._helper_abbreviation_test(
+                keywords=(u"getAllBufferMatches get_buffer_ranges "
+                        u"get_all_buffer_matches gabm gAllBuffersMatch"),
+                abbreviation=u"gABM",
+                expected_result=(u"getAllBufferMatches get_all_buffer_matches "
+                        u"gAllBuffersMatch"))
+
+    def test_initials_have_to_match_completely(self):
+        self._helper_abbreviation_test(
+                keywords=u"get_buffer_ranges get_buffer gbr_x",
+                abbreviation=u"gb",
+                expected_result=u"get_buffer")
+
+    def test_the_abbreviation_itself_is_no_match(self):
+        self._helper_abbreviation_test(
+                keywords=u"g get go",
+                abbreviation=u"g",
+                expected_result=u"get go")
+
+    def test_queries_need_the_initials_table(self):
+        keyword_index = keywordindex.KeywordIndex(u"a_b".split())
+        with self.assertRaises(keywordindex.KeywordIndexError):
+            keyword_index.find_abbreviation_matches(u"ab")
+
+
+class TestGetInitials(unittest.TestCase):
+
+    def test_separators_and_capitals_start_segments(self):
+        self.assertEqual(keywordindex.get_initials(u"get_bufferRanges"),
+                u"gbr")
+
+    def test_acronyms_are_one_segment(self):
+        self.assertEqual(keywordindex.get_initials(u"parseHTTPServer2"),
+                u"phs")
+
+    def test_leading_and_repeated_separators(self):
+        self.assertEqual(keywordindex.get_initials(u"__init__x"), u"ix")
+
+    def test_unicode_capitals(self):
+        self.assertEqual(keywordindex.get_initials(u"gro\u00dfe\u00dcbung"),
+                u"g\u00fc")
+
+
+class TestFuzzyMatches(unittest.TestCase):
+
+    def _helper_fuzzy_index(self, keywords, fold=None):
+        folds = () if fold is None else (fold,)
+        return keywordindex.KeywordIndex(
+                keywords.split(), folds, want_char_masks=True)
+
+    def _helper_fuzzy_test(self, keywords, keyword_base, expected_result,
+            fold=None, limit=0):
+        keyword_index = self._helper_fuzzy_index(keywords, fold)
+        self.assertEqual(
+                [keyword for score, keyword in
+                        keyword_index.find_fuzzy_matches(
+                                keyword_base, fold, limit)],
+                expected_result.split())
+
+    def test_characters_have_to_occur_in_order(self):
+        self._helper_fuzzy_test(
+                keywords=u"rbg gxbxr grb gbr",
+                keyword_base=u"gbr",
+                expected_result=u"gxbxr")
+
+    def test_segment_starts_and_consecutive_characters_rank_first(self):
+        self._helper_fuzzy_test(
+                keywords=u"gabbro get_buffer_ranges gbrx",
+                keyword_base=u"gbr",
+                expected_result=u"gbrx get_buffer_ranges gabbro")
+
+    def test_equal_scores_keep_the_order_of_occurrence(self):
+        self._helper_fuzzy_test(
+                keywords=u"axb ayb azb",
+                keyword_base=u"ab",
+                expected_result=u"axb ayb azb")
+
+    def test_limit_selects_the_best_matches(self):
+        self._helper_fuzzy_test(
+                keywords=u"gabbro get_buffer_ranges gbrx",
+                keyword_base=u"gbr",
+                expected_result=u"gbrx get_buffer_ranges",
+                limit=2)
+
+    def test_case_insensitive_matches(self):
+        self._helper_fuzzy_test(
+                keywords=u"getBufferRanges GBRX gbr",
+                keyword_base=u"gBr",
+                expected_result=u"GBRX getBufferRanges",
+                fold=keywordindex.fold_case)
+
+    def test_scores_are_returned(self):
+        keyword_index = self._helper_fuzzy_index(u"ab")
+        self.assertEqual(keyword_index.find_fuzzy_matches(u"a"),
+                [(keywordindex.FUZZY_SCORE_CONSECUTIVE
+                        + keywordindex.FUZZY_SCORE_SEGMENT_START - 2,
+                        u"ab")])
+
+    def test_queries_need_char_masks(self):
+        keyword_index = keywordindex.KeywordIndex(u"ab".split())
+        with self.assertRaises(keywordindex.KeywordIndexError):
+            keyword_index.find_fuzzy_matches(u"a")
+
+
+class TestGetCharMask(unittest.TestCase):
+
+    def test_missing_characters_are_detected(self):
+        mask = keywordindex.get_char_mask(u"abc")
+        self.assertEqual(mask & keywordindex.get_char_mask(u"ca"),
+                keywordindex.get_char_mask(u"ca"))
+        self.assertNotEqual(mask & keywordindex.get_char_mask(u"d"),
+                keywordindex.get_char_mask(u"d"))
+
+    def test_masks_fit_the_array_type(self):
+        masks = keywordindex.create_char_masks(keywordindex.pack_words(
+                [u"\u00fc\uffff_~".encode('utf-8')]))
+        self.assertEqual(len(masks), 1)
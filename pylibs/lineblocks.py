@@ -0,0 +1,194 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Summaries of blocks of lines that rule out blocks which cannot contain a match.
+
+Most lines of a big buffer cannot contain the typed keyword base at all.  For
+every block of lines, a summary records which bytes occur in it, with ASCII
+letters folded to lowercase.  The summary is a 256 bit integer with bit n set
+if byte n occurs.  A line can only contain the keyword base if its block
+contains all bytes of the keyword base.
+
+The summaries work on the encoded lines, so nothing has to be decoded to
+build them.  Decoded lines, as Python 3 Vim passes them, are summarized by
+their characters instead.  ASCII characters have the bit of their byte, and
+other characters share the upper 128 bits by their code point modulo 128.
+
+A summary keeps the lines of its blocks.  After a change of the lines, it is
+updated in place and only the blocks whose lines differ are summarized again.
+"""
+
+import string
+
+ASCII_LETTERS_MASK = sum(1 << byte
+        for byte in bytearray(string.ascii_letters.lower().encode('ascii')))
+NON_ASCII_MASK = sum(1 << byte for byte in range(128, 256))
+
+try:
+    ASCII_LOWERCASE_TABLE = bytes.maketrans(
+            string.ascii_uppercase.encode('ascii'),
+            string.ascii_lowercase.encode('ascii'))
+except AttributeError:
+    # Python 2.  Note that str.lower() would depend on the locale.
+    ASCII_LOWERCASE_TABLE = string.maketrans(
+            string.ascii_uppercase, string.ascii_lowercase)
+
+ASCII_LOWERCASE_TEXT_TABLE = dict((ord(upper), ord(lower))
+        for upper, lower in zip(string.ascii_uppercase,
+                string.ascii_lowercase))
+
+
+class LineBlocksError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+def get_byte_mask(data):
+    """
+    Return the summary mask for the bytes in data.
+    """
+    mask = 0
+    for byte in set(bytearray(data.translate(ASCII_LOWERCASE_TABLE))):
+        mask |= 1 << byte
+    return mask
+
+def get_text_mask(text):
+    """
+    Return the summary mask for the characters in the decoded text.
+    """
+    mask = 0
+    for char in set(text.translate(ASCII_LOWERCASE_TEXT_TABLE)):
+        code = ord(char)
+        mask |= 1 << (code if code < 128 else 128 + code % 128)
+    return mask
+
+def get_mask(data):
+    """
+    Return the summary mask of encoded or decoded data.
+    """
+    if isinstance(data, bytes):
+        return get_byte_mask(data)
+    return get_text_mask(data)
+
+def join_block(lines):
+    """
+    Return the lines of a block joined with line breaks.  The lines are
+    either all encoded or all decoded.
+    """
+    if lines and not isinstance(lines[0], bytes):
+        return u'\n'.join(lines)
+    return b'\n'.join(lines)
+
+def get_required_masks(encoded_keyword_base, want_ignorecase):
+    """
+    Return (strict_mask, relaxed_mask) with the bytes a block has to contain
+    to possibly match the encoded keyword base.  A decoded keyword base is
+    required for summaries of decoded lines.
+
+    When ignoring case, the other case of a non-ASCII character is a different
+    byte sequence and cannot be required.  Some non-ASCII characters even
+    match ASCII letters ignoring case, like the Kelvin sign and 'k'.  Blocks
+    with non-ASCII bytes only have to contain the relaxed mask without ASCII
+    letters then.
+    """
+    strict_mask = get_mask(encoded_keyword_base)
+    if not want_ignorecase:
+        return (strict_mask, strict_mask)
+    strict_mask &= ~NON_ASCII_MASK
+    return (strict_mask, strict_mask & ~ASCII_LETTERS_MASK)
+
+
+class LineBlockSummary(object):
+    """
+    The byte masks of consecutive blocks of block_size lines, along with the
+    lines of each block to tell which blocks changed.
+    """
+
+    __slots__ = ('block_size', 'masks', 'blocks', 'line_bytes')
+
+    def __init__(self, lines, block_size):
+        """
+        lines: a sequence of encoded or decoded lines that supports slicing
+        """
+        self.block_size = block_size
+        self.masks = []
+        self.blocks = []
+        self.line_bytes = 0
+        self.update(lines)
+
+    def update(self, lines):
+        """
+        Take over a later state of the lines.  Only the blocks whose lines are
+        not equal to the kept ones are summarized again.
+        """
+        block_size = self.block_size
+        block_count = (len(lines) + block_size - 1) // block_size
+        for block in self.blocks[block_count:]:
+            self.line_bytes -= sum(len(line) for line in block)
+        del self.masks[block_count:]
+        del self.blocks[block_count:]
+        for block_number in range(block_count):
+            start = block_number * block_size
+            block = lines[start:start + block_size]
+            if block_number < len(self.blocks):
+                old_block = self.blocks[block_number]
+                if block == old_block:
+                    continue
+                self.line_bytes -= sum(len(line) for line in old_block)
+                self.blocks[block_number] = block
+                self.masks[block_number] = get_mask(join_block(block))
+            else:
+                self.blocks.append(block)
+                self.masks.append(get_mask(join_block(block)))
+            self.line_bytes += sum(len(line) for line in block)
+
+    def memory_size(self):
+        """
+        Return the approximate amount of bytes used by this summary.
+        """
+        # Two list slots, a 256 bit integer and a list of lines for each
+        # block, and the kept lines
+        return (128
+                + len(self.masks) * (16 + 60 + 64)
+                + len(self.masks) * self.block_size * 40
+                + self.line_bytes)
+
+    def find_candidate_blocks(self, encoded_keyword_base, want_ignorecase):
+        """
+        Return the set of block numbers that might contain the keyword base.
+        """
+        strict_mask, relaxed_mask = get_required_masks(
+                encoded_keyword_base, want_ignorecase)
+        candidates = set()
+        for block_number, mask in enumerate(self.masks):
+            if (mask & strict_mask == strict_mask
+                    or (mask & NON_ASCII_MASK
+                            and mask & relaxed_mask == relaxed_mask)):
+                candidates.add(block_number)
+        return candidates
+
+    def get_line_predicate(self, encoded_keyword_base, want_ignorecase):
+        """
+        Return a function that tells for a line index whether the line might
+        contain the keyword base.
+        """
+        candidates = self.find_candidate_blocks(
+                encoded_keyword_base, want_ignorecase)
+        block_size = self.block_size
+
+        def could_match(line_index):
+            return line_index // block_size in candidates
+
+        return could_match
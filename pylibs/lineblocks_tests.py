@@ -0,0 +1,146 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import unittest
+
+from pylibs import lineblocks
+
+
+class LineBlocksTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+KELVIN_SIGN = u"\u212a".encode('utf-8')
+U_UMLAUT = u"\u00fc".encode('utf-8')
+
+
+class TestLineBlockSummary(unittest.TestCase):
+
+    def _helper_candidates(self, lines, keyword_base, want_ignorecase,
+            block_size=2):
+        summary = lineblocks.LineBlockSummary(lines, block_size)
+        return summary.find_candidate_blocks(keyword_base, want_ignorecase)
+
+    def test_blocks_without_all_bytes_are_ruled_out(self):
+        self.assertEqual(
+                self._helper_candidates(
+                        [b"pri", b"none", b"xyz", b"p r i", b"ip", b"x"],
+                        b"pri",
+                        False),
+                set([0, 1]))
+
+    def test_a_block_may_contain_the_bytes_in_separate_lines(self):
+        self.assertEqual(
+                self._helper_candidates([b"p", b"ri"], b"pri", False),
+                set([0]))
+
+    def test_the_last_block_may_be_shorter(self):
+        self.assertEqual(
+                self._helper_candidates([b"a", b"b", b"pri"], b"pri", False),
+                set([1]))
+
+    def test_ascii_case_is_ignored_in_the_summary(self):
+        self.assertEqual(
+                self._helper_candidates([b"PRI", b"x", b"p", b"x"],
+                        b"pRi",
+                        False),
+                set([0]))
+
+    def test_non_ascii_bytes_are_required_when_matching_case(self):
+        self.assertEqual(
+                self._helper_candidates(
+                        [b"\xc3", b"x", U_UMLAUT + b"ber", b"x"],
+                        U_UMLAUT,
+                        False),
+                set([1]))
+
+    def test_non_ascii_bytes_are_not_required_when_ignoring_case(self):
+        self.assertEqual(
+                self._helper_candidates(
+                        [u"\u00dcber".encode('utf-8'), b"x", b"bar", b"x"],
+                        U_UMLAUT + b"b",
+                        True),
+                set([0, 1]))
+
+    def test_non_ascii_blocks_might_match_ascii_letters_ignoring_case(self):
+        self.assertEqual(
+                self._helper_candidates(
+                        [KELVIN_SIGN + b"-a", b"x", b"k", b"x", b"-", b"x"],
+                        b"k-",
+                        True),
+                set([0]))
+
+    def test_an_empty_keyword_base_rules_out_nothing(self):
+        self.assertEqual(
+                self._helper_candidates([b"a", b"b", b"c"], b"", False),
+                set([0, 1]))
+
+    def test_line_predicate(self):
+        summary = lineblocks.LineBlockSummary(
+                [b"a", b"b", b"c", b"d", b"a"], 2)
+        could_match = summary.get_line_predicate(b"a", False)
+        self.assertEqual([could_match(i) for i in range(5)],
+                [True, True, False, False, True])
+
+    def test_decoded_lines_are_summarized_by_their_characters(self):
+        self.assertEqual(
+                self._helper_candidates(
+                        [u"\u00dcber", u"x", u"\u00fcber", u"x", u"Pri"],
+                        u"\u00fcb",
+                        False),
+                set([1]))
+        self.assertEqual(
+                self._helper_candidates(
+                        [u"\u00dcber", u"x", u"bar", u"x", u"Pri"],
+                        u"\u00fcb",
+                        True),
+                set([0, 1]))
+        self.assertEqual(
+                self._helper_candidates(
+                        [u"\u212a-a", u"x", u"k", u"x", u"PRI"],
+                        u"pri",
+                        False),
+                set([2]))
+
+    def test_only_changed_blocks_are_summarized_again(self):
+        summary = lineblocks.LineBlockSummary(
+                [b"a", b"b", b"c", b"d", b"e"], 2)
+        mask_mock = mock.Mock(side_effect=lineblocks.get_mask)
+        with mock.patch.object(lineblocks, 'get_mask', mask_mock):
+            summary.update([b"a", b"b", b"c", b"x", b"e", b"f"])
+        self.assertEqual(mask_mock.call_args_list,
+                [mock.call(b"c\nx"), mock.call(b"e\nf")])
+        self.assertEqual(summary.find_candidate_blocks(b"x", False),
+                set([1]))
+        self.assertEqual(summary.find_candidate_blocks(b"f", False),
+                set([2]))
+
+    def test_blocks_beyond_the_last_line_are_dropped(self):
+        summary = lineblocks.LineBlockSummary([b"a", b"b", b"c"], 2)
+        summary.update([b"a"])
+        self.assertEqual(summary.masks, [lineblocks.get_mask(b"a")])
+        self.assertEqual(summary.line_bytes, 1)
+
+    def test_memory_size_grows_with_the_line_length(self):
+        self.assertLess(
+                lineblocks.LineBlockSummary([b"a"] * 10, 2).memory_size(),
+                lineblocks.LineBlockSummary([b"a" * 9] * 10, 2).memory_size())
+
+    def test_memory_size_grows_with_the_block_count(self):
+        self.assertLess(
+                lineblocks.LineBlockSummary([b"a"] * 10, 2).memory_size(),
+                lineblocks.LineBlockSummary([b"a"] * 20, 2).memory_size())
@@ -0,0 +1,121 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The keywords of the lines of a buffer for repeated searches of nearly the same
+lines.
+
+Consecutive completions at nearby cursor positions search mostly the same
+lines.  Splitting each of them into keywords again is wasted work if the line
+did not change.  The cache keeps the keywords of every line that the last
+search looked at, keyed by the line index, together with the line they were
+taken from.  A line is only split again if it entered the searched range or
+has been edited since.
+
+Identical lines also show up in many buffers, for example in split windows of
+the same file or in vendored copies.  get_shared_tokens() looks the keywords
+up by the content of the line in a cache that all buffers share.
+"""
+
+import tokenizer
+import vimtext
+
+
+class LineTokensError(Exception):
+    """
+    The base exception for this module.
+    """
+
+def get_tokens_size(line, tokens):
+    """
+    Return the approximate amount of bytes used by a cached line and its
+    keywords.
+    """
+    return 100 + len(line) + sum(50 + 4 * len(token) for token in tokens)
+
+def get_shared_tokens(cache, line, encoding, punctuation_chars):
+    """
+    Return the tuple of keywords of the encoded line.  They are looked up by
+    the line in the IndexCache cache.  Lines that are not cached yet are
+    split and stored.
+    """
+    validity = (encoding, punctuation_chars)
+    tokens = cache.get(line, validity)
+    if tokens is None:
+        tokens = tuple(tokenizer.tokenize(
+                vimtext.to_text(line, encoding), punctuation_chars))
+        cache.put(line, validity, tokens, get_tokens_size(line, tokens))
+    return tokens
+
+
+class LineTokensCache(object):
+    """
+    The keywords of the lines of one buffer by line index.
+
+    A search gets the keywords of its lines with get_tokens() and calls
+    finish_search() at the end.  Lines that the finished search did not look
+    at are forgotten then, so the cache follows the searched range as the
+    cursor moves.
+    """
+
+    __slots__ = ('encoding', 'punctuation_chars', 'entries', 'next_entries',
+            'size', 'hits', 'misses')
+
+    def __init__(self, encoding, punctuation_chars):
+        """
+        punctuation_chars: the additional keyword characters as unicode
+        """
+        self.encoding = encoding
+        self.punctuation_chars = punctuation_chars
+        self.entries = {}
+        self.next_entries = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_tokens(self, line_index, line):
+        """
+        Return the keywords of the encoded line with the line index.  The line
+        is compared with the cached one, so edited lines are split again.
+        """
+        entry = self.next_entries.get(line_index)
+        if entry is None:
+            entry = self.entries.get(line_index)
+        if entry is None or entry[0] != line:
+            self.misses += 1
+            entry = (line, tokenizer.tokenize(
+                    vimtext.to_text(line, self.encoding),
+                    self.punctuation_chars))
+        else:
+            self.hits += 1
+        self.next_entries[line_index] = entry
+        return entry[1]
+
+    def finish_search(self):
+        """
+        Keep the lines of the search since the last call only.
+        """
+        self.entries = self.next_entries
+        self.next_entries = {}
+        self.size = 64 + sum(get_tokens_size(line, tokens)
+                for line, tokens in self.entries.values())
+
+    def memory_size(self):
+        """
+        Return the approximate amount of bytes used by the cached keywords as
+        of the last finished search.
+        """
+        return self.size
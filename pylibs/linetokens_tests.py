@@ -0,0 +1,103 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import unittest
+
+from pylibs import indexcache
+from pylibs import linetokens
+
+
+class LineTokensTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestLineTokensCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = linetokens.LineTokensCache('utf-8', u'-')
+        self.tokenize_mock = mock.Mock(
+                side_effect=linetokens.tokenizer.tokenize)
+        patcher = mock.patch.object(linetokens.tokenizer, 'tokenize',
+                self.tokenize_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _helper_search(self, indexed_lines):
+        tokens = [self.cache.get_tokens(line_index, line)
+                for line_index, line in indexed_lines]
+        self.cache.finish_search()
+        return tokens
+
+    def test_lines_are_split_into_keywords(self):
+        self.assertEqual(
+                self._helper_search([(0, b"one two-three"), (1, b"+four")]),
+                [[u"one", u"two-three"], [u"four"]])
+
+    def test_lines_are_decoded(self):
+        self.assertEqual(
+                self._helper_search([(0, u"\u00fcber".encode('utf-8'))]),
+                [[u"\u00fcber"]])
+
+    def test_unchanged_lines_are_split_once(self):
+        self._helper_search([(0, b"one"), (1, b"two")])
+        self.assertEqual(self._helper_search([(1, b"two"), (2, b"three")]),
+                [[u"two"], [u"three"]])
+        self.assertEqual(self.tokenize_mock.call_count, 3)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+
+    def test_edited_lines_are_split_again(self):
+        self._helper_search([(0, b"one")])
+        self.assertEqual(self._helper_search([(0, b"once")]), [[u"once"]])
+        self.assertEqual(self.tokenize_mock.call_count, 2)
+
+    def test_only_the_lines_of_the_last_search_are_kept(self):
+        self._helper_search([(0, b"one"), (1, b"two")])
+        self._helper_search([(1, b"two"), (2, b"three")])
+        self.assertEqual(len(self.cache), 2)
+        self._helper_search([(0, b"one")])
+        self.assertEqual(self.tokenize_mock.call_count, 4)
+
+    def test_a_line_searched_twice_is_split_once(self):
+        self.assertEqual(self._helper_search([(0, b"one"), (0, b"one")]),
+                [[u"one"], [u"one"]])
+        self.assertEqual(self.tokenize_mock.call_count, 1)
+
+    def test_memory_size_grows_with_the_cached_lines(self):
+        self._helper_search([(0, b"one")])
+        small_size = self.cache.memory_size()
+        self._helper_search([(0, b"one"), (1, b"two three")])
+        self.assertGreater(self.cache.memory_size(), small_size)
+        self._helper_search([])
+        self.assertLess(self.cache.memory_size(), small_size)
+
+
+class TestGetSharedTokens(unittest.TestCase):
+
+    def test_lines_are_split_once_per_validity(self):
+        cache = indexcache.IndexCache(2 ** 20)
+        first = linetokens.get_shared_tokens(cache, b"a b-c", 'utf-8', u'')
+        second = linetokens.get_shared_tokens(cache, b"a b-c", 'utf-8', u'')
+        third = linetokens.get_shared_tokens(cache, b"a b-c", 'utf-8', u'-')
+        self.assertIs(first, second)
+        self.assertEqual(first, (u"a", u"b", u"c"))
+        self.assertEqual(third, (u"a", u"b-c"))
+
+    def test_cached_size_is_counted(self):
+        cache = indexcache.IndexCache(2 ** 20)
+        tokens = linetokens.get_shared_tokens(cache, b"a b", 'utf-8', u'')
+        self.assertEqual(cache.total_bytes,
+                linetokens.get_tokens_size(b"a b", tokens))
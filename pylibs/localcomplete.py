@@ -17,18 +17,46 @@ in the Vim-Script file of the same name.
 """
 
 import codecs
+import collections
+import heapq
+import indexcache
 import itertools
+import keywordindex
+import lineblocks
+import linetokens
+import longlines
 import os
 import re
 import string
 import thirdparty
+import time
+import tokenizer
 import vim
+import vimtext
+
+# The modules of the file, dictionary, tag, warm start and project sources,
+# dictcompile, filebuffers, indexstore, projectindex and tagfiles, are imported
+# where they are used.  They load heavy standard modules, and the first
+# completion should not wait for them unless it uses these sources.
+
+try:
+    from itertools import izip_longest as zip_longest
+except ImportError:
+    # Python 3
+    from itertools import zip_longest
 
 VIM_COMMAND_LOCALCOMPLETE = 'silent let s:__localcomplete_lookup_result = %s'
 VIM_COMMAND_BUFFERCOMPLETE = 'silent let s:__buffercomplete_lookup_result = %s'
 VIM_COMMAND_DICTCOMPLETE = 'silent let s:__dictcomplete_lookup_result = %s'
+VIM_COMMAND_PROJECTCOMPLETE = (
+        'silent let s:__projectcomplete_lookup_result = %s')
+VIM_COMMAND_TAGCOMPLETE = 'silent let s:__tagcomplete_lookup_result = %s'
 VIM_COMMAND_FINDSTART = (
         'silent let s:__localcomplete_lookup_result_findstart = %d')
+VIM_COMMAND_CACHE_STATISTICS = (
+        'silent let s:__localcomplete_cache_statistics = %s')
+VIM_COMMAND_LINE_TOKENS_CACHE_STATISTICS = (
+        'silent let s:__localcomplete_line_tokens_cache_statistics = %s')
 
 SPECIAL_VALUE_SELECT_VIM_KEYWORDS = "&iskeyword"
 
@@ -39,9 +67,68 @@ MATCH_ORDER_REVERSE = 3
 MATCH_ORDER_NORMAL_BELOW_FIRST = 4
 MATCH_ORDER_REVERSE_ABOVE_FIRST = 5
 
+# Constants that describe how keywords have to match the keyword base
+MATCH_MODE_PREFIX = 1
+MATCH_MODE_SUBSTRING = 2
+MATCH_MODE_ABBREVIATION = 3
+MATCH_MODE_FUZZY = 4
+
 CASEMATCH_CONFIG_LOCAL = object()
 CASEMATCH_CONFIG_DICT = object()
 
+# The indexes of buffers by (buffer number, index kind).  The memory ceiling is
+# configured on every completion that uses the cache.
+BUFFER_INDEX_CACHE = indexcache.IndexCache(64 * 2 ** 20)
+
+# Index kinds in the BUFFER_INDEX_CACHE
+INDEX_KIND_KEYWORDS = 'keywords'
+INDEX_KIND_LINE_BLOCKS = 'lineblocks'
+INDEX_KIND_LINE_TOKENS = 'linetokens'
+INDEX_KIND_FILE_KEYWORDS = 'filekeywords'
+INDEX_KIND_PROJECT_KEYWORDS = 'projectkeywords'
+INDEX_KIND_DICTIONARY_LINES = 'dictionarylines'
+INDEX_KIND_COMPILED_DICTIONARY = 'compileddictionary'
+
+# The keywords of lines by line content, shared by all buffers.  The memory
+# ceiling is configured on every completion that uses the cache.
+LINE_TOKENS_CACHE = indexcache.IndexCache(16 * 2 ** 20)
+
+# The ProjectIndex objects by (project root, additional keyword characters)
+PROJECT_INDEXES = {}
+
+# The regexes that only depend on the additional keyword characters by
+# (compile function, characters)
+KEYWORD_REGEXES = {}
+
+# The number of characters read at once from plain dictionaries
+DICTIONARY_CHUNK_SIZE = 2 ** 16
+
+# Lines longer than this many bytes are searched in chunks
+LINE_CHUNK_BYTES = 2 ** 16
+
+# Encodings in which every byte below 128 is a character of its own
+ASCII_COMPATIBLE_ENCODINGS = frozenset(['utf-8', 'latin1'])
+
+# The number of lines at the start of a buffer that are probed for long lines
+LONG_LINE_PROBE_COUNT = 8
+
+# What localcomplete#getBufferInfo() tells about each buffer
+BufferInfo = collections.namedtuple('BufferInfo',
+        'listed lastused linecount buftype filetype')
+
+# Where the keyword index of a buffer is saved across sessions and what it
+# has to match to be loaded again
+WarmStartSource = collections.namedtuple('WarmStartSource',
+        'store_path file_stamp content_crc validity')
+
+# The number of lines summarized together for the line prefilter
+LINE_BLOCK_SIZE = 64
+
+# The score of an occurrence of a ranked local match.  The proximity score is
+# divided by one more than the distance to the cursor line.
+RANK_OCCURRENCE_SCORE = 1
+RANK_PROXIMITY_SCORE = 1024
+
 
 class LocalCompleteError(Exception):
     """
@@ -53,7 +140,7 @@ def zip_flatten_longest(above_lines, below_lines):
     Generate items from both argument lists in alternating order plus the items
     from the tail of the longer one.
     """
-    for above, below in itertools.izip_longest(above_lines, below_lines):
+    for above, below in zip_longest(above_lines, below_lines):
         if above is not None:
             yield above
         if below is not None:
@@ -80,57 +167,136 @@ def apply_infercase_to_matches_cond(keyword_base, found_matches):
     """
     If both ignorecase and infercase are set in Vim, all matches are
     transformed to start with the case of the leading word.
+
+    Matches that only start with the keyword when accents are ignored are
+    kept as they are, since replacing their prefix would drop the accents or
+    cut the word where the decomposition changed its length.
     """
     if not (int(vim.eval("&ignorecase")) and int(vim.eval("&infercase"))):
         return found_matches
     else:
         len_keyword = len(keyword_base)
-        return [keyword_base + match[len_keyword:] for match in found_matches]
-
-def generate_haystack():
-    match_result_order = int(vim.eval("localcomplete#getMatchResultOrder()"))
-    above_indexes, current_index, below_indexes = get_buffer_ranges()
-
-    # an alias for Vim's current buffer
-    buf = vim.current.buffer
+        folded_base = keywordindex.fold_case(keyword_base)
+        return [keyword_base + match[len_keyword:]
+                if keywordindex.fold_case(match[:len_keyword]) == folded_base
+                else match
+                for match in found_matches]
 
+def order_haystack_indexes(match_result_order,
+        above_indexes, current_index, below_indexes):
+    """
+    Generate the line indexes of the ranges in the requested result order.
+    """
     if match_result_order == MATCH_ORDER_CENTERED:
-        yield buf[current_index]
+        yield current_index
         for i in zip_flatten_longest(reversed(above_indexes), below_indexes):
-            yield buf[i]
+            yield i
 
     elif match_result_order == MATCH_ORDER_REVERSE_ABOVE_FIRST:
-        yield buf[current_index]
+        yield current_index
         for i in reversed(above_indexes):
-            yield buf[i]
+            yield i
         for i in reversed(below_indexes):
-            yield buf[i]
+            yield i
 
     elif match_result_order == MATCH_ORDER_REVERSE:
         for i in reversed(below_indexes):
-            yield buf[i]
-        yield buf[current_index]
+            yield i
+        yield current_index
         for i in reversed(above_indexes):
-            yield buf[i]
+            yield i
 
     elif match_result_order == MATCH_ORDER_NORMAL:
         for i in above_indexes:
-            yield buf[i]
-        yield buf[current_index]
+            yield i
+        yield current_index
         for i in below_indexes:
-            yield buf[i]
+            yield i
 
     elif match_result_order == MATCH_ORDER_NORMAL_BELOW_FIRST:
-        yield buf[current_index]
+        yield current_index
         for i in below_indexes:
-            yield buf[i]
+            yield i
         for i in above_indexes:
-            yield buf[i]
+            yield i
 
     else:
         raise LocalCompleteError(
                 "localcomplete: Invalid result order specified")
 
+def clip_indexes(indexes, first_index, last_index):
+    """
+    Return the part of the ascending consecutive indexes from first_index to
+    last_index.  Only the returned part is copied.
+    """
+    if not indexes:
+        return indexes
+    start = max(0, first_index - indexes[0])
+    stop = max(0, last_index - indexes[0] + 1)
+    return indexes[start:stop]
+
+def get_visible_line_range():
+    """
+    Return the (first_index, last_index) of the lines in the current window.
+    """
+    return (int(vim.eval("line('w0')")) - 1,
+            int(vim.eval("line('w$')")) - 1)
+
+def generate_visible_first_indexes(match_result_order,
+        above_indexes, current_index, below_indexes):
+    """
+    Generate the line indexes of the ranges in the requested result order but
+    those of the lines in the current window first.  The remaining lines are
+    only looked at if the visible ones have been consumed.
+    """
+    first_visible, last_visible = get_visible_line_range()
+    for i in order_haystack_indexes(match_result_order,
+            clip_indexes(above_indexes, first_visible, last_visible),
+            current_index,
+            clip_indexes(below_indexes, first_visible, last_visible)):
+        yield i
+    for i in order_haystack_indexes(match_result_order,
+            above_indexes, current_index, below_indexes):
+        if i != current_index and not first_visible <= i <= last_visible:
+            yield i
+
+def generate_haystack_indexes():
+    """
+    Generate the indexes of the current buffer's lines in search order.
+    """
+    match_result_order = int(vim.eval("localcomplete#getMatchResultOrder()"))
+    above_indexes, current_index, below_indexes = get_buffer_ranges()
+
+    if int(vim.eval("localcomplete#getWantVisibleFirst()")):
+        ordered_indexes = generate_visible_first_indexes
+    else:
+        ordered_indexes = order_haystack_indexes
+    for i in ordered_indexes(match_result_order,
+            above_indexes, current_index, below_indexes):
+        yield i
+
+def generate_indexed_haystack(could_match=None):
+    """
+    Generate (line_index, line) for the current buffer's lines in search
+    order.
+
+    could_match: a predicate for line indexes.  Lines it rules out are skipped
+    without fetching them from Vim.
+    """
+    # an alias for Vim's current buffer
+    buf = vim.current.buffer
+
+    for i in generate_haystack_indexes():
+        if could_match is None or could_match(i):
+            yield (i, buf[i])
+
+def generate_haystack(could_match=None):
+    """
+    Generate the current buffer's lines in search order.
+    """
+    for i, line in generate_indexed_haystack(could_match):
+        yield line
+
 def get_buffer_ranges():
     """
     Calculate the (above_indexes, current_index, below_indexes) index and
@@ -203,35 +369,268 @@ def transmit_local_matches_result_to_vim(found_matches):
                     found_matches,
                     origin_note)))
 
-def find_matches_in_lines(lines, min_length_keyword_base):
-    encoding = vim.eval("&encoding")
-    keyword_base = vim.eval("a:keyword_base").decode(encoding)
+def get_keyword_regex(compile_regex, punctuation_chars):
+    """
+    Return compile_regex(punctuation_chars).  Each regex is compiled by the
+    first completion that needs it and reused by all later ones.
+    """
+    key = (compile_regex, punctuation_chars)
+    regex = KEYWORD_REGEXES.get(key)
+    if regex is None:
+        regex = compile_regex(punctuation_chars)
+        KEYWORD_REGEXES[key] = regex
+    return regex
 
-    if len(keyword_base) < min_length_keyword_base:
-        return []
+def get_keyword_char_class(punctuation_chars):
+    """
+    Return a regex character class for one keyword character.
+    """
+    return r'[\w%s]' % re.escape(punctuation_chars)
+
+def finish_found_matches(keyword_base, found_matches, want_infercase=True):
+    """
+    Apply the final transformations that all local and all-buffer matches
+    share.  Infercase only makes sense for matches that start with the
+    keyword base.
+    """
+    if want_infercase:
+        found_matches = apply_infercase_to_matches_cond(
+                keyword_base, found_matches)
+
+    if os.environ.get("LOCALCOMPLETE_DEBUG") is not None:
+        fake_matches = found_matches[:]
+        fake_matches.append(keyword_base)
+        found_matches = fake_matches
 
-    punctuation_chars = get_additional_keyword_chars().decode(encoding)
+    return found_matches
+
+def compile_match_needle(keyword_base, punctuation_chars):
+    """
+    Return the regex that finds the keywords that start with keyword_base.
+    """
     casematch_flag = get_casematch_flag(CASEMATCH_CONFIG_LOCAL)
 
     # Note: theoretically there could be a non-alphanumerical character at the
     # leftmost position.
-    keyword_chars = r'[\w%s]' % re.escape(punctuation_chars)
-    needle = re.compile(r'(?<!%s)%s%s+' % (keyword_chars,
+    keyword_chars = get_keyword_char_class(punctuation_chars)
+    return re.compile(r'(?<!%s)%s%s+' % (keyword_chars,
             re.escape(keyword_base), keyword_chars), re.UNICODE|casematch_flag)
 
+def find_matches_in_lines(lines, min_length_keyword_base, result_limit=0):
+    """
+    Return the matches in the lines in search order.
+
+    result_limit: stop reading lines as soon as this many different matches
+            have been found unless it is 0
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+    needle = compile_match_needle(keyword_base, punctuation_chars)
+
+    chunk_line = get_line_chunker(encoding,
+            punctuation_chars,
+            is_keyword(keyword_base, punctuation_chars))
+    found_matches = take_matches_up_to_limit(
+            (needle.findall(vimtext.to_text(chunk, encoding))
+                    for buffer_line in lines
+                    for chunk in chunk_line(buffer_line)),
+            result_limit)
+
+    return finish_found_matches(keyword_base, found_matches)
+
+def get_line_chunker(encoding, punctuation_chars, want_cuts=True):
+    """
+    Return a function that returns the chunks of a line from Vim to search.
+    Lines longer than LINE_CHUNK_BYTES are cut into chunks between keywords,
+    so that one long line neither has to be decoded at once nor searched to
+    the end if the result limit is reached.  Only the start of a line up to
+    localcomplete#getMaxLineScanBytes() is searched.
+
+    Without want_cuts, lines are only capped.  Matches of a keyword base with
+    other characters than keyword characters may cross the cuts.
+
+    Encoded lines in encodings that are not ASCII compatible are never cut.
+    Decoded lines are measured in characters instead of bytes.
+    """
+    max_line_bytes = int(vim.eval("localcomplete#getMaxLineScanBytes()"))
+    if vimtext.VIM_PASSES_TEXT:
+        separator_needle = get_keyword_regex(
+                longlines.get_text_separator_needle, punctuation_chars)
+    elif encoding in ASCII_COMPATIBLE_ENCODINGS:
+        separator_needle = get_keyword_regex(
+                longlines.get_separator_needle, punctuation_chars)
+    else:
+        return lambda line : (line,)
+
+    def chunk_line(line):
+        if max_line_bytes:
+            line = longlines.cap_line(line, max_line_bytes, separator_needle)
+        if not want_cuts or len(line) <= LINE_CHUNK_BYTES:
+            return (line,)
+        return longlines.generate_chunks(line,
+                LINE_CHUNK_BYTES,
+                separator_needle)
+
+    return chunk_line
+
+def take_matches_up_to_limit(line_matches, result_limit):
+    """
+    Concatenate the lists of matches.  Stop taking matches before the first
+    one that would exceed result_limit different matches unless it is 0.
+    line_matches is only consumed as far as needed.
+    """
     found_matches = []
+    different_matches = set()
+    for matches in line_matches:
+        for match in matches:
+            if result_limit and match not in different_matches:
+                if len(different_matches) == result_limit:
+                    return found_matches
+                different_matches.add(match)
+            found_matches.append(match)
+    return found_matches
+
+def find_cached_token_matches_in_lines(indexed_lines,
+        min_length_keyword_base, result_limit=0):
+    """
+    Like find_matches_in_lines for (line_index, line) pairs.  The keywords of
+    the lines are taken from the line tokens cache of the current buffer, so
+    only lines that are new to the searched range or have been edited are
+    split.  Keyword bases with other characters are searched in the lines.
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+
+    if not is_keyword(keyword_base, punctuation_chars):
+        return find_matches_in_lines(
+                (line for line_index, line in indexed_lines),
+                min_length_keyword_base,
+                result_limit)
+
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    configure_index_cache()
+    buf = vim.current.buffer
+    line_tokens = get_buffer_line_tokens(buf, encoding, punctuation_chars)
+    chunk_line = get_line_chunker(encoding, punctuation_chars)
+    found_matches = find_matches_in_line_tokens(
+            (line_tokens.get_tokens(line_index,
+                            vimtext.join_chunks(chunk_line(line)))
+                    for line_index, line in indexed_lines),
+            compile_match_needle(keyword_base, punctuation_chars),
+            result_limit)
+    store_buffer_line_tokens(buf, line_tokens)
+
+    return finish_found_matches(keyword_base, found_matches)
+
+def find_matches_in_line_tokens(line_tokens, needle, result_limit=0):
+    """
+    Return the keywords of the sequence of keyword lists that the match
+    needle accepts.  Keywords are maximal runs of keyword characters, so a
+    match of the needle at the start of a keyword covers all of it.
+    """
+    is_match = needle.match
+    return take_matches_up_to_limit(
+            ([token for token in tokens if is_match(token)]
+                    for tokens in line_tokens),
+            result_limit)
+
+def configure_line_tokens_cache():
+    megabytes = int(vim.eval(
+            "localcomplete#getSharedLineTokenCacheMaxMegabytes()"))
+    LINE_TOKENS_CACHE.set_max_bytes(megabytes * 2 ** 20)
+
+def want_shared_line_tokens():
+    return bool(int(vim.eval("localcomplete#getWantSharedLineTokenCache()")))
+
+def generate_shared_line_tokens(lines, encoding, punctuation_chars):
+    """
+    Generate the keywords of each line from the cache that all buffers share.
+    Every distinct line is only split once.
+    """
+    configure_line_tokens_cache()
+    chunk_line = get_line_chunker(encoding, punctuation_chars)
     for buffer_line in lines:
-        found_matches.extend(needle.findall(buffer_line.decode(encoding)))
+        for chunk in chunk_line(buffer_line):
+            yield linetokens.get_shared_tokens(LINE_TOKENS_CACHE,
+                    chunk, encoding, punctuation_chars)
 
-    found_matches = apply_infercase_to_matches_cond(
-            keyword_base, found_matches)
+def find_shared_token_matches_in_lines(lines, min_length_keyword_base):
+    """
+    Like find_matches_in_lines but take the keywords of the lines from the
+    cache that all buffers share.  Keyword bases with other characters are
+    searched in the lines.
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
 
-    if os.environ.get("LOCALCOMPLETE_DEBUG") is not None:
-        fake_matches = found_matches[:]
-        fake_matches.append(keyword_base)
-        found_matches = fake_matches
+    if not is_keyword(keyword_base, punctuation_chars):
+        return find_matches_in_lines(lines, min_length_keyword_base)
 
-    return found_matches
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    found_matches = find_matches_in_line_tokens(
+            generate_shared_line_tokens(lines, encoding, punctuation_chars),
+            compile_match_needle(keyword_base, punctuation_chars))
+
+    return finish_found_matches(keyword_base, found_matches)
+
+def get_rank_score(line_index, current_index):
+    """
+    Return the score of a single occurrence of a match in the line.  Every
+    occurrence counts and occurrences close to the cursor count a lot more.
+    """
+    return RANK_OCCURRENCE_SCORE + (
+            RANK_PROXIMITY_SCORE // (1 + abs(line_index - current_index)))
+
+def find_ranked_matches_in_lines(indexed_lines, min_length_keyword_base):
+    """
+    Like find_matches_in_lines for (line_index, line) pairs but return every
+    match once.  Matches are ordered by the sum of the scores of their
+    occurrences.  Equal scores keep the search order.  Only the best matches
+    up to the result limit are selected.
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+    needle = compile_match_needle(keyword_base, punctuation_chars)
+    current_index = int(vim.eval("line('.')")) - 1
+
+    chunk_line = get_line_chunker(encoding,
+            punctuation_chars,
+            is_keyword(keyword_base, punctuation_chars))
+
+    scores = {}
+    search_order = []
+    for line_index, buffer_line in indexed_lines:
+        score = get_rank_score(line_index, current_index)
+        for chunk in chunk_line(buffer_line):
+            for match in needle.findall(vimtext.to_text(chunk, encoding)):
+                if match not in scores:
+                    scores[match] = 0
+                    search_order.append(match)
+                scores[match] += score
+
+    return finish_found_matches(keyword_base, rank_scored_matches(
+            [(scores[match], match) for match in search_order],
+            get_result_limit()))
 
 def complete_local_matches():
     """
@@ -240,29 +639,57 @@ def complete_local_matches():
     min_length_keyword_base = int(vim.eval(
               "localcomplete#getLocalMinPrefixLength()"))
 
-    found_matches = find_matches_in_lines(generate_haystack(),
-            min_length_keyword_base)
+    if get_match_mode() != MATCH_MODE_PREFIX:
+        found_matches = find_index_matches_in_lines(generate_haystack(),
+                min_length_keyword_base)
+    elif int(vim.eval("localcomplete#getWantLocalRanking()")):
+        found_matches = find_ranked_matches_in_lines(
+                generate_indexed_haystack(get_line_prefilter()),
+                min_length_keyword_base)
+    else:
+        if int(vim.eval("localcomplete#getWantVisibleFirst()")):
+            result_limit = get_result_limit()
+        else:
+            result_limit = 0
+        if int(vim.eval("localcomplete#getWantLineTokenCache()")):
+            found_matches = find_cached_token_matches_in_lines(
+                    generate_indexed_haystack(get_line_prefilter()),
+                    min_length_keyword_base,
+                    result_limit)
+        else:
+            found_matches = find_matches_in_lines(
+                    generate_haystack(get_line_prefilter()),
+                    min_length_keyword_base,
+                    result_limit)
 
     transmit_local_matches_result_to_vim(found_matches)
 
 def findstart_get_line_up_to_cursor():
     encoding = vim.eval("&encoding")
+    # The cursor column is a byte index
     cursor_byte_index = vim.current.window.cursor[1]
-    return vim.current.line[:cursor_byte_index].decode(encoding)
+    return vimtext.to_text(
+            vimtext.to_bytes(vim.current.line, encoding)[:cursor_byte_index],
+            encoding)
 
-def findstart_get_index_of_trailing_keyword(keyword_chars, line_start):
-    needle = re.compile(r'[\w%s]+$' % (re.escape(keyword_chars)),
+def compile_trailing_keyword_needle(keyword_chars):
+    return re.compile(r'[\w%s]+$' % (re.escape(keyword_chars)),
             re.UNICODE|re.IGNORECASE)
+
+def findstart_get_index_of_trailing_keyword(keyword_chars, line_start):
+    needle = get_keyword_regex(compile_trailing_keyword_needle, keyword_chars)
     match_object = needle.search(line_start)
     if match_object is None:
         return None
     else:
         return match_object.start()
 
-def findstart_get_starting_column_index():
+def findstart_get_starting_column_index(line_start=None):
     encoding = vim.eval("&encoding")
-    punctuation_chars = get_additional_keyword_chars().decode(encoding)
-    line_start = findstart_get_line_up_to_cursor()
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+    if line_start is None:
+        line_start = findstart_get_line_up_to_cursor()
 
     index_result = findstart_get_index_of_trailing_keyword(
             punctuation_chars, line_start)
@@ -272,7 +699,7 @@ def findstart_get_starting_column_index():
     else:
         return index_result
 
-def findstart_translate_to_byte_index(column_index):
+def findstart_translate_to_byte_index(column_index, line_start=None):
     """
     Quick (meaning slow) workaround for findstart
 
@@ -280,36 +707,162 @@ def findstart_translate_to_byte_index(column_index):
     wants the byte index.
     """
     encoding = vim.eval("&encoding")
-    visible_line = findstart_get_line_up_to_cursor()[:column_index]
-    return len(visible_line.encode(encoding))
+    if line_start is None:
+        line_start = findstart_get_line_up_to_cursor()
+    return len(line_start[:column_index].encode(encoding))
 
 def findstart_local_matches():
+    # Decode the line once.  It might be a very long one.
+    line_start = findstart_get_line_up_to_cursor()
     vim.command(VIM_COMMAND_FINDSTART
             % findstart_translate_to_byte_index(
-                    findstart_get_starting_column_index()))
+                    findstart_get_starting_column_index(line_start),
+                    line_start))
 
-def read_file_contents(file_path):
+def generate_dictionary_chunks(file_path, chunk_size=DICTIONARY_CHUNK_SIZE):
+    """
+    Generate the text of the UTF-8 file in chunks of whole lines.  The file
+    is read chunk_size characters at a time.  The part of a line that
+    crosses the end of a read is carried over to the next chunk.
+    """
     with codecs.open(file_path, "r", encoding="utf-8") as fr:
-        return fr.read()
+        carried_parts = []
+        while True:
+            data = fr.read(chunk_size)
+            if not data:
+                break
+            cut = data.rfind(u'\n') + 1
+            if not cut:
+                carried_parts.append(data)
+                continue
+            carried_parts.append(data[:cut])
+            yield u''.join(carried_parts)
+            carried_parts = [data[cut:]]
+        rest = u''.join(carried_parts)
+        if rest:
+            yield rest
+
+def get_dictionary_line_index(path, opener, fold=None):
+    """
+    Return a keyword index of the non-empty lines of the compressed
+    dictionary at path.  The file is decompressed as a stream only once.  The
+    index is reused until the modification time or the size of the file
+    changes.
+    """
+    import filebuffers
+    validity = (filebuffers.get_file_stamp(path), fold)
+    cache_key = (path, INDEX_KIND_DICTIONARY_LINES)
+    line_index = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if line_index is None:
+        folds = () if fold is None else (fold,)
+        line_index = keywordindex.KeywordIndex(
+                (line for line
+                        in filebuffers.generate_decompressed_lines(
+                                path, opener)
+                        if line),
+                folds)
+        BUFFER_INDEX_CACHE.put(cache_key, validity, line_index,
+                line_index.memory_size())
+    return line_index
+
+def get_compiled_dictionary_index(path):
+    """
+    Return the keyword index in the dictionary index file at path.  The file
+    is mapped into memory again only after its modification time or size
+    changed.
+    """
+    import dictcompile
+    import filebuffers
+    validity = filebuffers.get_file_stamp(path)
+    cache_key = (path, INDEX_KIND_COMPILED_DICTIONARY)
+    line_index = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if line_index is None:
+        line_index = dictcompile.load_dictionary_index(path)
+        BUFFER_INDEX_CACHE.put(cache_key, validity, line_index,
+                line_index.memory_size())
+    return line_index
+
+def find_dictionary_line_index_matches(line_index, keyword_base, fold,
+        result_limit=0):
+    """
+    Return the matches of the lines in line_index that start with
+    a:keyword_base like the dictionary search of complete_dictionary_matches
+    finds them: the keyword base followed by the word characters after it.
+    Stop after result_limit matches unless it is 0.
+    """
+    word_tail = re.compile(r'\w+', re.UNICODE)
+    seen_matches = set()
+    found_matches = []
+    for line in line_index.find_prefix_matches(keyword_base, fold):
+        tail_match = word_tail.match(line, len(keyword_base))
+        if tail_match is None:
+            continue
+        match = line[:tail_match.end()]
+        if match not in seen_matches:
+            if result_limit and len(found_matches) == result_limit:
+                break
+            seen_matches.add(match)
+            found_matches.append(match)
+    return found_matches
+
+def find_dictionary_matches(dictionary_file, keyword_base, casematch_flag,
+        result_limit=0):
+    """
+    Return the matches for keyword_base in the dictionary file, up to
+    result_limit different ones unless it is 0.  Compressed dictionaries are
+    searched in a cached index of their lines, dictionary index files in the
+    index they contain.  Other dictionaries are scanned chunk by chunk until
+    enough matches are found.
+    """
+    import dictcompile
+    import filebuffers
+    fold = keywordindex.fold_case if casematch_flag else None
+    if dictcompile.is_index_file(dictionary_file):
+        return find_dictionary_line_index_matches(
+                get_compiled_dictionary_index(dictionary_file),
+                keyword_base,
+                fold,
+                result_limit)
+    opener = filebuffers.get_decompressing_opener(dictionary_file)
+    if opener is not None:
+        line_index = get_dictionary_line_index(dictionary_file, opener, fold)
+        return find_dictionary_line_index_matches(line_index, keyword_base,
+                fold, result_limit)
+    needle = re.compile(r'^%s\w+' % re.escape(keyword_base),
+            re.UNICODE|re.MULTILINE|casematch_flag)
+    chunks = generate_dictionary_chunks(dictionary_file)
+    try:
+        return take_matches_up_to_limit(
+                (needle.findall(chunk) for chunk in chunks),
+                result_limit)
+    finally:
+        # Close the file if the search stopped early
+        chunks.close()
+
+def get_dictionary_read_errors():
+    """
+    Return the errors of unreadable, corrupt or invalid dictionaries.
+    """
+    import dictcompile
+    import filebuffers
+    return filebuffers.DECOMPRESSION_ERRORS + (dictcompile.DictCompileError,)
 
 def complete_dictionary_matches():
     """
     Return a dictionary completion result for a:keyword_base
     """
     encoding = vim.eval("&encoding")
-    keyword_base = vim.eval("a:keyword_base").decode(encoding)
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
 
     dictionary_file = vim.eval("&dictionary")
     if dictionary_file:
         casematch_flag = get_casematch_flag(CASEMATCH_CONFIG_DICT)
-        needle = re.compile(r'^%s\w+' % re.escape(keyword_base),
-                re.UNICODE|re.MULTILINE|casematch_flag)
         try:
-            haystack = read_file_contents(dictionary_file)
-        except IOError as err:
+            found_matches = find_dictionary_matches(dictionary_file,
+                    keyword_base, casematch_flag, get_result_limit())
+        except get_dictionary_read_errors() as err:
             vim.command('echoerr "Error reading dictionary: %s"' % str(err))
-            haystack = u''
-        found_matches = needle.findall(haystack)
+            found_matches = []
     else:
         found_matches = []
 
@@ -322,19 +875,123 @@ def complete_dictionary_matches():
                     found_matches,
                     origin_note)))
 
+def complete_tag_matches():
+    """
+    Return a completion result for the tag names in the tag files of 'tags'
+    that start with a:keyword_base
+    """
+    import tagfiles
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+    min_length_keyword_base = int(vim.eval(
+            "localcomplete#getTagMinPrefixLength()"))
+
+    if keyword_base and len(keyword_base) >= min_length_keyword_base:
+        found_names = tagfiles.find_tag_names(vim.eval("tagfiles()"),
+                keyword_base.encode(encoding),
+                bool(get_casematch_flag(CASEMATCH_CONFIG_LOCAL)),
+                get_result_limit())
+        found_matches = apply_infercase_to_matches_cond(keyword_base,
+                [name.decode(encoding, 'replace') for name in found_names])
+    else:
+        found_matches = []
+
+    origin_note = vim.eval("g:localcomplete#OriginNoteTags")
+    vim.command(VIM_COMMAND_TAGCOMPLETE
+            % repr(produce_result_value(
+                    found_matches,
+                    origin_note)))
+
+def has_long_lines(buf, max_line_bytes):
+    """
+    Tell whether one of the first lines of the buffer is longer than
+    max_line_bytes.  Minified and generated files usually start with one.
+    """
+    return any(len(line) > max_line_bytes
+            for line in buf[:LONG_LINE_PROBE_COUNT])
+
+def get_buffer_infos():
+    """
+    Return the BufferInfo of every buffer by buffer number.  They are
+    collected with a single evaluation in Vim.
+    """
+    return dict((int(number), BufferInfo(int(listed),
+                    int(lastused),
+                    int(linecount),
+                    buftype,
+                    filetype))
+            for number, listed, lastused, linecount, buftype, filetype
+            in vim.eval("localcomplete#getBufferInfo()"))
+
+def get_buffer_info_filter():
+    """
+    Return a predicate for BufferInfo objects that tells whether the buffer
+    passes the configured filters or None if there are no filters.
+    """
+    want_listed_only = int(vim.eval(
+            "localcomplete#getWantListedBuffersOnly()"))
+    skipped_types = frozenset(buftype for buftype in vim.eval(
+            "localcomplete#getSkipBufferTypes()").split(",") if buftype)
+    want_same_filetype_only = int(vim.eval(
+            "localcomplete#getWantSameFiletypeOnly()"))
+    max_line_count = int(vim.eval("localcomplete#getMaxBufferLineCount()"))
+
+    if not (want_listed_only or skipped_types or want_same_filetype_only
+            or max_line_count):
+        return None
+
+    if want_same_filetype_only:
+        current_filetype = vim.eval("&filetype")
+
+    def is_wanted(info):
+        if want_listed_only and not info.listed:
+            return False
+        if info.buftype in skipped_types:
+            return False
+        if want_same_filetype_only and info.filetype != current_filetype:
+            return False
+        if max_line_count and info.linecount > max_line_count:
+            return False
+        return True
+
+    return is_wanted
+
 def get_all_buffers_in_search_order():
+    """
+    Return the current buffer and the other buffers alternating from its
+    neighbors outward or by the time they were last used.  Other buffers are
+    left out if they do not pass the configured filters or have long lines.
+    """
+    skip_line_bytes = int(vim.eval("localcomplete#getSkipBufferLineBytes()"))
+    want_recent_first = int(vim.eval(
+            "localcomplete#getWantRecentBuffersFirst()"))
+    is_wanted = get_buffer_info_filter()
+    buffer_infos = None
+    if want_recent_first or is_wanted is not None:
+        buffer_infos = get_buffer_infos()
+
     before_current = []
     after_current = []
     current_buffer = None
     for buf in vim.buffers:
         if buf.number == vim.current.buffer.number:
             current_buffer = buf
+        elif (is_wanted is not None
+                and not is_wanted(buffer_infos[buf.number])):
+            continue
+        elif skip_line_bytes and has_long_lines(buf, skip_line_bytes):
+            continue
         elif current_buffer is None:
             before_current.append(buf)
         else:
             after_current.append(buf)
-    return [current_buffer] + list(zip_flatten_longest(
+    other_buffers = list(zip_flatten_longest(
             reversed(before_current), after_current))
+    if want_recent_first:
+        # A stable sort keeps the neighbor order for equal times.
+        other_buffers.sort(
+                key=lambda buf : -buffer_infos[buf.number].lastused)
+    return [current_buffer] + other_buffers
 
 def generate_all_buffer_lines():
     for buf in get_all_buffers_in_search_order():
@@ -348,6 +1005,657 @@ def transmit_all_buffer_result_to_vim(found_matches):
                     found_matches,
                     origin_note)))
 
+def get_buffer_changedtick(buffer_number):
+    return int(vim.eval("getbufvar(%d, 'changedtick')" % buffer_number))
+
+def build_keyword_index(lines, encoding, punctuation_chars, folds=(),
+        want_trigrams=False, want_char_masks=False):
+    """
+    Create a KeywordIndex of all keywords in the encoded lines.  It is
+    prepared for queries with the folding functions in folds, for substring
+    queries if want_trigrams is set and for fuzzy queries if want_char_masks
+    is set.
+    """
+    return keywordindex.KeywordIndex(
+            tokenizer.tokenize_lines(lines, encoding, punctuation_chars),
+            folds,
+            want_trigrams,
+            want_char_masks)
+
+def is_buffer_modified(buffer_number):
+    return bool(int(vim.eval("getbufvar(%d, '&modified')" % buffer_number)))
+
+def get_warm_start_source(buf, encoding, punctuation_chars):
+    """
+    Return the WarmStartSource for the keyword index of the buffer or None if
+    it is not kept across sessions.  Only the indexes of unmodified buffers
+    are kept, along with the checksum of the lines they were built from.
+    """
+    if not int(vim.eval("localcomplete#getWantWarmStartCache()")):
+        return None
+    import filebuffers
+    import indexstore
+    cache_directory = vim.eval("localcomplete#getCacheDirectory()")
+    if (not cache_directory or not buf.name
+            or is_buffer_modified(buf.number)):
+        return None
+    try:
+        file_stamp = filebuffers.get_file_stamp(buf.name)
+    except OSError:
+        return None
+    return WarmStartSource(
+            indexstore.get_store_path(
+                    os.path.join(os.path.expanduser(cache_directory),
+                            'buffers'),
+                    buf.name),
+            file_stamp,
+            indexstore.get_lines_crc(buf[:]),
+            indexstore.get_validity_text(buf.name,
+                    encoding,
+                    punctuation_chars))
+
+def get_buffer_keyword_index(buf, encoding, punctuation_chars, fold=None,
+        want_trigrams=False, want_char_masks=False):
+    """
+    Return the KeywordIndex of the buffer for queries with the folding
+    function fold.  It is only rebuilt if the buffer, the keyword definition,
+    the folding or the prepared query types changed since the last request.
+    """
+    validity = (get_buffer_changedtick(buf.number),
+            punctuation_chars,
+            encoding,
+            fold,
+            want_trigrams,
+            want_char_masks)
+    cache_key = (buf.number, INDEX_KIND_KEYWORDS)
+    keyword_index = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if keyword_index is None:
+        folds = () if fold is None else (fold,)
+        warm_start_source = get_warm_start_source(buf, encoding,
+                punctuation_chars)
+        if warm_start_source is not None:
+            import indexstore
+            keyword_index = indexstore.load_keyword_index(
+                    warm_start_source.store_path,
+                    warm_start_source.file_stamp,
+                    warm_start_source.content_crc,
+                    warm_start_source.validity,
+                    folds,
+                    want_trigrams,
+                    want_char_masks)
+        if keyword_index is None:
+            keyword_index = build_keyword_index(buf,
+                    encoding,
+                    punctuation_chars,
+                    folds,
+                    want_trigrams,
+                    want_char_masks)
+            if warm_start_source is not None:
+                indexstore.save_keyword_index(warm_start_source.store_path,
+                        keyword_index,
+                        warm_start_source.file_stamp,
+                        warm_start_source.content_crc,
+                        warm_start_source.validity)
+        BUFFER_INDEX_CACHE.put(cache_key, validity, keyword_index,
+                keyword_index.memory_size())
+    return keyword_index
+
+def get_buffer_line_blocks(buf):
+    """
+    Return the LineBlockSummary of the buffer.  If the buffer changed since
+    the last request, the previous summary is updated, so only the changed
+    blocks are summarized again.
+    """
+    validity = (get_buffer_changedtick(buf.number), LINE_BLOCK_SIZE)
+    cache_key = (buf.number, INDEX_KIND_LINE_BLOCKS)
+    summary = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if summary is None:
+        summary = BUFFER_INDEX_CACHE.peek(cache_key)
+        if summary is None or summary.block_size != LINE_BLOCK_SIZE:
+            summary = lineblocks.LineBlockSummary(buf, LINE_BLOCK_SIZE)
+        else:
+            summary.update(buf)
+        BUFFER_INDEX_CACHE.put(cache_key, validity, summary,
+                summary.memory_size())
+    return summary
+
+def get_buffer_line_tokens(buf, encoding, punctuation_chars):
+    """
+    Return the LineTokensCache of the buffer.  Pass it to
+    store_buffer_line_tokens after the search.
+    """
+    validity = (encoding, punctuation_chars)
+    cache_key = (buf.number, INDEX_KIND_LINE_TOKENS)
+    line_tokens = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if line_tokens is None:
+        line_tokens = linetokens.LineTokensCache(encoding, punctuation_chars)
+    return line_tokens
+
+def store_buffer_line_tokens(buf, line_tokens):
+    """
+    Finish the search with the LineTokensCache of the buffer and store it
+    with its new size.
+    """
+    line_tokens.finish_search()
+    BUFFER_INDEX_CACHE.put((buf.number, INDEX_KIND_LINE_TOKENS),
+            (line_tokens.encoding, line_tokens.punctuation_chars),
+            line_tokens,
+            line_tokens.memory_size())
+
+def get_line_prefilter():
+    """
+    Return a predicate for the current buffer's line indexes that rules out
+    lines which cannot contain a:keyword_base or None if the prefilter is not
+    wanted.
+    """
+    if not int(vim.eval("localcomplete#getWantLinePrefilter()")):
+        return None
+    configure_index_cache()
+    summary = get_buffer_line_blocks(vim.current.buffer)
+    return summary.get_line_predicate(vim.eval("a:keyword_base"),
+            bool(get_casematch_flag(CASEMATCH_CONFIG_LOCAL)))
+
+def configure_index_cache():
+    megabytes = int(vim.eval("localcomplete#getIndexCacheMaxMegabytes()"))
+    BUFFER_INDEX_CACHE.set_max_bytes(megabytes * 2 ** 20)
+
+def purge_buffer_caches(buffer_number):
+    """
+    Forget everything cached for the buffer.  Called when it is wiped out.
+    """
+    for index_kind in (INDEX_KIND_KEYWORDS,
+            INDEX_KIND_LINE_BLOCKS,
+            INDEX_KIND_LINE_TOKENS):
+        BUFFER_INDEX_CACHE.purge((buffer_number, index_kind))
+
+def transmit_cache_statistics_to_vim():
+    vim.command(VIM_COMMAND_CACHE_STATISTICS
+            % repr(BUFFER_INDEX_CACHE.statistics()))
+
+def transmit_line_tokens_cache_statistics_to_vim():
+    vim.command(VIM_COMMAND_LINE_TOKENS_CACHE_STATISTICS
+            % repr(LINE_TOKENS_CACHE.statistics()))
+
+def is_keyword(text, punctuation_chars):
+    return re.match(r'%s*$' % get_keyword_char_class(punctuation_chars),
+            text, re.UNICODE) is not None
+
+def get_index_fold():
+    """
+    Return the folding function for keyword index queries that corresponds to
+    the case configuration or None for case-sensitive queries.
+    """
+    if not get_casematch_flag(CASEMATCH_CONFIG_LOCAL):
+        return None
+    if int(vim.eval("localcomplete#getWantIgnoreAccents()")):
+        return keywordindex.fold_case_and_accents
+    return keywordindex.fold_case
+
+def get_match_mode():
+    match_mode = int(vim.eval("localcomplete#getMatchMode()"))
+    if match_mode not in (MATCH_MODE_PREFIX,
+            MATCH_MODE_SUBSTRING,
+            MATCH_MODE_ABBREVIATION,
+            MATCH_MODE_FUZZY):
+        raise LocalCompleteError(
+                "localcomplete: Invalid match mode specified")
+    return match_mode
+
+def get_keyword_index_options():
+    """
+    Return (fold, want_trigrams, want_char_masks) of the keyword indexes that
+    answer queries in the configured match mode.
+    """
+    match_mode = get_match_mode()
+    return (get_match_mode_fold(match_mode),
+            match_mode == MATCH_MODE_SUBSTRING,
+            match_mode == MATCH_MODE_FUZZY)
+
+def get_match_mode_fold(match_mode):
+    """
+    Return the folding function of the keyword index table that answers
+    queries in match_mode.
+    """
+    if match_mode == MATCH_MODE_ABBREVIATION:
+        return keywordindex.get_initials
+    return get_index_fold()
+
+def find_buffer_index_matches(buf, encoding, punctuation_chars, keyword_base,
+        match_mode, fold):
+    """
+    Return the keywords of the buffer that match keyword_base in match_mode in
+    the order of their first occurrence.
+    """
+    keyword_index = get_buffer_keyword_index(buf,
+            encoding,
+            punctuation_chars,
+            fold,
+            match_mode == MATCH_MODE_SUBSTRING)
+    return find_keyword_index_matches(keyword_index, keyword_base,
+            match_mode, fold)
+
+def find_keyword_index_matches(keyword_index, keyword_base, match_mode, fold):
+    """
+    Return the keywords of the index that match keyword_base in match_mode in
+    the order of their first occurrence.
+    """
+    if match_mode == MATCH_MODE_SUBSTRING:
+        return keyword_index.find_substring_matches(keyword_base, fold)
+    elif match_mode == MATCH_MODE_ABBREVIATION:
+        return keyword_index.find_abbreviation_matches(keyword_base)
+    return keyword_index.find_prefix_matches(keyword_base, fold)
+
+def find_buffer_fuzzy_matches(buf, encoding, punctuation_chars, keyword_base,
+        fold, limit):
+    """
+    Return (score, keyword) for the best limit fuzzy matches of the buffer
+    ordered by descending score.
+    """
+    keyword_index = get_buffer_keyword_index(buf,
+            encoding,
+            punctuation_chars,
+            fold,
+            want_char_masks=True)
+    return keyword_index.find_fuzzy_matches(keyword_base, fold, limit)
+
+def get_result_limit():
+    return int(vim.eval("localcomplete#getResultLimit()"))
+
+def rank_scored_matches(scored_matches, limit):
+    """
+    Return the keywords of the (score, keyword) pairs by descending score.
+    Equal scores keep their order.  Only the best limit keywords are returned
+    unless limit is 0.
+    """
+    ranked = [(-score, order, keyword)
+            for order, (score, keyword) in enumerate(scored_matches)]
+    if limit:
+        ranked = heapq.nsmallest(limit, ranked)
+    else:
+        ranked.sort()
+    return [keyword for negated_score, order, keyword in ranked]
+
+def generate_line_keywords(lines, encoding, punctuation_chars):
+    if want_shared_line_tokens():
+        for tokens in generate_shared_line_tokens(
+                lines, encoding, punctuation_chars):
+            for keyword in tokens:
+                yield keyword
+        return
+    chunk_line = get_line_chunker(encoding, punctuation_chars)
+    for buffer_line in lines:
+        for chunk in chunk_line(buffer_line):
+            for keyword in tokenizer.tokenize(
+                    vimtext.to_text(chunk, encoding), punctuation_chars):
+                yield keyword
+
+def find_index_matches_in_lines(lines, min_length_keyword_base):
+    """
+    Like find_matches_in_lines but for all match modes.  The keyword index of
+    the current buffer tells which keywords match, so the lines only have to
+    be split into keywords to keep the matches in proximity order.  Fuzzy
+    matches are found once and ranked by score.
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+
+    if not is_keyword(keyword_base, punctuation_chars):
+        return find_matches_in_lines(lines, min_length_keyword_base)
+
+    match_mode = get_match_mode()
+    fold = get_match_mode_fold(match_mode)
+    configure_index_cache()
+    line_keywords = generate_line_keywords(lines, encoding, punctuation_chars)
+
+    if match_mode == MATCH_MODE_FUZZY:
+        # Rank by score.  Equal scores stay in proximity order.
+        scores = dict((keyword, score)
+                for score, keyword in find_buffer_fuzzy_matches(
+                        vim.current.buffer,
+                        encoding,
+                        punctuation_chars,
+                        keyword_base,
+                        fold,
+                        0))
+        scored_matches = []
+        for keyword in line_keywords:
+            score = scores.pop(keyword, None)
+            if score is not None:
+                scored_matches.append((score, keyword))
+        found_matches = rank_scored_matches(scored_matches, get_result_limit())
+    else:
+        candidates = set(find_buffer_index_matches(vim.current.buffer,
+                encoding,
+                punctuation_chars,
+                keyword_base,
+                match_mode,
+                fold))
+        found_matches = [keyword for keyword in line_keywords
+                if keyword in candidates]
+
+    return finish_found_matches(keyword_base, found_matches,
+            match_mode == MATCH_MODE_PREFIX)
+
+def find_matches_in_buffer_indexes(buffers, min_length_keyword_base):
+    """
+    Like find_matches_in_lines for all lines of the buffers but look the
+    matches up in the keyword index of each buffer.  Every keyword is found
+    once in the order of its first occurrence.  The match mode tells which
+    keywords match.  Fuzzy matches are ranked by score instead.
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+
+    # The index has no answer for keyword bases that span multiple keywords.
+    if not is_keyword(keyword_base, punctuation_chars):
+        return list(collections.OrderedDict.fromkeys(find_matches_in_lines(
+                (line for buf in buffers for line in buf),
+                min_length_keyword_base)))
+
+    match_mode = get_match_mode()
+    fold = get_match_mode_fold(match_mode)
+    configure_index_cache()
+    found_matches = []
+    seen_matches = set()
+
+    if match_mode == MATCH_MODE_FUZZY:
+        # The best matches of all buffers are among the best of each buffer.
+        limit = get_result_limit()
+        scored_matches = []
+        for buf in buffers:
+            for score, match in find_buffer_fuzzy_matches(buf, encoding,
+                    punctuation_chars, keyword_base, fold, limit):
+                if match not in seen_matches:
+                    seen_matches.add(match)
+                    scored_matches.append((score, match))
+        found_matches = rank_scored_matches(scored_matches, limit)
+
+    else:
+        for buf in buffers:
+            for match in find_buffer_index_matches(buf, encoding,
+                    punctuation_chars, keyword_base, match_mode, fold):
+                if match not in seen_matches:
+                    seen_matches.add(match)
+                    found_matches.append(match)
+
+    return finish_found_matches(keyword_base, found_matches,
+            match_mode == MATCH_MODE_PREFIX)
+
+def get_file_keyword_index(path, punctuation_chars, fold=None,
+        want_trigrams=False, want_char_masks=False):
+    """
+    Like get_buffer_keyword_index for the UTF-8 file at path.  The index is
+    only rebuilt if the modification time or the size of the file changed.
+    Return None if the file cannot be read.
+    """
+    import filebuffers
+    try:
+        file_stamp = filebuffers.get_file_stamp(path)
+    except OSError:
+        return None
+    validity = (file_stamp,
+            punctuation_chars,
+            fold,
+            want_trigrams,
+            want_char_masks)
+    cache_key = (path, INDEX_KIND_FILE_KEYWORDS)
+    keyword_index = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if keyword_index is None:
+        try:
+            keywords = filebuffers.tokenize_file(path, punctuation_chars)
+        except (IOError, OSError):
+            return None
+        folds = () if fold is None else (fold,)
+        keyword_index = keywordindex.KeywordIndex(keywords,
+                folds,
+                want_trigrams,
+                want_char_masks)
+        BUFFER_INDEX_CACHE.put(cache_key, validity, keyword_index,
+                keyword_index.memory_size())
+    return keyword_index
+
+def get_unloaded_buffer_files():
+    """
+    Return the paths of the files of the buffers that are not loaded.  The
+    buffer filters and the recency order of get_all_buffers_in_search_order
+    apply to them as well.
+    """
+    unloaded_files = [(int(number), path) for number, path
+            in vim.eval("localcomplete#getUnloadedBufferFiles()")]
+    if not unloaded_files:
+        return []
+    want_recent_first = int(vim.eval(
+            "localcomplete#getWantRecentBuffersFirst()"))
+    is_wanted = get_buffer_info_filter()
+    if want_recent_first or is_wanted is not None:
+        buffer_infos = get_buffer_infos()
+        if is_wanted is not None:
+            unloaded_files = [(number, path)
+                    for number, path in unloaded_files
+                    if is_wanted(buffer_infos[number])]
+        if want_recent_first:
+            unloaded_files.sort(
+                    key=lambda item : -buffer_infos[item[0]].lastused)
+    return [path for number, path in unloaded_files]
+
+def find_matches_in_files(paths, min_length_keyword_base):
+    """
+    Return the keywords of the UTF-8 files that match a:keyword_base in the
+    match mode, file after file in the order of their first occurrence.
+    Fuzzy matches are ranked by score instead.  Only keyword bases that are
+    keywords themselves are looked up.
+    """
+    return find_matches_in_keyword_indexes(get_file_keyword_index, paths,
+            min_length_keyword_base)
+
+def find_matches_in_keyword_indexes(get_keyword_index, sources,
+        min_length_keyword_base):
+    """
+    Like find_matches_in_files for the keyword indexes of the sources.
+    get_keyword_index(source, punctuation_chars, fold, want_trigrams,
+    want_char_masks) returns the KeywordIndex of a source or None if it has
+    none.
+    """
+    encoding = vim.eval("&encoding")
+    keyword_base = vimtext.to_text(vim.eval("a:keyword_base"), encoding)
+
+    if len(keyword_base) < min_length_keyword_base:
+        return []
+
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+    if not is_keyword(keyword_base, punctuation_chars):
+        return []
+
+    match_mode = get_match_mode()
+    fold = get_match_mode_fold(match_mode)
+    configure_index_cache()
+    found_matches = []
+    seen_matches = set()
+
+    if match_mode == MATCH_MODE_FUZZY:
+        limit = get_result_limit()
+        scored_matches = []
+        for source in sources:
+            keyword_index = get_keyword_index(source, punctuation_chars,
+                    fold, want_char_masks=True)
+            if keyword_index is None:
+                continue
+            for score, match in keyword_index.find_fuzzy_matches(
+                    keyword_base, fold, limit):
+                if match not in seen_matches:
+                    seen_matches.add(match)
+                    scored_matches.append((score, match))
+        return rank_scored_matches(scored_matches, limit)
+
+    for source in sources:
+        keyword_index = get_keyword_index(source, punctuation_chars, fold,
+                match_mode == MATCH_MODE_SUBSTRING)
+        if keyword_index is None:
+            continue
+        for match in find_keyword_index_matches(keyword_index, keyword_base,
+                match_mode, fold):
+            if match not in seen_matches:
+                seen_matches.add(match)
+                found_matches.append(match)
+
+    if match_mode == MATCH_MODE_PREFIX:
+        found_matches = apply_infercase_to_matches_cond(
+                keyword_base, found_matches)
+    return found_matches
+
+def add_unloaded_buffer_matches(found_matches, min_length_keyword_base):
+    """
+    Append the matches in the files of unloaded buffers that are not among
+    the found matches of the loaded buffers yet.
+    """
+    known_matches = set(found_matches)
+    return found_matches + [match
+            for match in find_matches_in_files(get_unloaded_buffer_files(),
+                    min_length_keyword_base)
+            if match not in known_matches]
+
+def get_project_root():
+    return os.path.abspath(vim.eval("localcomplete#getProjectRoot()"))
+
+def get_project_index(root, punctuation_chars):
+    """
+    Return the ProjectIndex of root for the keyword characters.  A new one
+    starts with the state saved in the cache directory.
+    """
+    import projectindex
+    index_key = (root, punctuation_chars)
+    project_index = PROJECT_INDEXES.get(index_key)
+    if project_index is None:
+        cache_directory = vim.eval(
+                "localcomplete#getCacheDirectory()")
+        cache_path = None
+        if cache_directory:
+            cache_path = projectindex.get_cache_path(
+                    os.path.expanduser(cache_directory),
+                    root,
+                    punctuation_chars)
+        project_index = projectindex.ProjectIndex(root,
+                punctuation_chars,
+                cache_path)
+        PROJECT_INDEXES[index_key] = project_index
+    return project_index
+
+def start_project_refresh(project_index):
+    import projectindex
+    if project_index.is_refreshing():
+        return
+    worker_count = int(vim.eval("localcomplete#getProjectIndexWorkers()"))
+    max_file_bytes = int(vim.eval("localcomplete#getProjectMaxFileBytes()"))
+    project_index.start_refresh(projectindex.get_pool(worker_count),
+            max_file_bytes,
+            time.time(),
+            get_keyword_index_options())
+
+def poll_project_index(project_index):
+    """
+    Take over the finished work of a refresh.  A failed refresh is reported,
+    and the index keeps its previous state.
+    """
+    import projectindex
+    try:
+        project_index.poll()
+    except projectindex.ProjectIndexError as err:
+        vim.command('echoerr "Error refreshing the project index: %s"'
+                % str(err))
+
+def update_project_index(project_index):
+    """
+    Take over the result of a finished refresh and start the next refresh if
+    it is due.  Without worker processes the refresh is finished right away.
+    """
+    poll_project_index(project_index)
+    refresh_seconds = int(vim.eval(
+            "localcomplete#getProjectRefreshSeconds()"))
+    if project_index.needs_refresh(time.time(), refresh_seconds):
+        start_project_refresh(project_index)
+        poll_project_index(project_index)
+
+def get_project_keyword_index(project_index, punctuation_chars, fold=None,
+        want_trigrams=False, want_char_masks=False):
+    """
+    Like get_buffer_keyword_index for the keywords of a ProjectIndex.  The
+    index that the workers built during the refresh is used if it has the
+    requested tables.  Otherwise it is built here and only rebuilt after a
+    refresh changed the project index.
+    """
+    index_options = (fold, want_trigrams, want_char_masks)
+    if project_index.keyword_index_options == index_options:
+        return project_index.keyword_index
+    validity = (project_index.generation,
+            fold,
+            want_trigrams,
+            want_char_masks)
+    cache_key = ((project_index.root, project_index.punctuation_chars),
+            INDEX_KIND_PROJECT_KEYWORDS)
+    keyword_index = BUFFER_INDEX_CACHE.get(cache_key, validity)
+    if keyword_index is None:
+        folds = () if fold is None else (fold,)
+        keyword_index = keywordindex.KeywordIndex(
+                project_index.generate_keywords(),
+                folds,
+                want_trigrams,
+                want_char_masks)
+        BUFFER_INDEX_CACHE.put(cache_key, validity, keyword_index,
+                keyword_index.memory_size())
+    return keyword_index
+
+def transmit_project_result_to_vim(found_matches):
+    origin_note = vim.eval("g:localcomplete#OriginNoteProject")
+    vim.command(VIM_COMMAND_PROJECTCOMPLETE
+            % repr(produce_result_value(
+                    found_matches,
+                    origin_note)))
+
+def complete_project_matches():
+    """
+    Return a completion result for a:keyword_base searched in the files below
+    the project root.  Until the first refresh of the session is finished,
+    the matches come from the state saved by the last session.
+    """
+    encoding = vim.eval("&encoding")
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+    project_index = get_project_index(get_project_root(), punctuation_chars)
+    update_project_index(project_index)
+
+    found_matches = find_matches_in_keyword_indexes(
+            get_project_keyword_index,
+            [project_index],
+            int(vim.eval("localcomplete#getProjectMinPrefixLength()")))
+
+    transmit_project_result_to_vim(found_matches)
+
+def refresh_project_index():
+    """
+    Start a refresh of the index of the current project unless one is
+    running.
+    """
+    encoding = vim.eval("&encoding")
+    punctuation_chars = vimtext.to_text(get_additional_keyword_chars(),
+            encoding)
+    project_index = get_project_index(get_project_root(), punctuation_chars)
+    poll_project_index(project_index)
+    start_project_refresh(project_index)
+    poll_project_index(project_index)
+
 def complete_all_buffer_matches():
     """
     Return a completion result for a:keyword_base searched in all buffers
@@ -355,7 +1663,22 @@ def complete_all_buffer_matches():
     min_length_keyword_base = int(vim.eval(
             "localcomplete#getAllBufferMinPrefixLength()"))
 
-    found_matches = find_matches_in_lines(generate_all_buffer_lines(),
-            min_length_keyword_base)
+    # Only the keyword index supports the other match modes
+    if (int(vim.eval("localcomplete#getWantKeywordIndex()"))
+            or get_match_mode() != MATCH_MODE_PREFIX):
+        found_matches = find_matches_in_buffer_indexes(
+                get_all_buffers_in_search_order(),
+                min_length_keyword_base)
+    elif want_shared_line_tokens():
+        found_matches = find_shared_token_matches_in_lines(
+                generate_all_buffer_lines(),
+                min_length_keyword_base)
+    else:
+        found_matches = find_matches_in_lines(generate_all_buffer_lines(),
+                min_length_keyword_base)
+
+    if int(vim.eval("localcomplete#getWantUnloadedBuffers()")):
+        found_matches = add_unloaded_buffer_matches(found_matches,
+                min_length_keyword_base)
 
     transmit_all_buffer_result_to_vim(found_matches)
@@ -14,9 +14,12 @@
 
 import contextlib
 import functools
+import gzip
 import mock
 import os
 import re
+import shutil
+import tempfile
 import unittest
 
 
@@ -26,7 +29,13 @@ from tests.lc_testutils import fix_vim_module
 
 # Import localcomplete
 fix_vim_module()
+from pylibs import dictcompile
+from pylibs import filebuffers
+from pylibs import indexcache
+from pylibs import indexstore
 from pylibs import localcomplete
+from pylibs import projectindex
+from pylibs import tagfiles
 
 
 class LocalCompleteTestsError(Exception):
@@ -188,6 +197,22 @@ class TestApplyInfercaseToMatchesCond(unittest.TestCase):
                 matches_input=u"\u00dcber \u00fcberfu\u00df".split(),
                 matches_result=u"\u00dcber \u00dcberfu\u00df".split())
 
+    def test_accents_of_accent_folded_matches_are_kept(self):
+        self._helper_execute_infercase_test(
+                vim_ignorecase=1,
+                vim_infercase=1,
+                keyword_base=u"uber",
+                matches_input=u"\u00fcbermut Uberall".split(),
+                matches_result=u"\u00fcbermut uberall".split())
+
+    def test_decomposed_ligatures_are_kept_whole(self):
+        self._helper_execute_infercase_test(
+                vim_ignorecase=1,
+                vim_infercase=1,
+                keyword_base=u"fin",
+                matches_input=u"\ufb01nalize Final".split(),
+                matches_result=u"\ufb01nalize final".split())
+
 
 class TestGenerateHaystack(unittest.TestCase):
 
@@ -197,18 +222,22 @@ class TestGenerateHaystack(unittest.TestCase):
             buffer_content=("0", "1", "2", "3", "4", "5", "6"),
             above_range=range(1, 3),
             current_index=3,
-            below_range=range(4, 6)):
+            below_range=range(4, 6),
+            could_match=None,
+            **config):
 
+        config.setdefault('want_visible_first', 0)
         vim_mock = VimMockFactory.get_mock(
                 match_result_order=match_result_order,
-                buffer_content=buffer_content)
+                buffer_content=buffer_content,
+                **config)
         buffer_range_mock = mock.Mock(
                 return_value=(above_range, current_index, below_range))
 
         with mock.patch.multiple(__name__ + '.localcomplete',
                 get_buffer_ranges=buffer_range_mock,
                 vim=vim_mock):
-            actual_result = list(localcomplete.generate_haystack())
+            actual_result = list(localcomplete.generate_haystack(could_match))
         self.assertEqual(actual_result, expected_result_lines)
 
     def test_centered_order(self):
@@ -244,6 +273,78 @@ class TestGenerateHaystack(unittest.TestCase):
                     match_result_order=-1,
                     expected_result_lines=[])
 
+    def test_indexed_haystack(self):
+        vim_mock = VimMockFactory.get_mock(
+                match_result_order=localcomplete.MATCH_ORDER_NORMAL,
+                want_visible_first=0,
+                buffer_content=("0", "1", "2", "3"))
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_buffer_ranges=mock.Mock(
+                        return_value=(range(0, 1), 1, range(2, 3))),
+                vim=vim_mock):
+            actual_result = list(localcomplete.generate_indexed_haystack())
+        self.assertEqual(actual_result, [(0, "0"), (1, "1"), (2, "2")])
+
+    def test_lines_ruled_out_by_the_predicate_are_skipped(self):
+        self._helper_isolate_sut(
+                match_result_order=localcomplete.MATCH_ORDER_NORMAL,
+                expected_result_lines=["2", "4"],
+                could_match=lambda index : index % 2 == 0)
+
+    def test_centered_order_with_visible_lines_first(self):
+        self._helper_isolate_sut(
+                match_result_order=localcomplete.MATCH_ORDER_CENTERED,
+                expected_result_lines=["3", "2", "4", "5", "1"],
+                want_visible_first=1,
+                window_first_line=3,
+                window_last_line=7)
+
+    def test_reversed_order_with_visible_lines_first(self):
+        self._helper_isolate_sut(
+                match_result_order=localcomplete.MATCH_ORDER_REVERSE,
+                expected_result_lines=["4", "3", "2", "5", "1"],
+                want_visible_first=1,
+                window_first_line=3,
+                window_last_line=5)
+
+    def test_lines_after_the_window_are_read_on_demand(self):
+        buffer_content = mock.MagicMock()
+        buffer_content.__getitem__.side_effect = str
+        buffer_content.__len__.return_value = 7
+        vim_mock = VimMockFactory.get_mock(
+                match_result_order=localcomplete.MATCH_ORDER_NORMAL,
+                want_visible_first=1,
+                window_first_line=3,
+                window_last_line=5,
+                buffer_content=buffer_content)
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_buffer_ranges=mock.Mock(
+                        return_value=(range(0, 3), 3, range(4, 7))),
+                vim=vim_mock):
+            haystack = localcomplete.generate_haystack()
+            visible_lines = [next(haystack) for i in range(3)]
+
+        self.assertEqual(visible_lines, ["2", "3", "4"])
+        self.assertEqual(buffer_content.__getitem__.call_args_list,
+                [mock.call(2), mock.call(3), mock.call(4)])
+
+
+class TestClipIndexes(unittest.TestCase):
+
+    def test_keeps_the_indexes_in_the_range(self):
+        self.assertEqual(localcomplete.clip_indexes(range(2, 9), 4, 6),
+                [4, 5, 6])
+
+    def test_range_may_exceed_the_indexes(self):
+        self.assertEqual(localcomplete.clip_indexes(range(2, 5), 0, 9),
+                [2, 3, 4])
+
+    def test_disjoint_range_gives_no_indexes(self):
+        self.assertEqual(localcomplete.clip_indexes(range(2, 5), 6, 9), [])
+        self.assertEqual(localcomplete.clip_indexes(range(6, 9), 2, 5), [])
+        self.assertEqual(localcomplete.clip_indexes([], 2, 5), [])
+
 
 class TestGetBufferRanges(unittest.TestCase):
 
@@ -400,7 +501,12 @@ class TestCompleteLocalMatches(unittest.TestCase):
         haystack = ['contents']
         min_len = 3
 
-        vim_mock = VimMockFactory.get_mock(min_len_local=min_len)
+        vim_mock = VimMockFactory.get_mock(min_len_local=min_len,
+                want_line_prefilter=0,
+                want_local_ranking=0,
+                want_visible_first=0,
+                want_line_token_cache=0,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
         find_mock = mock.Mock(spec_set=[], return_value=result_list)
         haystack_mock = mock.Mock(spec_set=[], return_value=haystack)
         transmit_result_mock = mock.Mock(spec_set=[], return_value=[])
@@ -412,9 +518,136 @@ class TestCompleteLocalMatches(unittest.TestCase):
                 vim=vim_mock):
             localcomplete.complete_local_matches()
 
-        find_mock.assert_called_once_with(haystack, min_len)
+        haystack_mock.assert_called_once_with(None)
+        find_mock.assert_called_once_with(haystack, min_len, 0)
         transmit_result_mock.assert_called_once_with(result_list)
 
+    def test_ranks_matches_if_requested(self):
+        indexed_haystack = [(0, 'contents')]
+        vim_mock = VimMockFactory.get_mock(min_len_local=2,
+                want_line_prefilter=0,
+                want_local_ranking=1,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
+        find_mock = mock.Mock(spec_set=[], return_value=[])
+        haystack_mock = mock.Mock(spec_set=[], return_value=indexed_haystack)
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_ranked_matches_in_lines=find_mock,
+                generate_indexed_haystack=haystack_mock,
+                transmit_local_matches_result_to_vim=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.complete_local_matches()
+
+        haystack_mock.assert_called_once_with(None)
+        find_mock.assert_called_once_with(indexed_haystack, 2)
+
+    def test_other_match_modes_use_the_keyword_index(self):
+        haystack = ['contents']
+        vim_mock = VimMockFactory.get_mock(min_len_local=0,
+                match_mode=localcomplete.MATCH_MODE_ABBREVIATION)
+        find_mock = mock.Mock(spec_set=[], return_value=[])
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_index_matches_in_lines=find_mock,
+                generate_haystack=mock.Mock(return_value=haystack),
+                transmit_local_matches_result_to_vim=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.complete_local_matches()
+
+        find_mock.assert_called_once_with(haystack, 0)
+
+    def test_visible_lines_first_stops_at_the_result_limit(self):
+        haystack = ['contents']
+        vim_mock = VimMockFactory.get_mock(min_len_local=1,
+                want_line_prefilter=0,
+                want_local_ranking=0,
+                want_visible_first=1,
+                want_line_token_cache=0,
+                result_limit=5,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
+        find_mock = mock.Mock(spec_set=[], return_value=[])
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_matches_in_lines=find_mock,
+                generate_haystack=mock.Mock(return_value=haystack),
+                transmit_local_matches_result_to_vim=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.complete_local_matches()
+
+        find_mock.assert_called_once_with(haystack, 1, 5)
+
+
+    def test_line_token_cache_gets_indexed_lines(self):
+        indexed_haystack = [(0, 'contents')]
+        vim_mock = VimMockFactory.get_mock(min_len_local=1,
+                want_line_prefilter=0,
+                want_local_ranking=0,
+                want_visible_first=0,
+                want_line_token_cache=1,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
+        find_mock = mock.Mock(spec_set=[], return_value=[])
+        haystack_mock = mock.Mock(spec_set=[], return_value=indexed_haystack)
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_cached_token_matches_in_lines=find_mock,
+                generate_indexed_haystack=haystack_mock,
+                transmit_local_matches_result_to_vim=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.complete_local_matches()
+
+        haystack_mock.assert_called_once_with(None)
+        find_mock.assert_called_once_with(indexed_haystack, 1, 0)
+
+class TestFindRankedMatchesInLines(unittest.TestCase):
+
+    def _helper_ranked_test(self, indexed_lines, expected_result,
+            current_line_index=10, result_limit=0, min_len=0):
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base='pri',
+                keyword_chars='',
+                iskeyword='',
+                want_ignorecase_local=0,
+                vim_ignorecase=0,
+                vim_infercase=0,
+                result_limit=result_limit,
+                max_line_scan_bytes=0,
+                current_line_index=current_line_index,
+                buffer_content=[''] * 20)
+        with mock.patch.multiple(__name__ + '.localcomplete', vim=vim_mock):
+            actual_result = localcomplete.find_ranked_matches_in_lines(
+                    indexed_lines, min_len)
+        self.assertEqual(actual_result, expected_result.split())
+
+    def test_close_matches_rank_first(self):
+        self._helper_ranked_test(
+                indexed_lines=[(10, "prize"), (9, "priory"), (12, "primary"),
+                        (0, "prime")],
+                expected_result=u"prize priory primary prime")
+
+    def test_frequent_matches_outrank_rare_close_ones(self):
+        self._helper_ranked_test(
+                indexed_lines=[(8, "prize"), (9, "priory")]
+                        + [(i, "primary prize") for i in range(12, 15)],
+                expected_result=u"prize primary priory")
+
+    def test_equal_scores_keep_the_search_order(self):
+        self._helper_ranked_test(
+                indexed_lines=[(11, "prize"), (9, "priory")],
+                expected_result=u"prize priory")
+
+    def test_result_limit(self):
+        self._helper_ranked_test(
+                indexed_lines=[(10, "prize"), (9, "priory"), (0, "prime")],
+                expected_result=u"prize priory",
+                result_limit=2)
+
+    def test_find_nothing_if_min_length_limit_not_reached(self):
+        self._helper_ranked_test(
+                indexed_lines=[(10, "prize")],
+                expected_result=u"",
+                min_len=4)
+
 
 class TestFindstartGetLineUpToCursor(unittest.TestCase):
 
@@ -447,6 +680,11 @@ class TestFindstartGetLineUpToCursor(unittest.TestCase):
             actual_result = localcomplete.findstart_get_line_up_to_cursor()
         self.assertEqual(actual_result, u"")
 
+    def test_findstart_in_a_decoded_line_uses_the_byte_index(self):
+        with self._helper_mock_current(u"\u00fc\u00df\u00e4x", 4):
+            actual_result = localcomplete.findstart_get_line_up_to_cursor()
+        self.assertEqual(actual_result, u"\u00fc\u00df")
+
 
 class TestFindstartGetIndexOfTrailingKeyword(unittest.TestCase):
 
@@ -568,6 +806,7 @@ class TestFindstartLocalMatches(unittest.TestCase):
                 vim_mock = VimMockFactory.get_mock()
 
                 with mock.patch.multiple(__name__ + '.localcomplete',
+                        findstart_get_line_up_to_cursor=mock.Mock(),
                         findstart_translate_to_byte_index=byte_mock,
                         findstart_get_starting_column_index=mock.Mock(),
                         vim=vim_mock):
@@ -581,6 +820,20 @@ class TestFindstartLocalMatches(unittest.TestCase):
         vim_mock.command.assert_called_once_with(
                 localcomplete.VIM_COMMAND_FINDSTART % byte_index)
 
+    def test_the_line_is_decoded_once(self):
+        line_mock = mock.Mock(spec_set=[], return_value=u"ab cd")
+        byte_mock = mock.Mock(spec_set=[], return_value=3)
+        column_mock = mock.Mock(spec_set=[], return_value=3)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                findstart_get_line_up_to_cursor=line_mock,
+                findstart_translate_to_byte_index=byte_mock,
+                findstart_get_starting_column_index=column_mock,
+                vim=VimMockFactory.get_mock()):
+            localcomplete.findstart_local_matches()
+        line_mock.assert_called_once_with()
+        column_mock.assert_called_once_with(u"ab cd")
+        byte_mock.assert_called_once_with(3, u"ab cd")
+
 
 class TestCompleteDictMatches(unittest.TestCase):
 
@@ -592,13 +845,15 @@ class TestCompleteDictMatches(unittest.TestCase):
             origin_note_dict='undertest',
             want_ignorecase=False,
             is_dictionary_configured=True,
-            is_dictionary_path_valid=True):
+            is_dictionary_path_valid=True,
+            result_limit=0):
 
         translated_content = os.linesep.join(dict_content.split())
 
         dictionary_path = 'test:nonempty' if is_dictionary_configured else ''
 
-        content_mock = mock.Mock(spec_set=[], return_value=translated_content)
+        content_mock = mock.Mock(spec_set=[],
+                return_value=(chunk for chunk in [translated_content]))
 
         case_mock_retval = re.IGNORECASE if want_ignorecase else 0
         case_mock = mock.Mock(spec_set=[], return_value=case_mock_retval)
@@ -612,10 +867,11 @@ class TestCompleteDictMatches(unittest.TestCase):
                 origin_note_dict=origin_note_dict,
                 encoding=encoding,
                 keyword_base=keyword_base,
-                dictionary=dictionary_path)
+                dictionary=dictionary_path,
+                result_limit=result_limit)
 
         with mock.patch.multiple(__name__ + '.localcomplete',
-                read_file_contents=content_mock,
+                generate_dictionary_chunks=content_mock,
                 produce_result_value=produce_mock,
                 get_casematch_flag=case_mock,
                 apply_infercase_to_matches_cond=infercase_mock,
@@ -658,6 +914,13 @@ class TestCompleteDictMatches(unittest.TestCase):
                 keyword_base="pri$",
                 result_list=u"pri$ory pri$ze".split())
 
+    def test_find_dict_matches_up_to_the_result_limit(self):
+        self._helper_completion_tests(
+                dict_content=u"  priory prize priory none   primary  ",
+                keyword_base="pri",
+                result_limit=2,
+                result_list=u"priory prize priory".split())
+
     def test_find_no_matches_without_a_configured_dictionary(self):
         self._helper_completion_tests(
                 dict_content=u"  priory prize none   Priority   primary  ",
@@ -678,41 +941,224 @@ class TestCompleteDictMatches(unittest.TestCase):
         self.assertEqual(vim_mock.command.call_count, 2)
 
 
-class TestReadFileContent(unittest.TestCase):
+class TestFindCompressedDictionaryMatches(unittest.TestCase):
 
-    def test_read_file_content(self):
-        content = u" \u00fcber \u00fcberfu\u00df  "
-        with mock.patch('codecs.open', mock.mock_open(read_data=content)):
-            self.assertEqual(localcomplete.read_file_contents(""), content)
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'words.gz')
 
+    def tearDown(self):
+        shutil.rmtree(self.directory)
 
-class TestGetAllBuffersInSearchOrder(unittest.TestCase):
+    def _helper_write_dictionary(self, content):
+        with gzip.GzipFile(self.path, 'wb') as file_object:
+            file_object.write(content)
 
-    def _test_helper(self, buffer_numbers, current_index, ordered_numbers):
+    @contextlib.contextmanager
+    def _helper_isolate_cache(self):
+        lines_mock = mock.Mock(side_effect=(
+                filebuffers.generate_decompressed_lines))
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            with mock.patch.object(filebuffers,
+                    'generate_decompressed_lines', lines_mock):
+                yield lines_mock
+
+    def _helper_find(self, keyword_base, casematch_flag=0):
+        return localcomplete.find_dictionary_matches(self.path,
+                keyword_base, casematch_flag)
+
+    def test_find_case_sensitive_matches(self):
+        self._helper_write_dictionary(b"priory\nprize\nnone\nPriority\n"
+                b"primary\npri\n")
+        with self._helper_isolate_cache():
+            self.assertEqual(self._helper_find(u"pri"),
+                    [u"priory", u"prize", u"primary"])
 
-        if current_index < 0 or current_index >= len(buffer_numbers):
-            raise LocalCompleteTestsError("current buffer index out of bounds")
+    def test_find_case_insensitive_matches(self):
+        self._helper_write_dictionary(b"priory\nprize\nnone\nPriority\n")
+        with self._helper_isolate_cache():
+            self.assertEqual(self._helper_find(u"pri", re.IGNORECASE),
+                    [u"priory", u"prize", u"Priority"])
+
+    def test_matches_end_after_the_word_characters(self):
+        self._helper_write_dictionary(b"pri$ory one\npri$ze\r\npri$\n"
+                b"pri$ory two\n")
+        with self._helper_isolate_cache():
+            self.assertEqual(self._helper_find(u"pri$"),
+                    [u"pri$ory", u"pri$ze"])
+
+    def test_index_is_reused_while_the_file_is_unchanged(self):
+        self._helper_write_dictionary(b"alpha\nbeta\n")
+        with self._helper_isolate_cache() as lines_mock:
+            self._helper_find(u"al")
+            self.assertEqual(self._helper_find(u"be"), [u"beta"])
+        self.assertEqual(lines_mock.call_count, 1)
+
+    def test_index_is_rebuilt_after_the_file_changed(self):
+        self._helper_write_dictionary(b"alpha\n")
+        with self._helper_isolate_cache() as lines_mock:
+            self._helper_find(u"al")
+            self._helper_write_dictionary(b"alpha\naltitude\n")
+            self.assertEqual(self._helper_find(u"al"),
+                    [u"alpha", u"altitude"])
+        self.assertEqual(lines_mock.call_count, 2)
+
+    def test_compiled_dictionaries_are_searched_in_their_index(self):
+        self._helper_write_dictionary(b"priory\nprize\nPriority\n")
+        index_path = os.path.join(self.directory, 'words.lcidx')
+        dictcompile.compile_word_list(self.path, index_path)
+        load_mock = mock.Mock(
+                side_effect=dictcompile.load_dictionary_index)
+        with self._helper_isolate_cache():
+            with mock.patch.object(dictcompile,
+                    'load_dictionary_index', load_mock):
+                self.path = index_path
+                self.assertEqual(self._helper_find(u"PRI", re.IGNORECASE),
+                        [u"priory", u"prize", u"Priority"])
+                self.assertEqual(self._helper_find(u"pri"),
+                        [u"priory", u"prize"])
+        load_mock.assert_called_once_with(index_path)
+
+    def test_invalid_index_files_raise_a_read_error(self):
+        self.path = os.path.join(self.directory, 'words.lcidx')
+        with open(self.path, 'wb') as file_object:
+            file_object.write(b"no index")
+        with self._helper_isolate_cache():
+            with self.assertRaises(localcomplete.get_dictionary_read_errors()):
+                self._helper_find(u"al")
+
+    def test_missing_dictionary_raises_a_decompression_error(self):
+        with self._helper_isolate_cache():
+            with self.assertRaises(
+                    filebuffers.DECOMPRESSION_ERRORS):
+                self._helper_find(u"al")
+
+
+class TestCompleteTagMatches(unittest.TestCase):
 
-        class VimBufferFake:
-            def __init__(self, number):
-                self.number = number
-            def __eq__(self, number):
-                return self.number == number
-            def __repr__(self):
-                return str(self.number)
+    @contextlib.contextmanager
+    def _helper_isolate_tag_matches(self, keyword_base, min_len_tags=1,
+            want_ignorecase=False):
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base=keyword_base,
+                min_len_tags=min_len_tags,
+                tag_files=['tags', 'other/tags'],
+                result_limit=7,
+                origin_note_tags='tags')
+        case_mock_retval = re.IGNORECASE if want_ignorecase else 0
+        find_mock = mock.Mock(spec_set=[],
+                return_value=[b'alpha', b'gr\xc3\xbc\xc3\x9fe'])
+        infercase_mock = mock.Mock(spec_set=[],
+                side_effect=lambda keyword, matches : matches)
+        produce_mock = mock.Mock(spec_set=[],
+                side_effect=lambda matches, origin : matches)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_casematch_flag=mock.Mock(return_value=case_mock_retval),
+                apply_infercase_to_matches_cond=infercase_mock,
+                produce_result_value=produce_mock,
+                vim=vim_mock):
+            with mock.patch.object(tagfiles, 'find_tag_names',
+                    find_mock):
+                yield vim_mock, find_mock, produce_mock
+
+    def test_tag_names_are_transmitted_with_origin(self):
+        with self._helper_isolate_tag_matches("al",
+                want_ignorecase=True) as (vim_mock, find_mock, produce_mock):
+            localcomplete.complete_tag_matches()
+        find_mock.assert_called_once_with(['tags', 'other/tags'], b'al',
+                True, 7)
+        produce_mock.assert_called_once_with(
+                [u'alpha', u'gr\u00fc\u00dfe'], 'tags')
+        vim_mock.command.assert_called_once_with(
+                localcomplete.VIM_COMMAND_TAGCOMPLETE
+                % repr([u'alpha', u'gr\u00fc\u00dfe']))
+
+    def test_find_nothing_if_min_length_limit_not_reached(self):
+        with self._helper_isolate_tag_matches("al", min_len_tags=3) as (
+                vim_mock, find_mock, produce_mock):
+            localcomplete.complete_tag_matches()
+        self.assertFalse(find_mock.called)
+        produce_mock.assert_called_once_with([], 'tags')
+
+
+class TestGenerateDictionaryChunks(unittest.TestCase):
+
+    def _helper_chunks(self, content, chunk_size):
+        with mock.patch('codecs.open', mock.mock_open(read_data=content)):
+            return list(localcomplete.generate_dictionary_chunks("",
+                    chunk_size))
+
+    def test_small_file_is_one_chunk(self):
+        content = u" \u00fcber \u00fcberfu\u00df  "
+        self.assertEqual(self._helper_chunks(content, 64), [content])
+
+    def test_chunks_end_after_the_last_line_break(self):
+        self.assertEqual(self._helper_chunks(u"ab\ncd\nef\ngh", 4),
+                [u"ab\n", u"cd\n", u"ef\n", u"gh"])
+
+    def test_lines_crossing_reads_are_carried_over(self):
+        self.assertEqual(self._helper_chunks(u"abcdefg\nhi\n", 3),
+                [u"abcdefg\n", u"hi\n"])
+
+    def test_empty_file_has_no_chunks(self):
+        self.assertEqual(self._helper_chunks(u"", 4), [])
+
+    def test_utf8_sequences_crossing_reads_are_decoded(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'words.txt')
+            with open(path, 'wb') as file_object:
+                file_object.write(
+                        u"\u00fc\u00fc\u00fc\n\u00df".encode('utf-8'))
+            self.assertEqual(
+                    list(localcomplete.generate_dictionary_chunks(path, 1)),
+                    [u"\u00fc\u00fc\u00fc\n", u"\u00df"])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_file_is_only_read_as_far_as_needed(self):
+        open_mock = mock.mock_open(read_data=u"one\ntwo\nthree\n")
+        with mock.patch('codecs.open', open_mock):
+            chunks = localcomplete.generate_dictionary_chunks("", 4)
+            self.assertEqual(next(chunks), u"one\n")
+            chunks.close()
+        self.assertEqual(open_mock.return_value.read.call_count, 1)
+        self.assertEqual(open_mock.return_value.__exit__.call_count, 1)
 
-        vim_mock = mock.Mock()
-        vim_mock.buffers = []
 
-        for idx, number in enumerate(buffer_numbers):
-            vim_mock.buffers.append(VimBufferFake(number))
-            if idx == current_index:
-                vim_mock.current.buffer.number = number
+class TestGetAllBuffersInSearchOrder(unittest.TestCase):
 
+    BUFFER_SEARCH_DEFAULTS = dict(
+            skip_buffer_line_bytes=0,
+            want_listed_buffers_only=0,
+            skip_buffer_types='',
+            want_same_filetype_only=0,
+            max_buffer_line_count=0,
+            want_recent_buffers_first=0)
+
+    def _helper_search_order(self, buffers, current_index, **config):
+        vim_config = dict(self.BUFFER_SEARCH_DEFAULTS)
+        vim_config.update(config)
+        vim_mock = VimMockFactory.get_mock(
+                buffer_content=buffers[current_index],
+                **vim_config)
+        vim_mock.buffers = buffers
         with mock.patch.multiple(__name__ + '.localcomplete',
                 vim=vim_mock):
             buffer_list = localcomplete.get_all_buffers_in_search_order()
-        self.assertEqual(buffer_list, ordered_numbers)
+        return [buf.number for buf in buffer_list]
+
+    def _test_helper(self, buffer_numbers, current_index, ordered_numbers):
+
+        if current_index < 0 or current_index >= len(buffer_numbers):
+            raise LocalCompleteTestsError("current buffer index out of bounds")
+
+        buffers = [_create_buffer_fake(number, [])
+                for number in buffer_numbers]
+        self.assertEqual(self._helper_search_order(buffers, current_index),
+                ordered_numbers)
 
     def test_buffer_in_the_middle_first(self):
         self._test_helper(
@@ -732,6 +1178,133 @@ class TestGetAllBuffersInSearchOrder(unittest.TestCase):
                 current_index=2,
                 ordered_numbers=[7, 6, 5])
 
+    def test_other_buffers_with_long_lines_are_skipped(self):
+        buffers = [_create_buffer_fake(1, ["x" * 9]),
+                _create_buffer_fake(2, ["x" * 9]),
+                _create_buffer_fake(3, ["short", "x" * 8]),
+                _create_buffer_fake(4, ["short"] * 8 + ["x" * 9])]
+        self.assertEqual(
+                self._helper_search_order(buffers, 1,
+                        skip_buffer_line_bytes=8),
+                [2, 3, 4])
+
+    def _helper_filtered_order(self, **config):
+        # [bufnr, listed, lastused, linecount, buftype, filetype]
+        buffer_info = [
+                [1, 1, 500, 10, '', 'python'],
+                [2, 0, 100, 10, 'help', 'help'],
+                [3, 1, 300, 900, '', 'python'],
+                [4, 1, 400, 10, 'terminal', ''],
+                [5, 1, 200, 10, '', 'vim'],
+                [6, 1, 900, 10, '', 'python'],
+                ]
+        buffers = [_create_buffer_fake(info[0], [])
+                for info in buffer_info]
+        return self._helper_search_order(buffers, 2,
+                buffer_info=buffer_info,
+                vim_filetype='python',
+                **config)
+
+    def test_unlisted_buffers_are_skipped_if_requested(self):
+        self.assertEqual(
+                self._helper_filtered_order(want_listed_buffers_only=1),
+                [3, 1, 4, 5, 6])
+
+    def test_buffer_types_are_skipped_if_requested(self):
+        self.assertEqual(
+                self._helper_filtered_order(skip_buffer_types='help,terminal'),
+                [3, 1, 5, 6])
+
+    def test_other_filetypes_are_skipped_if_requested(self):
+        self.assertEqual(
+                self._helper_filtered_order(want_same_filetype_only=1),
+                [3, 1, 6])
+
+    def test_big_buffers_are_skipped_if_requested(self):
+        self.assertEqual(
+                self._helper_filtered_order(max_buffer_line_count=100,
+                        want_listed_buffers_only=1),
+                [3, 1, 4, 5, 6])
+        self.assertEqual(
+                self._helper_filtered_order(max_buffer_line_count=9),
+                [3])
+
+    def test_recently_used_buffers_first_if_requested(self):
+        self.assertEqual(
+                self._helper_filtered_order(want_recent_buffers_first=1),
+                [3, 6, 1, 4, 5, 2])
+
+    def test_equal_times_keep_the_neighbor_order(self):
+        buffer_info = [[number, 1, 7, 1, '', ''] for number in range(1, 6)]
+        buffers = [_create_buffer_fake(number, [])
+                for number in range(1, 6)]
+        self.assertEqual(
+                self._helper_search_order(buffers, 2,
+                        want_recent_buffers_first=1,
+                        buffer_info=buffer_info),
+                [3, 2, 4, 1, 5])
+
+
+class TestHasLongLines(unittest.TestCase):
+
+    def test_only_the_first_lines_are_probed(self):
+        lines = ["short"] * localcomplete.LONG_LINE_PROBE_COUNT + ["x" * 9]
+        self.assertFalse(localcomplete.has_long_lines(lines, 8))
+        self.assertTrue(localcomplete.has_long_lines(lines[1:], 8))
+
+    def test_lines_up_to_the_limit_are_not_long(self):
+        self.assertFalse(localcomplete.has_long_lines(["x" * 8], 8))
+        self.assertFalse(localcomplete.has_long_lines([], 8))
+
+
+class TestGetLineChunker(unittest.TestCase):
+
+    def _helper_chunks(self, line, encoding='utf-8', max_line_scan_bytes=0,
+            want_cuts=True):
+        vim_mock = VimMockFactory.get_mock(
+                max_line_scan_bytes=max_line_scan_bytes)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                LINE_CHUNK_BYTES=4,
+                vim=vim_mock):
+            chunk_line = localcomplete.get_line_chunker(encoding, u'-',
+                    want_cuts)
+            return list(chunk_line(line))
+
+    def test_short_lines_are_not_cut(self):
+        self.assertEqual(self._helper_chunks("a-bc"), ["a-bc"])
+
+    def test_long_lines_are_cut_between_keywords(self):
+        self.assertEqual(self._helper_chunks("a-bc-d e fg h"),
+                ["a-bc-d ", "e fg ", "h"])
+
+    def test_lines_are_only_capped_without_cuts(self):
+        self.assertEqual(
+                self._helper_chunks("a-bc-d e fg h", want_cuts=False),
+                ["a-bc-d e fg h"])
+        self.assertEqual(
+                self._helper_chunks("ab cd-ef gh ij", max_line_scan_bytes=4,
+                        want_cuts=False),
+                ["ab cd-ef "])
+
+    def test_lines_are_capped_at_the_max_scan_bytes(self):
+        self.assertEqual(
+                self._helper_chunks("ab cd-ef gh ij", max_line_scan_bytes=4),
+                ["ab cd-ef "])
+
+    def test_lines_of_other_encodings_are_not_cut(self):
+        self.assertEqual(
+                self._helper_chunks("ab cd ef gh", encoding='cp932',
+                        max_line_scan_bytes=4),
+                ["ab cd ef gh"])
+
+    def test_decoded_lines_of_all_encodings_are_cut(self):
+        with mock.patch.object(localcomplete.vimtext, 'VIM_PASSES_TEXT',
+                True):
+            self.assertEqual(
+                    self._helper_chunks(u"\u00e4-\u00fc\u00df-d e\u00a0fg",
+                            encoding='cp932'),
+                    [u"\u00e4-\u00fc\u00df-d ", u"e\u00a0fg"])
+
 
 class TestGenerateBufferLines(unittest.TestCase):
 
@@ -774,7 +1347,10 @@ class TestFindMatchesInLines(unittest.TestCase):
             keyword_base,
             encoding='utf-8',
             keyword_chars='',
-            want_ignorecase=False):
+            want_ignorecase=False,
+            match_mode=localcomplete.MATCH_MODE_PREFIX,
+            result_limit=0,
+            max_line_scan_bytes=0):
 
         case_mock_retval = re.IGNORECASE if want_ignorecase else 0
 
@@ -785,7 +1361,8 @@ class TestFindMatchesInLines(unittest.TestCase):
 
         vim_mock = VimMockFactory.get_mock(
                 encoding=encoding,
-                keyword_base=keyword_base)
+                keyword_base=keyword_base,
+                max_line_scan_bytes=max_line_scan_bytes)
 
         with mock.patch.multiple(__name__ + '.localcomplete',
                 get_additional_keyword_chars=chars_mock,
@@ -890,6 +1467,72 @@ class TestFindMatchesInLines(unittest.TestCase):
                     **isolation_args)
 
 
+    def test_stop_reading_lines_at_the_result_limit(self):
+        def generate_lines():
+            yield " priory prize priory "
+            yield " prized primary "
+            raise AssertionError("Read too many lines")
+
+        with self._helper_isolate_find_matches(keyword_base="pri"):
+            actual_result = localcomplete.find_matches_in_lines(
+                    generate_lines(), 0, 3)
+        self.assertEqual(actual_result, u"priory prize priory prized".split())
+
+    def test_repeated_matches_do_not_count_for_the_result_limit(self):
+        with self._helper_isolate_find_matches(keyword_base="pri"):
+            actual_result = localcomplete.find_matches_in_lines(
+                    [" prize prize prize ", " priory prize primary "], 0, 2)
+        self.assertEqual(actual_result,
+                u"prize prize prize priory prize".split())
+
+    def test_long_lines_give_the_same_matches_in_chunks(self):
+        with mock.patch.object(localcomplete, 'LINE_CHUNK_BYTES', 5):
+            self._helper_completion_tests(
+                    lines=[" priory prize-pri:prized a-primary ", "prime"],
+                    keyword_chars='-',
+                    keyword_base="pri",
+                    result_list=(
+                            u"priory prize-pri prized prime".split()))
+
+    def test_long_lines_are_only_searched_up_to_the_cap(self):
+        self._helper_completion_tests(
+                lines=[" priory prize prized ", " primary"],
+                keyword_base="pri",
+                max_line_scan_bytes=9,
+                result_list=u"priory prize primary".split())
+
+    def test_decoded_lines_are_searched_as_they_are(self):
+        with mock.patch.object(localcomplete.vimtext, 'VIM_PASSES_TEXT',
+                True):
+            with mock.patch.object(localcomplete, 'LINE_CHUNK_BYTES', 5):
+                self._helper_completion_tests(
+                        lines=[u" pri\u00fcry pri\u00dfe-x pri:", u"prime"],
+                        keyword_chars='-',
+                        keyword_base="pri",
+                        encoding='latin1',
+                        result_list=[u"pri\u00fcry", u"pri\u00dfe-x",
+                                u"prime"])
+
+    def test_stop_in_a_long_line_at_the_result_limit(self):
+        generate_chunks = localcomplete.longlines.generate_chunks
+        searched_chunks = []
+
+        def generate_recorded_chunks(*args):
+            for chunk in generate_chunks(*args):
+                searched_chunks.append(chunk)
+                yield chunk
+
+        line = " prize priory prime " + "primary " * 100
+        with self._helper_isolate_find_matches(keyword_base="pri"):
+            with mock.patch.multiple(__name__ + '.localcomplete',
+                    LINE_CHUNK_BYTES=8):
+                with mock.patch.object(localcomplete.longlines,
+                        'generate_chunks', generate_recorded_chunks):
+                    actual_result = localcomplete.find_matches_in_lines(
+                            [line], 0, 2)
+        self.assertEqual(actual_result, u"prize priory".split())
+        self.assertEqual(searched_chunks, [" prize priory ", "prime primary "])
+
 class TestCompleteAllBufferMatches(unittest.TestCase):
 
     def test_transmits_found_matches_to_vim(self):
@@ -897,7 +1540,12 @@ class TestCompleteAllBufferMatches(unittest.TestCase):
         buffers_contents = ['contents']
         min_len = 3
 
-        vim_mock = VimMockFactory.get_mock(min_len_all_buffer=min_len)
+        vim_mock = VimMockFactory.get_mock(
+                min_len_all_buffer=min_len,
+                want_unloaded_buffers=0,
+                want_keyword_index=0,
+                want_shared_line_token_cache=0,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
         find_mock = mock.Mock(spec_set=[], return_value=result_list)
         buffers_mock = mock.Mock(spec_set=[], return_value=buffers_contents)
         transmit_result_mock = mock.Mock(spec_set=[], return_value=[])
@@ -911,3 +1559,1200 @@ class TestCompleteAllBufferMatches(unittest.TestCase):
 
         find_mock.assert_called_once_with(buffers_contents, min_len)
         transmit_result_mock.assert_called_once_with(result_list)
+
+    def test_uses_the_shared_line_tokens_if_requested(self):
+        buffers_contents = ['contents']
+        vim_mock = VimMockFactory.get_mock(
+                min_len_all_buffer=2,
+                want_unloaded_buffers=0,
+                want_keyword_index=0,
+                want_shared_line_token_cache=1,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
+        find_mock = mock.Mock(spec_set=[], return_value=[])
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_shared_token_matches_in_lines=find_mock,
+                generate_all_buffer_lines=mock.Mock(
+                        return_value=buffers_contents),
+                transmit_all_buffer_result_to_vim=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.complete_all_buffer_matches()
+
+        find_mock.assert_called_once_with(buffers_contents, 2)
+
+    def test_looks_up_matches_in_the_keyword_index_if_requested(self):
+        result_list = ['results']
+        buffers = ['buffers']
+        min_len = 3
+
+        vim_mock = VimMockFactory.get_mock(
+                min_len_all_buffer=min_len,
+                want_unloaded_buffers=0,
+                want_keyword_index=1)
+        find_mock = mock.Mock(spec_set=[], return_value=result_list)
+        buffers_mock = mock.Mock(spec_set=[], return_value=buffers)
+        transmit_result_mock = mock.Mock(spec_set=[], return_value=[])
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_matches_in_buffer_indexes=find_mock,
+                get_all_buffers_in_search_order=buffers_mock,
+                transmit_all_buffer_result_to_vim=transmit_result_mock,
+                vim=vim_mock):
+            localcomplete.complete_all_buffer_matches()
+
+        find_mock.assert_called_once_with(buffers, min_len)
+        transmit_result_mock.assert_called_once_with(result_list)
+
+    def test_other_match_modes_always_use_the_keyword_index(self):
+        buffers = ['buffers']
+        vim_mock = VimMockFactory.get_mock(
+                min_len_all_buffer=0,
+                want_unloaded_buffers=0,
+                want_keyword_index=0,
+                match_mode=localcomplete.MATCH_MODE_SUBSTRING)
+        find_mock = mock.Mock(spec_set=[], return_value=[])
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_matches_in_buffer_indexes=find_mock,
+                get_all_buffers_in_search_order=mock.Mock(
+                        return_value=buffers),
+                transmit_all_buffer_result_to_vim=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.complete_all_buffer_matches()
+
+        find_mock.assert_called_once_with(buffers, 0)
+
+    def test_adds_the_matches_of_unloaded_buffers_if_requested(self):
+        vim_mock = VimMockFactory.get_mock(
+                min_len_all_buffer=2,
+                want_unloaded_buffers=1,
+                want_keyword_index=0,
+                want_shared_line_token_cache=0,
+                match_mode=localcomplete.MATCH_MODE_PREFIX)
+        add_mock = mock.Mock(spec_set=[], return_value=['all'])
+        transmit_result_mock = mock.Mock(spec_set=[], return_value=[])
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                find_matches_in_lines=mock.Mock(return_value=['loaded']),
+                generate_all_buffer_lines=mock.Mock(return_value=[]),
+                add_unloaded_buffer_matches=add_mock,
+                transmit_all_buffer_result_to_vim=transmit_result_mock,
+                vim=vim_mock):
+            localcomplete.complete_all_buffer_matches()
+
+        add_mock.assert_called_once_with(['loaded'], 2)
+        transmit_result_mock.assert_called_once_with(['all'])
+
+
+class VimBufferFake(list):
+    number = None
+    name = None
+
+
+def _create_buffer_fake(number, lines):
+    buffer_fake = VimBufferFake(lines)
+    buffer_fake.number = number
+    return buffer_fake
+
+
+class TestGetKeywordRegex(unittest.TestCase):
+
+    def test_regexes_are_compiled_once_per_keyword_chars(self):
+        compile_mock = mock.Mock(side_effect=lambda chars : object())
+        with mock.patch.object(localcomplete, 'KEYWORD_REGEXES', {}):
+            first = localcomplete.get_keyword_regex(compile_mock, u'-')
+            second = localcomplete.get_keyword_regex(compile_mock, u'-')
+            other = localcomplete.get_keyword_regex(compile_mock, u':')
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(compile_mock.call_args_list,
+                [mock.call(u'-'), mock.call(u':')])
+
+
+class TestIsKeyword(unittest.TestCase):
+
+    def test_alphanumerical_text_is_a_keyword(self):
+        self.assertTrue(localcomplete.is_keyword(u"\u00fcber_1", u""))
+
+    def test_the_empty_string_is_a_keyword(self):
+        self.assertTrue(localcomplete.is_keyword(u"", u""))
+
+    def test_punctuation_is_only_a_keyword_if_configured(self):
+        self.assertFalse(localcomplete.is_keyword(u"a:b", u""))
+        self.assertTrue(localcomplete.is_keyword(u"a:b", u":"))
+
+    def test_whitespace_is_no_keyword(self):
+        self.assertFalse(localcomplete.is_keyword(u"a b", u""))
+
+
+class TestGetBufferKeywordIndex(unittest.TestCase):
+
+    @contextlib.contextmanager
+    def _helper_isolate_cache(self, changedticks):
+        vim_mock = VimMockFactory.get_mock(changedticks=changedticks)
+        build_mock = mock.Mock(spec_set=[],
+                side_effect=lambda *args : mock.Mock(
+                        memory_size=mock.Mock(return_value=10)))
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20),
+                build_keyword_index=build_mock,
+                get_warm_start_source=mock.Mock(return_value=None),
+                vim=vim_mock):
+            yield build_mock
+
+    def test_index_is_reused_while_the_buffer_is_unchanged(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            first = localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'')
+            second = localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'')
+        self.assertIs(first, second)
+        build_mock.assert_called_once_with(
+                buffer_fake, 'utf-8', u'', (), False, False)
+
+    def test_index_is_built_for_the_requested_folding(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        fold = localcomplete.keywordindex.fold_case
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u'')
+            localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'', fold)
+        self.assertEqual(build_mock.call_count, 2)
+        build_mock.assert_called_with(
+                buffer_fake, 'utf-8', u'', (fold,), False, False)
+
+    def test_index_is_rebuilt_after_a_change(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            first = localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'')
+            localcomplete.vim.eval.side_effect = lambda expression : "6"
+            second = localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'')
+        self.assertIsNot(first, second)
+        self.assertEqual(build_mock.call_count, 2)
+
+    def test_index_is_rebuilt_after_a_purge(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u'')
+            localcomplete.purge_buffer_caches(2)
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u'')
+        self.assertEqual(build_mock.call_count, 2)
+
+    def test_index_is_rebuilt_for_substring_queries(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u'')
+            localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'', want_trigrams=True)
+        self.assertEqual(build_mock.call_count, 2)
+        build_mock.assert_called_with(
+                buffer_fake, 'utf-8', u'', (), True, False)
+
+    def test_index_is_rebuilt_for_fuzzy_queries(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u'')
+            localcomplete.get_buffer_keyword_index(
+                    buffer_fake, 'utf-8', u'', want_char_masks=True)
+        self.assertEqual(build_mock.call_count, 2)
+        build_mock.assert_called_with(
+                buffer_fake, 'utf-8', u'', (), False, True)
+
+    def test_index_is_rebuilt_for_other_keyword_chars(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with self._helper_isolate_cache({2: 5}) as build_mock:
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u'')
+            localcomplete.get_buffer_keyword_index(buffer_fake, 'utf-8', u':')
+        self.assertEqual(build_mock.call_count, 2)
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, 'cache')
+        self.buffer_fake = _create_buffer_fake(2, ["alpha beta", "alpine"])
+        self.buffer_fake.name = os.path.join(self.directory, 'file.txt')
+        with open(self.buffer_fake.name, 'wb') as file_object:
+            file_object.write(b"alpha beta\nalpine\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_warm_start_source(self, want_warm_start_cache=1,
+            cache_directory=None, modified=False):
+        if cache_directory is None:
+            cache_directory = self.cache_directory
+        vim_mock = VimMockFactory.get_mock(
+                want_warm_start_cache=want_warm_start_cache,
+                cache_directory=cache_directory)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                is_buffer_modified=mock.Mock(return_value=modified),
+                vim=vim_mock):
+            return localcomplete.get_warm_start_source(
+                    self.buffer_fake, 'utf-8', u'')
+
+    def test_source_of_an_unmodified_buffer(self):
+        source = self._helper_warm_start_source()
+        self.assertEqual(os.path.dirname(source.store_path),
+                os.path.join(self.cache_directory, 'buffers'))
+        self.assertEqual(source.file_stamp,
+                filebuffers.get_file_stamp(
+                        self.buffer_fake.name))
+        self.assertEqual(source.content_crc,
+                indexstore.get_lines_crc(["alpha beta", "alpine"]))
+
+    def test_no_source_if_not_wanted_or_not_matching_the_file(self):
+        self.assertIsNone(
+                self._helper_warm_start_source(want_warm_start_cache=0))
+        self.assertIsNone(self._helper_warm_start_source(cache_directory=''))
+        self.assertIsNone(self._helper_warm_start_source(modified=True))
+        self.buffer_fake.name = os.path.join(self.directory, 'missing')
+        self.assertIsNone(self._helper_warm_start_source())
+
+    def _helper_get_index(self, build_mock):
+        source = self._helper_warm_start_source()
+        vim_mock = VimMockFactory.get_mock(changedticks={2: 1})
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20),
+                build_keyword_index=build_mock,
+                get_warm_start_source=mock.Mock(return_value=source),
+                vim=vim_mock):
+            return localcomplete.get_buffer_keyword_index(self.buffer_fake,
+                    'utf-8', u'', localcomplete.keywordindex.fold_case)
+
+    def test_index_of_the_last_session_is_loaded(self):
+        build_mock = mock.Mock(
+                side_effect=localcomplete.build_keyword_index)
+        first = self._helper_get_index(build_mock)
+        second = self._helper_get_index(build_mock)
+        self.assertEqual(build_mock.call_count, 1)
+        self.assertIsNot(first, second)
+        fold = localcomplete.keywordindex.fold_case
+        self.assertEqual(second.find_prefix_matches(u"AL", fold),
+                [u"alpha", u"alpine"])
+
+
+class TestGetLinePrefilter(unittest.TestCase):
+
+    @contextlib.contextmanager
+    def _helper_isolate_sut(self, buffer_lines, **further_args):
+        vim_mock = VimMockFactory.get_mock(
+                index_cache_max_megabytes=1,
+                want_warm_start_cache=0,
+                changedticks={2: 1},
+                buffer_content=_create_buffer_fake(2, buffer_lines),
+                **further_args)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(0),
+                LINE_BLOCK_SIZE=2,
+                vim=vim_mock):
+            yield
+
+    def _helper_predicate_test(self, expected_result, **isolation_args):
+        with self._helper_isolate_sut(want_line_prefilter=1,
+                **isolation_args):
+            could_match = localcomplete.get_line_prefilter()
+            self.assertEqual(
+                    [could_match(i) for i in range(len(expected_result))],
+                    expected_result)
+
+    def test_no_predicate_unless_wanted(self):
+        with self._helper_isolate_sut(["pri"], want_line_prefilter=0):
+            self.assertIsNone(localcomplete.get_line_prefilter())
+
+    def test_decoded_lines(self):
+        self._helper_predicate_test(
+                expected_result=[True, True, False, False, True],
+                buffer_lines=[u"\u00fcber", u"x", u"y", u"z", u"Bern"],
+                keyword_base="ber",
+                want_ignorecase_local=0)
+
+    def test_blocks_without_the_keyword_base_are_ruled_out(self):
+        self._helper_predicate_test(
+                expected_result=[True, True, False, False, True],
+                buffer_lines=["pri", "x", "y", "z", "PRI"],
+                keyword_base="pri",
+                want_ignorecase_local=1)
+
+    def test_case_sensitive_non_ascii_keyword_base(self):
+        self._helper_predicate_test(
+                expected_result=[False, False],
+                buffer_lines=[u"\u00dcber".encode('utf-8'), "x"],
+                keyword_base=u"\u00fc".encode('utf-8'),
+                want_ignorecase_local=0)
+
+    def test_case_insensitive_non_ascii_keyword_base(self):
+        self._helper_predicate_test(
+                expected_result=[True, True],
+                buffer_lines=[u"\u00dcber".encode('utf-8'), "x"],
+                keyword_base=u"\u00fc".encode('utf-8'),
+                want_ignorecase_local=1)
+
+
+class TestGetBufferLineBlocks(unittest.TestCase):
+
+    def test_summary_is_reused_until_a_purge(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        vim_mock = VimMockFactory.get_mock(changedticks={2: 5})
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20),
+                vim=vim_mock):
+            first = localcomplete.get_buffer_line_blocks(buffer_fake)
+            second = localcomplete.get_buffer_line_blocks(buffer_fake)
+            localcomplete.purge_buffer_caches(2)
+            third = localcomplete.get_buffer_line_blocks(buffer_fake)
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+
+    def _helper_line_blocks(self, buffer_fake, changedtick):
+        with mock.patch.object(localcomplete, 'vim',
+                VimMockFactory.get_mock(changedticks={2: changedtick})):
+            return localcomplete.get_buffer_line_blocks(buffer_fake)
+
+    def test_changed_buffers_update_the_summary(self):
+        buffer_fake = _create_buffer_fake(2, ["a", "b", "c"])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20),
+                LINE_BLOCK_SIZE=2):
+            first = self._helper_line_blocks(buffer_fake, 5)
+            buffer_fake[2] = "x"
+            second = self._helper_line_blocks(buffer_fake, 6)
+        self.assertIs(first, second)
+        self.assertEqual(second.find_candidate_blocks("x", False), set([1]))
+
+    def test_summaries_of_other_block_sizes_are_replaced(self):
+        buffer_fake = _create_buffer_fake(2, ["a", "b"])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            with mock.patch.object(localcomplete, 'LINE_BLOCK_SIZE', 1):
+                first = self._helper_line_blocks(buffer_fake, 5)
+            with mock.patch.object(localcomplete, 'LINE_BLOCK_SIZE', 2):
+                second = self._helper_line_blocks(buffer_fake, 5)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.block_size, 2)
+
+
+class TestGetBufferLineTokens(unittest.TestCase):
+
+    def _helper_search(self, buffer_fake, punctuation_chars=u''):
+        line_tokens = localcomplete.get_buffer_line_tokens(
+                buffer_fake, 'utf-8', punctuation_chars)
+        line_tokens.get_tokens(0, buffer_fake[0])
+        localcomplete.store_buffer_line_tokens(buffer_fake, line_tokens)
+        return line_tokens
+
+    def test_line_tokens_are_reused_until_a_purge(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            first = self._helper_search(buffer_fake)
+            second = self._helper_search(buffer_fake)
+            localcomplete.purge_buffer_caches(2)
+            third = self._helper_search(buffer_fake)
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+        self.assertEqual((second.hits, second.misses), (1, 1))
+
+    def test_line_tokens_depend_on_the_keyword_chars(self):
+        buffer_fake = _create_buffer_fake(2, ["a-b"])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            first = self._helper_search(buffer_fake)
+            second = self._helper_search(buffer_fake, u'-')
+        self.assertIsNot(first, second)
+        self.assertEqual(second.get_tokens(0, "a-b"), [u"a-b"])
+
+    def test_stored_size_follows_the_searched_lines(self):
+        buffer_fake = _create_buffer_fake(2, ["a b"])
+        cache = indexcache.IndexCache(2 ** 20)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=cache):
+            line_tokens = self._helper_search(buffer_fake)
+        self.assertEqual(cache.total_bytes, line_tokens.memory_size())
+        self.assertGreater(cache.total_bytes, 0)
+
+
+class TestFindCachedTokenMatchesInLines(unittest.TestCase):
+
+    def _helper_find(self, indexed_lines, keyword_base, result_limit=0,
+            keyword_chars='', want_ignorecase=False, min_len=0,
+            cache=None):
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base=keyword_base,
+                keyword_chars=keyword_chars,
+                want_ignorecase_local=int(want_ignorecase),
+                vim_ignorecase=0,
+                vim_infercase=0,
+                index_cache_max_megabytes=1,
+                want_warm_start_cache=0,
+                max_line_scan_bytes=0,
+                buffer_content=_create_buffer_fake(3, []))
+        if cache is None:
+            cache = indexcache.IndexCache(2 ** 20)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=cache,
+                vim=vim_mock):
+            return localcomplete.find_cached_token_matches_in_lines(
+                    iter(indexed_lines), min_len, result_limit)
+
+    def test_find_matches_in_search_order(self):
+        self.assertEqual(
+                self._helper_find(
+                        [(3, " primary pri "), (1, "Prize opri prior-art")],
+                        "pri"),
+                u"primary prior".split())
+
+    def test_find_case_insensitive_matches(self):
+        self.assertEqual(
+                self._helper_find([(0, " PRIMARY prize ")], "pri",
+                        want_ignorecase=True),
+                u"PRIMARY prize".split())
+
+    def test_find_matches_with_additional_keyword_chars(self):
+        self.assertEqual(
+                self._helper_find([(0, " prior-art pri- pri-x ")], "pri-",
+                        keyword_chars='-'),
+                [u"pri-x"])
+
+    def test_keyword_base_with_other_chars_is_searched_in_lines(self):
+        self.assertEqual(
+                self._helper_find([(0, " pri$ze pri$or ")], "pri$"),
+                u"pri$ze pri$or".split())
+
+    def test_find_nothing_if_min_length_limit_not_reached(self):
+        self.assertEqual(
+                self._helper_find([(0, " primary ")], "pri", min_len=4),
+                [])
+
+    def test_stop_reading_lines_at_the_result_limit(self):
+        def generate_lines():
+            yield (0, " priory prize priory primary ")
+            raise AssertionError("Read too many lines")
+
+        self.assertEqual(
+                self._helper_find(generate_lines(), "pri", result_limit=2),
+                u"priory prize priory".split())
+
+    def test_cached_tokens_of_unchanged_lines_are_reused(self):
+        cache = indexcache.IndexCache(2 ** 20)
+        self._helper_find([(0, " prize "), (1, " primary ")], "pri",
+                cache=cache)
+        self.assertEqual(
+                self._helper_find([(1, " primary "), (0, " prized ")], "pr",
+                        cache=cache),
+                u"primary prized".split())
+        line_tokens = cache.get((3, localcomplete.INDEX_KIND_LINE_TOKENS),
+                ('utf-8', u''))
+        self.assertEqual((line_tokens.hits, line_tokens.misses), (1, 3))
+
+class TestFindSharedTokenMatchesInLines(unittest.TestCase):
+
+    def _helper_find(self, lines, keyword_base, keyword_chars='',
+            want_ignorecase=False, min_len=0, cache=None):
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base=keyword_base,
+                keyword_chars=keyword_chars,
+                want_ignorecase_local=int(want_ignorecase),
+                vim_ignorecase=0,
+                vim_infercase=0,
+                shared_line_token_cache_max_megabytes=1,
+                max_line_scan_bytes=0)
+        if cache is None:
+            cache = indexcache.IndexCache(0)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                LINE_TOKENS_CACHE=cache,
+                vim=vim_mock):
+            return localcomplete.find_shared_token_matches_in_lines(
+                    iter(lines), min_len)
+
+    def test_find_matches_in_the_order_of_the_lines(self):
+        self.assertEqual(
+                self._helper_find([" primary pri ", "Prize opri prior-art"],
+                        "pri"),
+                u"primary prior".split())
+
+    def test_find_case_insensitive_matches(self):
+        self.assertEqual(
+                self._helper_find([" PRIMARY prize "], "pri",
+                        want_ignorecase=True),
+                u"PRIMARY prize".split())
+
+    def test_keyword_base_with_other_chars_is_searched_in_lines(self):
+        self.assertEqual(
+                self._helper_find([" pri$ze pri$or "], "pri$"),
+                u"pri$ze pri$or".split())
+
+    def test_find_nothing_if_min_length_limit_not_reached(self):
+        self.assertEqual(
+                self._helper_find([" primary "], "pri", min_len=4), [])
+
+    def test_identical_lines_are_split_once(self):
+        cache = indexcache.IndexCache(0)
+        self.assertEqual(
+                self._helper_find([" prize ", " primary ", " prize "],
+                        "pri", cache=cache),
+                u"prize primary prize".split())
+        self.assertEqual(
+                self._helper_find([" primary "], "prim", cache=cache),
+                [u"primary"])
+        statistics = cache.statistics()
+        self.assertEqual((statistics['hits'], statistics['misses']), (2, 2))
+        self.assertEqual(statistics['entries'], 2)
+
+
+class TestTransmitLineTokensCacheStatisticsToVim(unittest.TestCase):
+
+    def test_statistics_are_transmitted_as_a_dictionary(self):
+        vim_mock = VimMockFactory.get_mock()
+        cache = indexcache.IndexCache(10)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                LINE_TOKENS_CACHE=cache,
+                vim=vim_mock):
+            localcomplete.transmit_line_tokens_cache_statistics_to_vim()
+        vim_mock.command.assert_called_once_with(
+                localcomplete.VIM_COMMAND_LINE_TOKENS_CACHE_STATISTICS
+                % repr(cache.statistics()))
+
+class TestConfigureIndexCache(unittest.TestCase):
+
+    def test_memory_ceiling_is_configured_in_megabytes(self):
+        vim_mock = VimMockFactory.get_mock(index_cache_max_megabytes=3)
+        cache = indexcache.IndexCache(0)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=cache,
+                vim=vim_mock):
+            localcomplete.configure_index_cache()
+        self.assertEqual(cache.max_bytes, 3 * 2 ** 20)
+
+
+class TestTransmitCacheStatisticsToVim(unittest.TestCase):
+
+    def test_statistics_are_transmitted_as_a_dictionary(self):
+        vim_mock = VimMockFactory.get_mock()
+        cache = indexcache.IndexCache(10)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=cache,
+                vim=vim_mock):
+            localcomplete.transmit_cache_statistics_to_vim()
+        vim_mock.command.assert_called_once_with(
+                localcomplete.VIM_COMMAND_CACHE_STATISTICS
+                % repr(cache.statistics()))
+
+
+class TestBuildKeywordIndex(unittest.TestCase):
+
+    def test_keywords_are_split_with_additional_keyword_chars(self):
+        keyword_index = localcomplete.build_keyword_index(
+                ["a:b c-d", u" \u00fcber a:b".encode('utf-8')],
+                'utf-8',
+                u':')
+        self.assertEqual(keyword_index.find_prefix_matches(u""),
+                [u"a:b", u"c", u"d", u"\u00fcber"])
+
+
+class TestFindMatchesInBufferIndexes(unittest.TestCase):
+
+    @contextlib.contextmanager
+    def _helper_isolate_find_matches(self,
+            buffers,
+            keyword_base,
+            keyword_chars='',
+            want_ignorecase=False,
+            match_mode=localcomplete.MATCH_MODE_PREFIX,
+            result_limit=0):
+
+        case_mock_retval = re.IGNORECASE if want_ignorecase else 0
+
+        chars_mock = mock.Mock(spec_set=[], return_value=keyword_chars)
+        case_mock = mock.Mock(spec_set=[], return_value=case_mock_retval)
+        infercase_mock = mock.Mock(
+                side_effect=lambda keyword, matches : matches)
+        lines_mock = mock.Mock(spec_set=[], return_value=['from lines'])
+
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base=keyword_base,
+                index_cache_max_megabytes=1,
+                want_warm_start_cache=0,
+                want_ignore_accents=0,
+                match_mode=match_mode,
+                result_limit=result_limit,
+                changedticks=dict((b.number, 1) for b in buffers))
+
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(0),
+                get_additional_keyword_chars=chars_mock,
+                get_casematch_flag=case_mock,
+                apply_infercase_to_matches_cond=infercase_mock,
+                find_matches_in_lines=lines_mock,
+                vim=vim_mock):
+            yield infercase_mock, lines_mock
+
+    def _helper_buffers(self):
+        return [
+                _create_buffer_fake(3, ["prize none", "priory prize"]),
+                _create_buffer_fake(1, ["Primary priory pri:mel"]),
+                _create_buffer_fake(2, ["principal"]),
+                ]
+
+    def test_unique_matches_in_buffer_order(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "pri"):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 0)
+        self.assertEqual(actual_result,
+                u"prize priory principal".split())
+
+    def test_additional_keyword_chars(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "pri",
+                keyword_chars=':'):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 0)
+        self.assertEqual(actual_result,
+                u"prize priory pri:mel principal".split())
+
+    def test_find_nothing_if_min_length_limit_not_reached(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "pri"):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 4)
+        self.assertEqual(actual_result, [])
+
+    def test_case_insensitive_matches(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "pRi",
+                want_ignorecase=True):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 0)
+        self.assertEqual(actual_result,
+                u"prize priory Primary principal".split())
+
+    def test_keyword_bases_with_non_keyword_chars_fall_back_to_the_lines(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "pri:") as (
+                infercase_mock, lines_mock):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 0)
+        self.assertEqual(actual_result, ['from lines'])
+        self.assertEqual(list(lines_mock.call_args[0][0]),
+                ["prize none", "priory prize", "Primary priory pri:mel",
+                        "principal"])
+
+    def test_substring_matches_without_infercase(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "ri",
+                match_mode=localcomplete.MATCH_MODE_SUBSTRING) as (
+                        infercase_mock, lines_mock):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 0)
+        self.assertEqual(actual_result,
+                u"prize priory Primary pri principal".split())
+        self.assertFalse(infercase_mock.called)
+
+    def test_fuzzy_matches_of_all_buffers_are_ranked(self):
+        buffers = [
+                _create_buffer_fake(3, ["pxrxi pri_ze"]),
+                _create_buffer_fake(1, ["prize prix"]),
+                ]
+        with self._helper_isolate_find_matches(buffers, "pri",
+                match_mode=localcomplete.MATCH_MODE_FUZZY,
+                result_limit=2):
+            actual_result = localcomplete.find_matches_in_buffer_indexes(
+                    buffers, 0)
+        self.assertEqual(actual_result, u"prix prize".split())
+
+    def test_invalid_match_mode_raises_exception(self):
+        buffers = self._helper_buffers()
+        with self._helper_isolate_find_matches(buffers, "pri",
+                match_mode=-1):
+            with self.assertRaises(localcomplete.LocalCompleteError):
+                localcomplete.find_matches_in_buffer_indexes(buffers, 0)
+
+
+class TestGetFileKeywordIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'unloaded.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_write_file(self, content):
+        with open(self.path, 'wb') as file_object:
+            file_object.write(content)
+
+    @contextlib.contextmanager
+    def _helper_isolate_cache(self):
+        tokenize_mock = mock.Mock(
+                side_effect=filebuffers.tokenize_file)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            with mock.patch.object(filebuffers,
+                    'tokenize_file', tokenize_mock):
+                yield tokenize_mock
+
+    def test_index_is_reused_while_the_file_is_unchanged(self):
+        self._helper_write_file(b"alpha beta")
+        with self._helper_isolate_cache() as tokenize_mock:
+            first = localcomplete.get_file_keyword_index(self.path, u'')
+            second = localcomplete.get_file_keyword_index(self.path, u'')
+        self.assertIs(first, second)
+        self.assertEqual(tokenize_mock.call_count, 1)
+        self.assertEqual(first.find_prefix_matches(u"al"), [u"alpha"])
+
+    def test_index_is_rebuilt_after_the_file_changed(self):
+        self._helper_write_file(b"alpha")
+        with self._helper_isolate_cache() as tokenize_mock:
+            localcomplete.get_file_keyword_index(self.path, u'')
+            self._helper_write_file(b"alpha altitude")
+            keyword_index = localcomplete.get_file_keyword_index(
+                    self.path, u'')
+        self.assertEqual(tokenize_mock.call_count, 2)
+        self.assertEqual(keyword_index.find_prefix_matches(u"al"),
+                [u"alpha", u"altitude"])
+
+    def test_missing_files_have_no_index(self):
+        with self._helper_isolate_cache():
+            self.assertIsNone(
+                    localcomplete.get_file_keyword_index(self.path, u''))
+
+
+class TestGetUnloadedBufferFiles(unittest.TestCase):
+
+    def _helper_unloaded_files(self, **config):
+        vim_config = dict(
+                unloaded_buffer_files=[[2, '/b'], [4, '/d'], [5, '/e']],
+                buffer_info=[
+                        [1, 1, 10, 1, '', ''],
+                        [2, 1, 100, 0, '', ''],
+                        [4, 0, 300, 0, '', ''],
+                        [5, 1, 200, 0, '', '']],
+                want_recent_buffers_first=0,
+                want_listed_buffers_only=0,
+                skip_buffer_types='',
+                want_same_filetype_only=0,
+                max_buffer_line_count=0)
+        vim_config.update(config)
+        vim_mock = VimMockFactory.get_mock(**vim_config)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                vim=vim_mock):
+            return localcomplete.get_unloaded_buffer_files()
+
+    def test_files_in_buffer_order(self):
+        self.assertEqual(self._helper_unloaded_files(), ['/b', '/d', '/e'])
+
+    def test_buffer_filters_apply(self):
+        self.assertEqual(
+                self._helper_unloaded_files(want_listed_buffers_only=1),
+                ['/b', '/e'])
+
+    def test_recently_used_buffers_first_if_requested(self):
+        self.assertEqual(
+                self._helper_unloaded_files(want_recent_buffers_first=1),
+                ['/d', '/e', '/b'])
+
+    def test_no_buffer_info_without_unloaded_buffers(self):
+        self.assertEqual(
+                self._helper_unloaded_files(unloaded_buffer_files=[],
+                        buffer_info=None),
+                [])
+
+
+class TestFindMatchesInFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.infercase_mock = mock.Mock(
+                side_effect=lambda keyword, matches : matches)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_write_files(self, *contents):
+        paths = []
+        for file_number, content in enumerate(contents):
+            path = os.path.join(self.directory, 'file%d.txt' % file_number)
+            with open(path, 'wb') as file_object:
+                file_object.write(content)
+            paths.append(path)
+        return paths
+
+    def _helper_find_matches(self, paths, keyword_base, min_length=0,
+            match_mode=localcomplete.MATCH_MODE_PREFIX,
+            want_ignorecase=False):
+        case_mock_retval = re.IGNORECASE if want_ignorecase else 0
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base=keyword_base,
+                index_cache_max_megabytes=1,
+                want_warm_start_cache=0,
+                want_ignore_accents=0,
+                match_mode=match_mode,
+                result_limit=0)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20),
+                get_additional_keyword_chars=mock.Mock(return_value=''),
+                get_casematch_flag=mock.Mock(return_value=case_mock_retval),
+                apply_infercase_to_matches_cond=self.infercase_mock,
+                vim=vim_mock):
+            return localcomplete.find_matches_in_files(paths, min_length)
+
+    def test_unique_matches_in_file_order(self):
+        paths = self._helper_write_files(b"prize none\npriory prize",
+                b"principal priory")
+        self.assertEqual(self._helper_find_matches(paths, "pri"),
+                u"prize priory principal".split())
+
+    def test_unreadable_files_are_skipped(self):
+        paths = self._helper_write_files(b"prize")
+        paths.insert(0, os.path.join(self.directory, 'missing'))
+        self.assertEqual(self._helper_find_matches(paths, "pri"),
+                [u"prize"])
+
+    def test_infercase_is_applied_to_prefix_matches_only(self):
+        paths = self._helper_write_files(b"prize surprise")
+        self._helper_find_matches(paths, "Pri", want_ignorecase=True)
+        self.infercase_mock.assert_called_once_with(u"Pri", [u"prize"])
+        self._helper_find_matches(paths, "pri",
+                match_mode=localcomplete.MATCH_MODE_SUBSTRING)
+        self.assertEqual(self.infercase_mock.call_count, 1)
+
+    def test_other_match_modes(self):
+        paths = self._helper_write_files(b"surprise getPrimeNumber")
+        self.assertEqual(
+                self._helper_find_matches(paths, "pri",
+                        match_mode=localcomplete.MATCH_MODE_SUBSTRING),
+                [u"surprise"])
+        self.assertEqual(
+                self._helper_find_matches(paths, "gpn",
+                        match_mode=localcomplete.MATCH_MODE_ABBREVIATION,
+                        want_ignorecase=True),
+                [u"getPrimeNumber"])
+        self.assertEqual(
+                self._helper_find_matches(paths, "gtpm",
+                        match_mode=localcomplete.MATCH_MODE_FUZZY,
+                        want_ignorecase=True),
+                [u"getPrimeNumber"])
+
+    def test_find_nothing_for_short_or_non_keyword_bases(self):
+        paths = self._helper_write_files(b"prize pri:mel")
+        self.assertEqual(self._helper_find_matches(paths, "pri", 4), [])
+        self.assertEqual(self._helper_find_matches(paths, "pri:"), [])
+
+
+class TestAddUnloadedBufferMatches(unittest.TestCase):
+
+    def test_new_matches_are_appended(self):
+        files_mock = mock.Mock(spec_set=[], return_value=['/a'])
+        find_mock = mock.Mock(spec_set=[],
+                return_value=[u'prize', u'priory', u'prime'])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_unloaded_buffer_files=files_mock,
+                find_matches_in_files=find_mock):
+            actual_result = localcomplete.add_unloaded_buffer_matches(
+                    [u'priory', u'principal', u'priory'], 3)
+        find_mock.assert_called_once_with(['/a'], 3)
+        self.assertEqual(actual_result,
+                [u'priory', u'principal', u'priory', u'prize', u'prime'])
+
+
+class TestGetProjectIndex(unittest.TestCase):
+
+    def _helper_get_index(self, root, cache_directory):
+        vim_mock = VimMockFactory.get_mock(
+                cache_directory=cache_directory)
+        with mock.patch.multiple(__name__ + '.localcomplete', vim=vim_mock):
+            return localcomplete.get_project_index(root, u'-')
+
+    def test_one_index_per_root_and_keyword_chars(self):
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                PROJECT_INDEXES={}):
+            first = self._helper_get_index('/project', '')
+            second = self._helper_get_index('/project', '')
+            other = self._helper_get_index('/other', '')
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertIsNone(first.cache_path)
+
+    def test_index_is_saved_in_the_cache_directory(self):
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                PROJECT_INDEXES={}):
+            project_index = self._helper_get_index('/project', '/cache')
+        self.assertEqual(project_index.cache_path,
+                projectindex.get_cache_path(
+                        '/cache', '/project', u'-'))
+
+
+class TestUpdateProjectIndex(unittest.TestCase):
+
+    def _helper_update(self, project_index, refresh_seconds=0):
+        vim_mock = VimMockFactory.get_mock(
+                project_refresh_seconds=refresh_seconds,
+                project_index_workers=0,
+                project_max_file_bytes=10)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_keyword_index_options=mock.Mock(
+                        return_value=(None, False, False)),
+                vim=vim_mock):
+            localcomplete.update_project_index(project_index)
+
+    def test_due_refresh_is_started_and_finished_without_workers(self):
+        project_index = mock.Mock()
+        project_index.needs_refresh.return_value = True
+        project_index.is_refreshing.return_value = False
+        self._helper_update(project_index, 5)
+        args = project_index.start_refresh.call_args[0]
+        self.assertIsInstance(args[0],
+                projectindex.SynchronousPool)
+        self.assertEqual(args[1], 10)
+        self.assertEqual(project_index.poll.call_count, 2)
+        self.assertEqual(project_index.needs_refresh.call_args[0][1], 5)
+
+    def test_nothing_is_started_if_no_refresh_is_due(self):
+        project_index = mock.Mock()
+        project_index.needs_refresh.return_value = False
+        self._helper_update(project_index)
+        self.assertFalse(project_index.start_refresh.called)
+        project_index.poll.assert_called_once_with()
+
+
+class TestGetProjectKeywordIndex(unittest.TestCase):
+
+    def _helper_project_index(self):
+        project_index = projectindex.ProjectIndex('/project',
+                u'')
+        project_index.files = {'a.txt': ((1.0, 5), b"alpha")}
+        project_index.keyword_index = mock.sentinel.keyword_index
+        project_index.keyword_index_options = (None, True, False)
+        return project_index
+
+    def test_the_index_of_the_workers_is_used(self):
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            keyword_index = localcomplete.get_project_keyword_index(
+                    self._helper_project_index(), u'', None, True)
+        self.assertIs(keyword_index, mock.sentinel.keyword_index)
+
+    def test_the_index_is_built_for_other_options(self):
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20)):
+            keyword_index = localcomplete.get_project_keyword_index(
+                    self._helper_project_index(), u'')
+        self.assertEqual(list(keyword_index.find_prefix_matches(u"al")),
+                [u"alpha"])
+
+
+class TestPollProjectIndex(unittest.TestCase):
+
+    def test_failed_refresh_is_reported(self):
+        project_index = mock.Mock()
+        project_index.poll.side_effect = (
+                projectindex.ProjectIndexError("worker died"))
+        vim_mock = mock.Mock()
+        with mock.patch.multiple(__name__ + '.localcomplete', vim=vim_mock):
+            localcomplete.poll_project_index(project_index)
+        vim_mock.command.assert_called_once_with(
+                'echoerr "Error refreshing the project index: worker died"')
+
+    def test_failed_manual_refresh_is_reported(self):
+        project_index = mock.Mock()
+        project_index.poll.side_effect = [False,
+                projectindex.ProjectIndexError("worker died")]
+        vim_mock = VimMockFactory.get_mock(encoding='utf-8')
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_additional_keyword_chars=mock.Mock(return_value=''),
+                get_project_root=mock.Mock(return_value='/project'),
+                get_project_index=mock.Mock(return_value=project_index),
+                start_project_refresh=mock.Mock(),
+                vim=vim_mock):
+            localcomplete.refresh_project_index()
+        vim_mock.command.assert_called_once_with(
+                'echoerr "Error refreshing the project index: worker died"')
+
+
+class TestCompleteProjectMatches(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for file_name, content in [('a.txt', b"prize none priory"),
+                ('b.txt', b"principal prize")]:
+            with open(os.path.join(self.root, file_name), 'wb') as fw:
+                fw.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_matches_of_all_project_files(self):
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base='pri',
+                min_len_project=3,
+                project_root=self.root,
+                cache_directory='',
+                project_index_workers=0,
+                project_max_file_bytes=0,
+                project_refresh_seconds=0,
+                index_cache_max_megabytes=1,
+                want_warm_start_cache=0,
+                want_ignore_accents=0,
+                match_mode=localcomplete.MATCH_MODE_PREFIX,
+                result_limit=0)
+        transmit_mock = mock.Mock(spec_set=[])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                PROJECT_INDEXES={},
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(2 ** 20),
+                get_additional_keyword_chars=mock.Mock(return_value=''),
+                get_casematch_flag=mock.Mock(return_value=0),
+                apply_infercase_to_matches_cond=mock.Mock(
+                        side_effect=lambda keyword, matches : matches),
+                transmit_project_result_to_vim=transmit_mock,
+                vim=vim_mock):
+            localcomplete.complete_project_matches()
+        transmit_mock.assert_called_once_with(
+                u"prize priory principal".split())
+
+
+class TestTransmitProjectResultToVim(unittest.TestCase):
+
+    def test_argument_is_passed_through(self):
+        produce_mock = mock.Mock(side_effect=lambda matches, origin : matches)
+        vim_mock = VimMockFactory.get_mock(origin_note_project="test")
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                produce_result_value=produce_mock,
+                vim=vim_mock):
+            localcomplete.transmit_project_result_to_vim(1)
+        produce_mock.assert_called_once_with(1, "test")
+        vim_mock.command.assert_called_once_with(
+                localcomplete.VIM_COMMAND_PROJECTCOMPLETE % 1)
+
+
+class TestFindIndexMatchesInLines(unittest.TestCase):
+
+    @contextlib.contextmanager
+    def _helper_isolate_sut(self, buffer_lines, keyword_base, match_mode,
+            result_limit=0, want_shared_line_token_cache=0):
+        infercase_mock = mock.Mock(
+                side_effect=lambda keyword, matches : matches)
+        lines_mock = mock.Mock(spec_set=[], return_value=['from lines'])
+        vim_mock = VimMockFactory.get_mock(
+                encoding='utf-8',
+                keyword_base=keyword_base,
+                keyword_chars='',
+                iskeyword='',
+                want_ignorecase_local=0,
+                index_cache_max_megabytes=1,
+                want_warm_start_cache=0,
+                match_mode=match_mode,
+                result_limit=result_limit,
+                want_shared_line_token_cache=want_shared_line_token_cache,
+                shared_line_token_cache_max_megabytes=1,
+                max_line_scan_bytes=0,
+                changedticks={2: 1},
+                buffer_content=_create_buffer_fake(2, buffer_lines))
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(0),
+                LINE_TOKENS_CACHE=indexcache.IndexCache(0),
+                apply_infercase_to_matches_cond=infercase_mock,
+                find_matches_in_lines=lines_mock,
+                vim=vim_mock):
+            yield infercase_mock, lines_mock
+
+    def test_abbreviation_matches_in_the_order_of_the_lines(self):
+        lines = ["x getBuffer_range", "get_buffer_ranges a", "gbr gBR_x"]
+        with self._helper_isolate_sut(["get_buffer_ranges"] + lines, "gbr",
+                localcomplete.MATCH_MODE_ABBREVIATION) as (
+                        infercase_mock, lines_mock):
+            actual_result = localcomplete.find_index_matches_in_lines(
+                    lines, 0)
+        self.assertEqual(actual_result,
+                u"getBuffer_range get_buffer_ranges".split())
+        self.assertFalse(infercase_mock.called)
+
+    def test_shared_line_tokens_give_the_same_matches(self):
+        lines = ["x getBuffer_range", "get_buffer_ranges a", "gbr gBR_x"]
+        with self._helper_isolate_sut(["get_buffer_ranges"] + lines, "gbr",
+                localcomplete.MATCH_MODE_ABBREVIATION,
+                want_shared_line_token_cache=1):
+            actual_result = localcomplete.find_index_matches_in_lines(
+                    lines, 0)
+            cached_lines = len(localcomplete.LINE_TOKENS_CACHE)
+        self.assertEqual(actual_result,
+                u"getBuffer_range get_buffer_ranges".split())
+        self.assertEqual(cached_lines, 3)
+
+    def test_fuzzy_matches_are_unique_and_ranked(self):
+        lines = ["pxrxi", "pxrxy_i prize", "pxrxi prix"]
+        with self._helper_isolate_sut(lines, "pri",
+                localcomplete.MATCH_MODE_FUZZY,
+                result_limit=3):
+            actual_result = localcomplete.find_index_matches_in_lines(
+                    lines, 0)
+        self.assertEqual(actual_result, u"prix prize pxrxy_i".split())
+
+    def test_keywords_outside_the_searched_lines_are_no_matches(self):
+        with self._helper_isolate_sut(["setRanges", "xRangesy"], "Ranges",
+                localcomplete.MATCH_MODE_SUBSTRING):
+            actual_result = localcomplete.find_index_matches_in_lines(
+                    ["xRangesy"], 0)
+        self.assertEqual(actual_result, [u"xRangesy"])
+
+    def test_find_nothing_if_min_length_limit_not_reached(self):
+        with self._helper_isolate_sut(["get_buffer"], "gb",
+                localcomplete.MATCH_MODE_ABBREVIATION):
+            actual_result = localcomplete.find_index_matches_in_lines(
+                    ["get_buffer"], 3)
+        self.assertEqual(actual_result, [])
+
+    def test_keyword_bases_with_non_keyword_chars_fall_back(self):
+        with self._helper_isolate_sut(["g-b"], "g-",
+                localcomplete.MATCH_MODE_ABBREVIATION) as (
+                        infercase_mock, lines_mock):
+            actual_result = localcomplete.find_index_matches_in_lines(
+                    ["g-b"], 0)
+        self.assertEqual(actual_result, ['from lines'])
+        lines_mock.assert_called_once_with(["g-b"], 0)
+
+
+class TestRankScoredMatches(unittest.TestCase):
+
+    def test_descending_scores_and_stable_ties(self):
+        self.assertEqual(localcomplete.rank_scored_matches(
+                [(1, u"b"), (3, u"a"), (1, u"c"), (2, u"d")], 0),
+                u"a d b c".split())
+
+    def test_limit(self):
+        self.assertEqual(localcomplete.rank_scored_matches(
+                [(1, u"b"), (3, u"a"), (1, u"c"), (2, u"d")], 3),
+                u"a d b".split())
+
+
+class TestGetIndexFold(unittest.TestCase):
+
+    def _helper_fold_test(self, want_ignorecase, want_ignore_accents,
+            expected_fold):
+        case_mock = mock.Mock(spec_set=[],
+                return_value=re.IGNORECASE if want_ignorecase else 0)
+        vim_mock = VimMockFactory.get_mock(
+                want_ignore_accents=want_ignore_accents)
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                get_casematch_flag=case_mock,
+                vim=vim_mock):
+            self.assertIs(localcomplete.get_index_fold(), expected_fold)
+
+    def test_case_sensitive_queries_are_not_folded(self):
+        self._helper_fold_test(False, 1, None)
+
+    def test_case_insensitive_queries(self):
+        self._helper_fold_test(True, 0, localcomplete.keywordindex.fold_case)
+
+    def test_accent_insensitive_queries(self):
+        self._helper_fold_test(True, 1,
+                localcomplete.keywordindex.fold_case_and_accents)
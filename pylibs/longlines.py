@@ -0,0 +1,85 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cut very long encoded lines into chunks without cutting keywords.
+
+Minified or generated files can have lines of several megabytes.  Decoding and
+searching such a line at once on every keystroke freezes Vim, and a search
+cannot stop in the middle of it.  The chunks end after a byte that separates
+keywords, so searching the chunks one by one finds the same keywords as
+searching the whole line.
+
+In ASCII compatible encodings like utf-8, a byte below 128 is always a
+character of its own.  The separators are the ASCII bytes that are no keyword
+characters.
+"""
+
+import re
+
+
+class LongLinesError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+def get_separator_needle(punctuation_chars):
+    """
+    Return the regex for the bytes that separate keywords.
+
+    punctuation_chars: the additional keyword characters as unicode
+    """
+    ascii_chars = u''.join(char for char in punctuation_chars
+            if ord(char) < 128)
+    return re.compile(br'[^\w%s\x80-\xff]'
+            % re.escape(ascii_chars.encode('ascii')))
+
+def get_text_separator_needle(punctuation_chars):
+    """
+    Return the regex for the characters that separate keywords in decoded
+    lines.  Any character that is no keyword character does.
+    """
+    return re.compile(u'[^\\w%s]' % re.escape(punctuation_chars), re.UNICODE)
+
+def find_chunk_end(line, position, separator_needle):
+    """
+    Return the index behind the first separator at or after position or the
+    length of the line if there is none.
+    """
+    match_object = separator_needle.search(line, position)
+    if match_object is None:
+        return len(line)
+    return match_object.end()
+
+def cap_line(line, max_bytes, separator_needle):
+    """
+    Return the start of the line up to about max_bytes.  A keyword at the cut
+    is kept in full.
+    """
+    if len(line) <= max_bytes:
+        return line
+    return line[:find_chunk_end(line, max_bytes, separator_needle)]
+
+def generate_chunks(line, chunk_bytes, separator_needle):
+    """
+    Generate consecutive chunks of the line that are at least chunk_bytes
+    long except for the last one.  Every chunk ends after a separator.
+    """
+    start = 0
+    while len(line) - start > chunk_bytes:
+        end = find_chunk_end(line, start + chunk_bytes, separator_needle)
+        yield line[start:end]
+        start = end
+    if start < len(line) or not line:
+        yield line[start:]
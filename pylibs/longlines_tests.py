@@ -0,0 +1,119 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from pylibs import longlines
+
+
+class LongLinesTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestGetSeparatorNeedle(unittest.TestCase):
+
+    def _helper_separators(self, text, punctuation_chars=u''):
+        needle = longlines.get_separator_needle(punctuation_chars)
+        return needle.findall(text.encode('utf-8'))
+
+    def test_keyword_chars_are_no_separators(self):
+        self.assertEqual(self._helper_separators(u"ab_1 c,d"),
+                [b" ", b","])
+
+    def test_additional_keyword_chars_are_no_separators(self):
+        self.assertEqual(self._helper_separators(u"a-b:c", u"-"), [b":"])
+
+    def test_non_ascii_bytes_are_no_separators(self):
+        self.assertEqual(self._helper_separators(u"\u00fc\u00a0\u00df;"),
+                [b";"])
+
+    def test_non_ascii_keyword_chars_are_ignored(self):
+        self.assertEqual(self._helper_separators(u"a\u00a7b-", u"\u00a7"),
+                [b"-"])
+
+
+class TestGetTextSeparatorNeedle(unittest.TestCase):
+
+    def _helper_separators(self, text, punctuation_chars=u''):
+        needle = longlines.get_text_separator_needle(punctuation_chars)
+        return needle.findall(text)
+
+    def test_keyword_chars_are_no_separators(self):
+        self.assertEqual(self._helper_separators(u"ab_1 c,\u00fcd"),
+                [u" ", u","])
+
+    def test_additional_keyword_chars_are_no_separators(self):
+        self.assertEqual(self._helper_separators(u"a\u00a7b-", u"\u00a7"),
+                [u"-"])
+
+    def test_non_ascii_separators_are_found(self):
+        self.assertEqual(self._helper_separators(u"a\u00a0b"), [u"\u00a0"])
+
+
+class TestCapLine(unittest.TestCase):
+
+    def setUp(self):
+        self.needle = longlines.get_separator_needle(u'')
+
+    def test_short_lines_are_kept(self):
+        line = b"one two"
+        self.assertIs(longlines.cap_line(line, 7, self.needle), line)
+
+    def test_keyword_at_the_cut_is_kept(self):
+        self.assertEqual(longlines.cap_line(b"one two three", 5, self.needle),
+                b"one two ")
+
+    def test_cut_after_a_separator(self):
+        self.assertEqual(longlines.cap_line(b"one two three", 3, self.needle),
+                b"one ")
+
+    def test_keyword_up_to_the_end_is_kept(self):
+        self.assertEqual(longlines.cap_line(b"one two", 5, self.needle),
+                b"one two")
+
+
+class TestGenerateChunks(unittest.TestCase):
+
+    def _helper_chunks(self, line, chunk_bytes, punctuation_chars=u''):
+        return list(longlines.generate_chunks(line, chunk_bytes,
+                longlines.get_separator_needle(punctuation_chars)))
+
+    def test_short_lines_are_one_chunk(self):
+        self.assertEqual(self._helper_chunks(b"one two", 7), [b"one two"])
+
+    def test_empty_lines_are_one_chunk(self):
+        self.assertEqual(self._helper_chunks(b"", 7), [b""])
+
+    def test_chunks_end_after_separators(self):
+        self.assertEqual(self._helper_chunks(b"one two three four", 4),
+                [b"one two ", b"three ", b"four"])
+
+    def test_long_keywords_stay_in_one_chunk(self):
+        self.assertEqual(self._helper_chunks(b"a-very-long-keyword x", 3,
+                        u"-"),
+                [b"a-very-long-keyword ", b"x"])
+
+    def test_multibyte_characters_are_not_cut(self):
+        line = u"\u00fc\u00fc\u00fc \u00fc\u00fc\u00fc".encode('utf-8')
+        chunks = self._helper_chunks(line, 3)
+        self.assertEqual(chunks, [u"\u00fc\u00fc\u00fc ".encode('utf-8'),
+                u"\u00fc\u00fc\u00fc".encode('utf-8')])
+
+    def test_chunks_make_up_the_line(self):
+        line = b"x = f(a,b);; while(y) {z+=1} " * 50
+        for chunk_bytes in (1, 7, 64, 2000):
+            self.assertEqual(b"".join(self._helper_chunks(line, chunk_bytes)),
+                    line)
@@ -0,0 +1,517 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The keywords of all files below a project root.
+
+Reading tens of thousands of files takes far too long for the editor to wait
+for it.  A refresh therefore runs on a pool of worker processes: one task
+lists the files with their modification times and sizes, and only the files
+that are new or changed since the last refresh are split into keywords again.
+The editor polls for the result and keeps completing from the previous state
+in the meantime.
+
+The keywords of each file are stored packed in a single byte string.  The
+index is saved to a compressed file in a cache directory, so the next session
+starts with the state of the last one and only refreshes what changed.
+Loading and saving that file and building the KeywordIndex of all keywords
+happen in the pool as well.  The editor only takes over the results.
+"""
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import stat
+import sys
+import zlib
+
+import filebuffers
+import keywordindex
+
+FILE_MAGIC = b'localcomplete project index 1'
+
+# The bytes at the start of a file that are checked for binary content
+BINARY_PROBE_BYTES = 1024
+
+# The files per task for the worker processes
+TOKENIZE_CHUNK_SIZE = 64
+
+# The (fold, want_trigrams, want_char_masks) of a KeywordIndex for
+# case-sensitive prefix queries
+DEFAULT_INDEX_OPTIONS = (None, False, False)
+
+STAGE_LOADING = 'loading'
+STAGE_SCANNING = 'scanning'
+STAGE_TOKENIZING = 'tokenizing'
+STAGE_INDEXING = 'indexing'
+
+# The pools of get_pool() by worker count.  Starting the workers forks the
+# editor, so they are kept for the whole session.
+WORKER_POOLS = {}
+
+
+class ProjectIndexError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class FinishedResult(object):
+    """
+    Mimic the AsyncResult of a pool for a value that is available already.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return self.value
+
+
+class SynchronousPool(object):
+    """
+    Mimic a multiprocessing pool that does all the work when the task is
+    submitted.
+    """
+
+    def apply_async(self, function, args=()):
+        return FinishedResult(function(*args))
+
+    def map_async(self, function, iterable, chunksize=None):
+        return FinishedResult([function(item) for item in iterable])
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+def find_python_executable():
+    """
+    Return the path of a Python interpreter of the running version or None.
+    Inside Vim sys.executable is the editor itself.
+    """
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+    if os.name == 'nt':
+        candidates = [os.path.join(sys.exec_prefix, 'python.exe')]
+    else:
+        candidates = [os.path.join(sys.exec_prefix, 'bin', name)
+                for name in ('python%d.%d' % sys.version_info[:2],
+                        'python%d' % sys.version_info[0])]
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+def get_worker_context():
+    """
+    Return the multiprocessing context that starts the worker processes or
+    None if there is none.  Forked workers are copies of the running process.
+    Spawned ones start a new interpreter, which must not be the editor.
+    """
+    try:
+        start_methods = multiprocessing.get_all_start_methods()
+    except AttributeError:
+        # Python 2 forks on POSIX and spawns elsewhere
+        start_methods = ['fork'] if os.name == 'posix' else ['spawn']
+        context = multiprocessing
+    else:
+        context = multiprocessing.get_context(
+                'fork' if 'fork' in start_methods else 'spawn')
+    if 'fork' in start_methods:
+        return context
+    executable = find_python_executable()
+    if executable is None:
+        return None
+    context.set_executable(executable)
+    return context
+
+def create_pool(worker_count):
+    """
+    Return a pool of worker_count processes or a SynchronousPool for 0 or if
+    the platform cannot start worker processes.
+    """
+    if worker_count <= 0:
+        return SynchronousPool()
+    context = get_worker_context()
+    if context is None:
+        return SynchronousPool()
+    return context.Pool(worker_count)
+
+def get_pool(worker_count):
+    """
+    Like create_pool, but the pool is created once and shared by all refreshes
+    of the session.
+    """
+    pool = WORKER_POOLS.get(worker_count)
+    if pool is None:
+        pool = WORKER_POOLS[worker_count] = create_pool(worker_count)
+    return pool
+
+def close_pools():
+    """
+    Stop the workers of all pools of get_pool() and wait for them to exit.
+    """
+    while WORKER_POOLS:
+        pool = WORKER_POOLS.popitem()[1]
+        pool.terminate()
+        pool.join()
+
+atexit.register(close_pools)
+
+def pack_keywords(keywords):
+    """
+    Return the unique unicode keywords in the order of their first occurrence
+    as one UTF-8 byte string.
+    """
+    seen = set()
+    unique_keywords = []
+    for keyword in keywords:
+        if keyword not in seen:
+            seen.add(keyword)
+            unique_keywords.append(keyword)
+    return u'\0'.join(unique_keywords).encode('utf-8')
+
+def unpack_keywords(packed_keywords):
+    if not packed_keywords:
+        return []
+    return packed_keywords.decode('utf-8').split(u'\0')
+
+def scan_project_files(root, max_file_bytes):
+    """
+    Return {relative path: (mtime, size)} for the regular files below root.
+    Hidden files and directories, empty files and files larger than
+    max_file_bytes are left out, unless max_file_bytes is 0.
+    """
+    file_stamps = {}
+    for directory, subdirectories, file_names in os.walk(root):
+        subdirectories[:] = [name for name in subdirectories
+                if not name.startswith('.')]
+        for file_name in file_names:
+            if file_name.startswith('.') or '\n' in file_name:
+                continue
+            path = os.path.join(directory, file_name)
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                continue
+            if (not stat.S_ISREG(file_stat.st_mode)
+                    or not file_stat.st_size
+                    or (max_file_bytes
+                            and file_stat.st_size > max_file_bytes)):
+                continue
+            file_stamps[os.path.relpath(path, root)] = (
+                    file_stat.st_mtime, file_stat.st_size)
+    return file_stamps
+
+def looks_binary(path):
+    with open(path, 'rb') as file_object:
+        return b'\0' in file_object.read(BINARY_PROBE_BYTES)
+
+def tokenize_project_file(task):
+    """
+    Return the packed keywords of the file for task (path,
+    punctuation_chars).  Binary and unreadable files have no keywords.
+    """
+    path, punctuation_chars = task
+    try:
+        if looks_binary(path):
+            return b''
+        return pack_keywords(
+                filebuffers.tokenize_file(path, punctuation_chars))
+    except (IOError, OSError):
+        return b''
+
+def get_cache_path(cache_directory, root, punctuation_chars):
+    """
+    Return the path of the saved index for the root and the keyword
+    characters.
+    """
+    digest = hashlib.sha1(filebuffers.encode_path(root) + b'\0'
+            + punctuation_chars.encode('utf-8')).hexdigest()
+    return os.path.join(cache_directory, 'project-%s.idx' % digest)
+
+def serialize_files(punctuation_chars, files):
+    """
+    Return the compressed representation of the files dictionary of a
+    ProjectIndex.
+    """
+    records = [FILE_MAGIC, punctuation_chars.encode('utf-8')]
+    for path in sorted(files):
+        (mtime, size), packed_keywords = files[path]
+        records.append(b'\0'.join([filebuffers.encode_path(path),
+                repr(mtime).encode('ascii'),
+                str(size).encode('ascii'),
+                packed_keywords]))
+    return zlib.compress(b'\n'.join(records))
+
+def deserialize_files(punctuation_chars, data):
+    """
+    Return the files dictionary of serialized data.  Raise
+    ProjectIndexError if it is corrupt or for other keyword characters.
+    """
+    try:
+        records = zlib.decompress(data).split(b'\n')
+    except zlib.error as err:
+        raise ProjectIndexError("Corrupt project index: %s" % err)
+    if records[:2] != [FILE_MAGIC, punctuation_chars.encode('utf-8')]:
+        raise ProjectIndexError("Incompatible project index")
+    files = {}
+    for record in records[2:]:
+        try:
+            path, mtime, size, packed_keywords = record.split(b'\0', 3)
+            files[filebuffers.decode_path(path)] = (
+                    (float(mtime), int(size)),
+                    packed_keywords)
+        except ValueError:
+            raise ProjectIndexError("Corrupt project index record")
+    return files
+
+def load_files(cache_path, punctuation_chars):
+    """
+    Return the files dictionary saved at cache_path.  A missing, corrupt or
+    incompatible file gives an empty one.
+    """
+    try:
+        with open(cache_path, 'rb') as file_object:
+            return deserialize_files(punctuation_chars, file_object.read())
+    except (IOError, ProjectIndexError):
+        return {}
+
+def save_files(cache_path, punctuation_chars, files):
+    try:
+        directory = os.path.dirname(cache_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        filebuffers.write_file_atomically(cache_path,
+                serialize_files(punctuation_chars, files))
+    except (IOError, OSError):
+        # Without the file the next session starts from scratch.
+        pass
+
+def generate_files_keywords(files):
+    """
+    Generate the keywords of all files in the order of their paths.
+    """
+    for path in sorted(files):
+        for keyword in unpack_keywords(files[path][1]):
+            yield keyword
+
+def create_keyword_index(files, index_options):
+    """
+    Return the KeywordIndex of the keywords of files.  index_options are
+    (fold, want_trigrams, want_char_masks) with fold None for case-sensitive
+    queries.
+    """
+    fold, want_trigrams, want_char_masks = index_options
+    return keywordindex.KeywordIndex(generate_files_keywords(files),
+            () if fold is None else (fold,),
+            want_trigrams,
+            want_char_masks)
+
+def load_project_index(task):
+    """
+    Return the files dictionary saved at the cache path of task (cache_path,
+    punctuation_chars, index_options) and its KeywordIndex.
+    """
+    cache_path, punctuation_chars, index_options = task
+    files = load_files(cache_path, punctuation_chars)
+    return (files, create_keyword_index(files, index_options))
+
+def index_project_files(task):
+    """
+    Save the files dictionary of task (files, punctuation_chars, cache_path,
+    index_options) unless cache_path is None and return its KeywordIndex.
+    """
+    files, punctuation_chars, cache_path, index_options = task
+    if cache_path is not None:
+        save_files(cache_path, punctuation_chars, files)
+    return create_keyword_index(files, index_options)
+
+
+class ProjectIndex(object):
+    """
+    The packed keywords of the files below root by relative path.
+
+    start_refresh() submits the work to a pool, and poll() takes the results
+    once they are ready.  Each change of the files or of keyword_index
+    increments generation.  If cache_path is given, the first refresh loads
+    the index from there, and the index is saved after each refresh that
+    changed it.  A missing, corrupt or incompatible file is ignored.
+
+    keyword_index is the KeywordIndex of all keywords that the pool built for
+    keyword_index_options, or None before the first refresh.
+    """
+
+    def __init__(self, root, punctuation_chars, cache_path=None):
+        self.root = root
+        self.punctuation_chars = punctuation_chars
+        self.cache_path = cache_path
+        self.files = {}
+        self.is_loaded = cache_path is None
+        self.keyword_index = None
+        self.keyword_index_options = None
+        self.generation = 0
+        self.refresh_time = None
+        self.pool = None
+        self.pending = None
+        self.stage = None
+        self.max_file_bytes = None
+        self.index_options = None
+        self.scanned_stamps = None
+        self.changed_paths = None
+        self.indexed_files = None
+
+    def is_refreshing(self):
+        return self.pending is not None
+
+    def needs_refresh(self, now, refresh_seconds):
+        """
+        Tell whether a refresh is due.  The first one always is.  Later ones
+        after refresh_seconds unless it is 0.
+        """
+        if self.is_refreshing():
+            return False
+        if self.refresh_time is None:
+            return True
+        return bool(refresh_seconds
+                and now - self.refresh_time >= refresh_seconds)
+
+    def start_refresh(self, pool, max_file_bytes, now,
+            index_options=DEFAULT_INDEX_OPTIONS):
+        """
+        Let the pool list the files below root, after loading the saved index
+        on the first refresh.  The KeywordIndex is built for index_options.
+        Does nothing if a refresh is running already.
+        """
+        if self.is_refreshing():
+            return
+        self.pool = pool
+        self.refresh_time = now
+        self.max_file_bytes = max_file_bytes
+        self.index_options = index_options
+        if self.is_loaded:
+            self._start_scanning()
+        else:
+            self.stage = STAGE_LOADING
+            self.pending = pool.apply_async(load_project_index,
+                    ((self.cache_path, self.punctuation_chars,
+                            index_options),))
+
+    def poll(self):
+        """
+        Advance the refresh as far as the pool has finished.  Return True if
+        the refresh has been completed.  If a task failed, the refresh is
+        abandoned, the index keeps its state and ProjectIndexError is raised.
+        """
+        while self.pending is not None and self.pending.ready():
+            try:
+                result = self.pending.get()
+            except Exception as err:
+                # Any exception of a worker is re-raised by get().
+                self._end_refresh()
+                raise ProjectIndexError(
+                        "Project index refresh failed: %s" % err)
+            if self.stage == STAGE_LOADING:
+                self._finish_loading(result)
+            elif self.stage == STAGE_SCANNING:
+                self._start_tokenizing(result)
+            elif self.stage == STAGE_TOKENIZING:
+                if self._finish_tokenizing(result):
+                    return True
+            else:
+                self._finish_indexing(result)
+                return True
+        return False
+
+    def _finish_loading(self, loaded_index):
+        files, keyword_index = loaded_index
+        self.is_loaded = True
+        if files:
+            self.files = files
+            self._take_keyword_index(keyword_index)
+        self._start_scanning()
+
+    def _start_scanning(self):
+        self.stage = STAGE_SCANNING
+        self.pending = self.pool.apply_async(scan_project_files,
+                (self.root, self.max_file_bytes))
+
+    def _start_tokenizing(self, file_stamps):
+        self.scanned_stamps = file_stamps
+        self.changed_paths = sorted(path
+                for path, file_stamp in file_stamps.items()
+                if path not in self.files
+                        or self.files[path][0] != file_stamp)
+        self.stage = STAGE_TOKENIZING
+        self.pending = self.pool.map_async(tokenize_project_file,
+                [(os.path.join(self.root, path), self.punctuation_chars)
+                        for path in self.changed_paths],
+                TOKENIZE_CHUNK_SIZE)
+
+    def _finish_tokenizing(self, packed_keyword_list):
+        """
+        Merge the new keywords into the files.  If anything changed, let the
+        pool save the files and build their KeywordIndex.  Return True if
+        the refresh is finished.
+        """
+        files = dict((path, self.files[path])
+                for path in self.scanned_stamps
+                if path in self.files)
+        for path, packed_keywords in zip(self.changed_paths,
+                packed_keyword_list):
+            files[path] = (self.scanned_stamps[path], packed_keywords)
+        changed = bool(self.changed_paths) or len(files) != len(self.files)
+        if not (changed or self.keyword_index_options != self.index_options):
+            self._end_refresh()
+            return True
+        self.indexed_files = files
+        self.stage = STAGE_INDEXING
+        self.pending = self.pool.apply_async(index_project_files,
+                ((files,
+                        self.punctuation_chars,
+                        self.cache_path if changed else None,
+                        self.index_options),))
+        return False
+
+    def _finish_indexing(self, keyword_index):
+        self.files = self.indexed_files
+        self._take_keyword_index(keyword_index)
+        self._end_refresh()
+
+    def _take_keyword_index(self, keyword_index):
+        self.keyword_index = keyword_index
+        self.keyword_index_options = self.index_options
+        self.generation += 1
+
+    def _end_refresh(self):
+        self.pool = None
+        self.pending = None
+        self.stage = None
+        self.scanned_stamps = None
+        self.changed_paths = None
+        self.indexed_files = None
+
+    def generate_keywords(self):
+        """
+        Generate the keywords of all files in the order of their paths.
+        """
+        return generate_files_keywords(self.files)
@@ -0,0 +1,353 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pylibs import keywordindex
+from pylibs import projectindex
+
+
+class ProjectIndexTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class ProjectDirectoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _helper_write_file(self, relative_path, content):
+        path = os.path.join(self.root, relative_path)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, 'wb') as file_object:
+            file_object.write(content)
+        return path
+
+
+class TestPackKeywords(unittest.TestCase):
+
+    def test_unique_keywords_are_packed_in_order(self):
+        packed = projectindex.pack_keywords(
+                [u"b", u"\u00e4", u"b", u"a"])
+        self.assertEqual(packed, u"b\0\u00e4\0a".encode('utf-8'))
+        self.assertEqual(projectindex.unpack_keywords(packed),
+                [u"b", u"\u00e4", u"a"])
+
+    def test_no_keywords(self):
+        self.assertEqual(projectindex.pack_keywords([]), b"")
+        self.assertEqual(projectindex.unpack_keywords(b""), [])
+
+
+class TestScanProjectFiles(ProjectDirectoryTestCase):
+
+    def test_regular_files_below_the_root(self):
+        self._helper_write_file('a.txt', b"a")
+        self._helper_write_file(os.path.join('sub', 'b.txt'), b"bb")
+        stamps = projectindex.scan_project_files(self.root, 0)
+        self.assertEqual(sorted(stamps),
+                ['a.txt', os.path.join('sub', 'b.txt')])
+        self.assertEqual(stamps['a.txt'][1], 1)
+
+    def test_hidden_empty_and_big_files_are_left_out(self):
+        self._helper_write_file('.hidden', b"a")
+        self._helper_write_file(os.path.join('.git', 'config'), b"a")
+        self._helper_write_file('empty', b"")
+        self._helper_write_file('big', b"abcd")
+        self._helper_write_file('small', b"abc")
+        self.assertEqual(list(projectindex.scan_project_files(self.root, 3)),
+                ['small'])
+
+
+class TestTokenizeProjectFile(ProjectDirectoryTestCase):
+
+    def test_unique_keywords_of_the_file(self):
+        path = self._helper_write_file('a.txt', b"one two-one one")
+        self.assertEqual(
+                projectindex.tokenize_project_file((path, u'-')),
+                b"one\0two-one")
+
+    def test_binary_and_missing_files_have_no_keywords(self):
+        path = self._helper_write_file('a.bin', b"one\0two")
+        self.assertEqual(
+                projectindex.tokenize_project_file((path, u'')), b"")
+        self.assertEqual(projectindex.tokenize_project_file(
+                (os.path.join(self.root, 'missing'), u'')), b"")
+
+
+class TestSerializeFiles(unittest.TestCase):
+
+    FILES = {
+            'a.txt': ((1234.5, 10), b"one\0two"),
+            os.path.join('sub', 'b.txt'): ((1.25, 3), b""),
+            }
+
+    def test_files_survive_a_round_trip(self):
+        data = projectindex.serialize_files(u'-', self.FILES)
+        self.assertEqual(projectindex.deserialize_files(u'-', data),
+                self.FILES)
+
+    def test_other_keyword_chars_are_rejected(self):
+        data = projectindex.serialize_files(u'-', self.FILES)
+        self.assertRaises(projectindex.ProjectIndexError,
+                projectindex.deserialize_files, u':', data)
+
+    def test_corrupt_data_is_rejected(self):
+        data = projectindex.serialize_files(u'-', self.FILES)
+        self.assertRaises(projectindex.ProjectIndexError,
+                projectindex.deserialize_files, u'-', data[:-4])
+        self.assertRaises(projectindex.ProjectIndexError,
+                projectindex.deserialize_files, u'-', b"garbage")
+
+
+class TestProjectIndex(ProjectDirectoryTestCase):
+
+    def _helper_refresh(self, project_index, now=100,
+            index_options=projectindex.DEFAULT_INDEX_OPTIONS):
+        project_index.start_refresh(projectindex.SynchronousPool(), 0, now,
+                index_options)
+        return project_index.poll()
+
+    def _helper_waiting_pool(self, pending_result):
+        """
+        Return a pool that runs all tasks but the file scan right away.
+        """
+        synchronous_pool = projectindex.SynchronousPool()
+        pool_mock = mock.Mock()
+        pool_mock.apply_async.side_effect = lambda function, args: (
+                pending_result
+                if function is projectindex.scan_project_files
+                else synchronous_pool.apply_async(function, args))
+        return pool_mock
+
+    def test_refresh_reads_all_files(self):
+        self._helper_write_file('a.txt', b"alpha beta")
+        self._helper_write_file('b.txt', b"beta gamma")
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        self.assertTrue(self._helper_refresh(project_index))
+        self.assertEqual(list(project_index.generate_keywords()),
+                [u"alpha", u"beta", u"beta", u"gamma"])
+        self.assertEqual(project_index.generation, 1)
+
+    def test_refresh_only_reads_changed_files(self):
+        self._helper_write_file('a.txt', b"alpha")
+        self._helper_write_file('b.txt', b"beta")
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        self._helper_refresh(project_index)
+        self._helper_write_file('b.txt', b"beta delta")
+        os.remove(os.path.join(self.root, 'a.txt'))
+        tokenize_mock = mock.Mock(
+                side_effect=projectindex.tokenize_project_file)
+        with mock.patch.object(projectindex, 'tokenize_project_file',
+                tokenize_mock):
+            self._helper_refresh(project_index)
+        tokenize_mock.assert_called_once_with(
+                (os.path.join(self.root, 'b.txt'), u''))
+        self.assertEqual(list(project_index.generate_keywords()),
+                [u"beta", u"delta"])
+
+    def test_unchanged_files_keep_the_generation(self):
+        self._helper_write_file('a.txt', b"alpha")
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        self._helper_refresh(project_index)
+        self._helper_refresh(project_index)
+        self.assertEqual(project_index.generation, 1)
+
+    def test_poll_waits_for_the_pool(self):
+        self._helper_write_file('a.txt', b"alpha")
+        pending_result = mock.Mock()
+        pending_result.ready.return_value = False
+        pool_mock = self._helper_waiting_pool(pending_result)
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        project_index.start_refresh(pool_mock, 0, 100)
+        self.assertFalse(project_index.poll())
+        self.assertTrue(project_index.is_refreshing())
+
+        pending_result.ready.return_value = True
+        pending_result.get.return_value = {'a.txt': (1.0, 5)}
+        pool_mock.map_async.return_value = projectindex.FinishedResult(
+                [b"alpha"])
+        self.assertTrue(project_index.poll())
+        self.assertFalse(project_index.is_refreshing())
+        self.assertFalse(pool_mock.close.called)
+        self.assertEqual(list(project_index.generate_keywords()),
+                [u"alpha"])
+        self.assertEqual(
+                list(project_index.keyword_index.find_prefix_matches(u"al")),
+                [u"alpha"])
+
+    def test_the_pool_builds_the_keyword_index_for_the_options(self):
+        self._helper_write_file('a.txt', b"Alpha")
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        options = (keywordindex.fold_case, False, False)
+        self._helper_refresh(project_index, index_options=options)
+        self.assertEqual(project_index.keyword_index_options, options)
+        self.assertEqual(list(project_index.keyword_index.find_prefix_matches(
+                u"al", keywordindex.fold_case)),
+                [u"Alpha"])
+
+        options = (None, True, False)
+        self._helper_refresh(project_index, index_options=options)
+        self.assertEqual(project_index.keyword_index_options, options)
+        self.assertEqual(
+                list(project_index.keyword_index.find_substring_matches(
+                        u"lph")),
+                [u"Alpha"])
+        self.assertEqual(project_index.generation, 2)
+
+    def test_failed_refresh_keeps_the_index(self):
+        self._helper_write_file('a.txt', b"alpha")
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        self._helper_refresh(project_index)
+        pool_mock = mock.Mock()
+        pool_mock.apply_async.return_value = mock.Mock(
+                **{'ready.return_value': True,
+                        'get.side_effect': OSError("worker died")})
+        project_index.start_refresh(pool_mock, 0, 200)
+        self.assertRaises(projectindex.ProjectIndexError,
+                project_index.poll)
+        self.assertFalse(project_index.is_refreshing())
+        self.assertFalse(pool_mock.close.called)
+        self.assertEqual(list(project_index.generate_keywords()),
+                [u"alpha"])
+        self.assertEqual(project_index.generation, 1)
+
+    def test_refresh_is_due_after_refresh_seconds(self):
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        self.assertTrue(project_index.needs_refresh(100, 0))
+        self._helper_refresh(project_index, now=100)
+        self.assertFalse(project_index.needs_refresh(1000, 0))
+        self.assertFalse(project_index.needs_refresh(109, 10))
+        self.assertTrue(project_index.needs_refresh(110, 10))
+
+    def test_index_is_saved_and_loaded(self):
+        self._helper_write_file('a.txt', b"alpha")
+        cache_path = os.path.join(self.root, '.cache', 'project.idx')
+        project_index = projectindex.ProjectIndex(self.root, u'',
+                cache_path)
+        self._helper_refresh(project_index)
+        loaded_index = projectindex.ProjectIndex(self.root, u'', cache_path)
+        self.assertEqual(loaded_index.files, {})
+
+        pending_result = mock.Mock()
+        pending_result.ready.return_value = False
+        loaded_index.start_refresh(self._helper_waiting_pool(pending_result),
+                0, 100)
+        self.assertFalse(loaded_index.poll())
+        self.assertEqual(list(loaded_index.generate_keywords()), [u"alpha"])
+        self.assertEqual(loaded_index.files, project_index.files)
+        self.assertEqual(
+                list(loaded_index.keyword_index.find_prefix_matches(u"al")),
+                [u"alpha"])
+        self.assertEqual(loaded_index.generation, 1)
+
+    def test_corrupt_cache_files_are_ignored(self):
+        cache_path = self._helper_write_file('.project.idx', b"garbage")
+        self.assertEqual(projectindex.load_files(cache_path, u''), {})
+        project_index = projectindex.ProjectIndex(self.root, u'',
+                cache_path)
+        self._helper_refresh(project_index)
+        self.assertEqual(list(project_index.generate_keywords()), [])
+
+
+class TestCreatePool(ProjectDirectoryTestCase):
+
+    def test_no_workers_give_a_synchronous_pool(self):
+        self.assertIsInstance(projectindex.create_pool(0),
+                projectindex.SynchronousPool)
+
+    def test_platforms_without_workers_give_a_synchronous_pool(self):
+        with mock.patch.object(projectindex, 'get_worker_context',
+                mock.Mock(return_value=None)):
+            self.assertIsInstance(projectindex.create_pool(2),
+                    projectindex.SynchronousPool)
+
+    def test_worker_processes_refresh_the_index(self):
+        self._helper_write_file('a.txt', b"alpha")
+        project_index = projectindex.ProjectIndex(self.root, u'')
+        pool = projectindex.create_pool(1)
+        self.addCleanup(pool.join)
+        self.addCleanup(pool.terminate)
+        project_index.start_refresh(pool, 0, 100)
+        deadline = time.time() + 30
+        while not project_index.poll() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(list(project_index.generate_keywords()),
+                [u"alpha"])
+
+
+class TestGetPool(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(projectindex, 'WORKER_POOLS', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_the_pool_is_shared(self):
+        with mock.patch.object(projectindex, 'create_pool',
+                mock.Mock(side_effect=lambda count: mock.Mock())):
+            pool = projectindex.get_pool(2)
+            self.assertIs(projectindex.get_pool(2), pool)
+            self.assertIsNot(projectindex.get_pool(3), pool)
+            self.assertEqual(projectindex.create_pool.call_count, 2)
+
+    def test_closed_pools_are_joined(self):
+        pool = mock.Mock()
+        projectindex.WORKER_POOLS[2] = pool
+        projectindex.close_pools()
+        pool.terminate.assert_called_once_with()
+        pool.join.assert_called_once_with()
+        self.assertEqual(projectindex.WORKER_POOLS, {})
+
+
+class TestGetWorkerContext(unittest.TestCase):
+
+    def test_spawned_workers_do_not_start_the_editor(self):
+        with mock.patch.multiple(projectindex.sys,
+                executable='/usr/bin/vim',
+                exec_prefix='/nonexistent'):
+            self.assertIsNone(projectindex.find_python_executable())
+            with mock.patch.multiple(projectindex.multiprocessing,
+                    create=True,
+                    get_all_start_methods=mock.Mock(return_value=['spawn']),
+                    get_context=mock.Mock()):
+                self.assertIsNone(projectindex.get_worker_context())
+
+    def test_python_is_its_own_executable(self):
+        with mock.patch.object(projectindex.sys, 'executable',
+                '/usr/bin/python3'):
+            self.assertEqual(projectindex.find_python_executable(),
+                    '/usr/bin/python3')
+
+
+class TestGetCachePath(unittest.TestCase):
+
+    def test_paths_differ_by_root_and_keyword_chars(self):
+        paths = set([projectindex.get_cache_path('/cache', '/a', u''),
+                projectindex.get_cache_path('/cache', '/b', u''),
+                projectindex.get_cache_path('/cache', '/a', u'-')])
+        self.assertEqual(len(paths), 3)
+        for path in paths:
+            self.assertEqual(os.path.dirname(path), '/cache')
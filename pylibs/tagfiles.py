@@ -0,0 +1,234 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Look up tag names in ctags files.
+
+Tag files of big projects easily have hundreds of megabytes.  Scanning them
+for every completion is out of the question, but most of them are sorted by
+tag name, which the !_TAG_FILE_SORTED pseudo tag tells.  A binary search on
+the memory-mapped file then only touches a few pages before it reaches the
+matching lines.  Files sorted with folded case support case-insensitive
+searches.  In files sorted by case, a case-insensitive search looks up each
+case variant of the leading letters of the prefix separately.  Only unsorted
+files are scanned completely.
+"""
+
+import mmap
+import re
+import string
+
+TAG_FILE_UNSORTED = 0
+TAG_FILE_SORTED = 1
+TAG_FILE_FOLDCASE = 2
+
+PSEUDO_TAG_PREFIX = b'!_TAG_'
+SORTED_PSEUDO_TAG = b'!_TAG_FILE_SORTED\t'
+
+ASCII_LETTERS = string.ascii_letters.encode('ascii')
+
+try:
+    ASCII_UPPERCASE_TABLE = bytes.maketrans(
+            string.ascii_lowercase.encode('ascii'),
+            string.ascii_uppercase.encode('ascii'))
+    ASCII_LOWERCASE_TABLE = bytes.maketrans(
+            string.ascii_uppercase.encode('ascii'),
+            string.ascii_lowercase.encode('ascii'))
+except AttributeError:
+    # Python 2.  Note that str.upper() would depend on the locale.
+    ASCII_UPPERCASE_TABLE = string.maketrans(
+            string.ascii_lowercase, string.ascii_uppercase)
+    ASCII_LOWERCASE_TABLE = string.maketrans(
+            string.ascii_uppercase, string.ascii_lowercase)
+
+# The leading letters of the prefix whose case variants are looked up one by
+# one in files sorted by case.  The rest is compared ignoring case.
+MAX_CASE_VARIANT_LETTERS = 4
+
+
+class TagFilesError(Exception):
+    """
+    The base exception for this module.
+    """
+
+def fold_tag_name(name):
+    """
+    Fold the case of the encoded name like ctags does for foldcase sorting.
+    Only ASCII letters are folded, whatever the locale.
+    """
+    return name.translate(ASCII_UPPERCASE_TABLE)
+
+def read_header(data):
+    """
+    Return (sort order, end of the pseudo tags) of the tag file data.  Files
+    without a !_TAG_FILE_SORTED line count as unsorted.
+    """
+    sort_order = TAG_FILE_UNSORTED
+    position = 0
+    while data[position:position + len(PSEUDO_TAG_PREFIX)] == (
+            PSEUDO_TAG_PREFIX):
+        line_end = data.find(b'\n', position)
+        if line_end == -1:
+            line_end = len(data)
+        if data[position:position + len(SORTED_PSEUDO_TAG)] == (
+                SORTED_PSEUDO_TAG):
+            flag = data[position + len(SORTED_PSEUDO_TAG):
+                    position + len(SORTED_PSEUDO_TAG) + 1]
+            if flag in (b'1', b'2'):
+                sort_order = int(flag)
+        position = line_end + 1
+    return (sort_order, min(position, len(data)))
+
+def get_line_end(data, line_start):
+    line_end = data.find(b'\n', line_start)
+    return len(data) if line_end == -1 else line_end
+
+def get_tag_name(data, line_start, line_end):
+    name_end = data.find(b'\t', line_start, line_end)
+    return data[line_start:line_end if name_end == -1 else name_end]
+
+def bisect_tag_lines(data, key, start, fold=None):
+    """
+    Return the start of the first line at or after start whose tag name is
+    not less than key.  The lines have to be sorted by the tag names folded
+    with fold, and key has to be folded already.
+    """
+    low = start
+    high = len(data)
+    while low < high:
+        middle = (low + high) // 2
+        newline = data.rfind(b'\n', low, middle)
+        line_start = low if newline == -1 else newline + 1
+        line_end = get_line_end(data, line_start)
+        name = get_tag_name(data, line_start, line_end)
+        if fold is not None:
+            name = fold(name)
+        if name < key:
+            low = min(line_end + 1, len(data))
+        else:
+            high = line_start
+    return low
+
+def generate_sorted_tag_names(data, prefix, start, sort_order,
+        want_ignorecase):
+    """
+    Generate the tag names that start with prefix from the sorted lines after
+    start.  Case-insensitive searches need a file sorted with folded case.
+    """
+    fold = fold_tag_name if sort_order == TAG_FILE_FOLDCASE else None
+    key = prefix if fold is None else fold(prefix)
+    line_start = bisect_tag_lines(data, key, start, fold)
+    while line_start < len(data):
+        line_end = get_line_end(data, line_start)
+        name = get_tag_name(data, line_start, line_end)
+        folded_name = name if fold is None else fold(name)
+        if not folded_name.startswith(key):
+            break
+        if want_ignorecase or name.startswith(prefix):
+            yield name
+        line_start = line_end + 1
+
+def get_case_variants(prefix):
+    """
+    Return the sorted case variants of the start of the encoded prefix up to
+    its MAX_CASE_VARIANT_LETTERS-th ASCII letter.  Other bytes only have one
+    variant like in case-insensitive regular expressions on bytes.
+    """
+    variants = [b'']
+    letter_count = 0
+    for index in range(len(prefix)):
+        char = prefix[index:index + 1]
+        if char in ASCII_LETTERS:
+            if letter_count == MAX_CASE_VARIANT_LETTERS:
+                break
+            letter_count += 1
+            variants = [variant + case_char
+                    for variant in variants
+                    for case_char in (char.translate(ASCII_LOWERCASE_TABLE),
+                            char.translate(ASCII_UPPERCASE_TABLE))]
+        else:
+            variants = [variant + char for variant in variants]
+    return sorted(variants)
+
+def generate_case_variant_tag_names(data, prefix, start):
+    """
+    Generate the tag names that start with prefix ignoring case from the
+    lines after start that are sorted by case.  The lines of each case
+    variant follow each other, and the variants are sorted like the file.
+    """
+    folded_prefix = fold_tag_name(prefix)
+    for variant in get_case_variants(prefix):
+        line_start = bisect_tag_lines(data, variant, start)
+        while line_start < len(data):
+            line_end = get_line_end(data, line_start)
+            name = get_tag_name(data, line_start, line_end)
+            if not name.startswith(variant):
+                break
+            if fold_tag_name(name[:len(prefix)]) == folded_prefix:
+                yield name
+            line_start = line_end + 1
+
+def generate_scanned_tag_names(data, prefix, start, want_ignorecase):
+    """
+    Generate the tag names that start with prefix from all lines after start.
+    """
+    flags = re.MULTILINE | (re.IGNORECASE if want_ignorecase else 0)
+    needle = re.compile(b'^' + re.escape(prefix) + b'[^\t\n]*', flags)
+    for match in needle.finditer(data, start):
+        yield match.group()
+
+def generate_tag_names(data, prefix, want_ignorecase=False):
+    """
+    Generate the tag names in the tag file data that start with the encoded
+    prefix and are longer than it, in the order of the file.
+    """
+    sort_order, start = read_header(data)
+    if sort_order == TAG_FILE_FOLDCASE or (
+            sort_order == TAG_FILE_SORTED and not want_ignorecase):
+        names = generate_sorted_tag_names(data, prefix, start, sort_order,
+                want_ignorecase)
+    elif sort_order == TAG_FILE_SORTED:
+        names = generate_case_variant_tag_names(data, prefix, start)
+    else:
+        names = generate_scanned_tag_names(data, prefix, start,
+                want_ignorecase)
+    for name in names:
+        if len(name) > len(prefix):
+            yield name
+
+def find_tag_names(paths, prefix, want_ignorecase=False, limit=0):
+    """
+    Return the unique tag names in the tag files at paths that start with the
+    encoded prefix, file after file.  Stop after limit names unless it is 0.
+    Files that cannot be read are skipped.
+    """
+    found_names = []
+    seen_names = set()
+    for path in paths:
+        try:
+            with open(path, 'rb') as file_object:
+                data = mmap.mmap(file_object.fileno(), 0,
+                        access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            # ValueError: empty files cannot be mapped
+            continue
+        try:
+            for name in generate_tag_names(data, prefix, want_ignorecase):
+                if name not in seen_names:
+                    seen_names.add(name)
+                    found_names.append(name)
+                    if limit and len(found_names) == limit:
+                        return found_names
+        finally:
+            data.close()
+    return found_names
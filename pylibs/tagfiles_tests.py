@@ -0,0 +1,176 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from pylibs import tagfiles
+
+
+class TagFilesTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+def _create_tag_data(names, sort_order=None):
+    header = [b"!_TAG_FILE_FORMAT\t2\t/extended format/"]
+    if sort_order is not None:
+        header.append(("!_TAG_FILE_SORTED\t%d\t/0=unsorted/"
+                % sort_order).encode('ascii'))
+    lines = [name + b"\tfile.c\t/^" + name + b"$/;\"\tf" for name in names]
+    return b"\n".join(header + lines) + b"\n"
+
+
+class TestFoldTagName(unittest.TestCase):
+
+    def test_only_ascii_letters_are_folded(self):
+        self.assertEqual(tagfiles.fold_tag_name(b"ab_\xe4\xc3\xa4Z9"),
+                b"AB_\xe4\xc3\xa4Z9")
+
+    def test_case_variants_keep_other_bytes(self):
+        self.assertEqual(tagfiles.get_case_variants(b"\xe4i"),
+                [b"\xe4I", b"\xe4i"])
+
+
+class TestReadHeader(unittest.TestCase):
+
+    def test_sort_order_and_end_of_pseudo_tags(self):
+        data = _create_tag_data([b"a"], tagfiles.TAG_FILE_FOLDCASE)
+        sort_order, start = tagfiles.read_header(data)
+        self.assertEqual(sort_order, tagfiles.TAG_FILE_FOLDCASE)
+        self.assertTrue(data[start:].startswith(b"a\t"))
+
+    def test_files_without_sorted_line_are_unsorted(self):
+        self.assertEqual(tagfiles.read_header(_create_tag_data([b"a"])),
+                (tagfiles.TAG_FILE_UNSORTED, len(
+                        b"!_TAG_FILE_FORMAT\t2\t/extended format/\n")))
+
+    def test_header_only(self):
+        data = b"!_TAG_FILE_SORTED\t1\t/x/"
+        self.assertEqual(tagfiles.read_header(data),
+                (tagfiles.TAG_FILE_SORTED, len(data)))
+
+
+class TestBisectTagLines(unittest.TestCase):
+
+    NAMES = [b"alpha", b"beta", b"betamax", b"gamma", b"zeta"]
+
+    def test_first_line_not_less_than_the_key(self):
+        data = b"\n".join(self.NAMES)
+        for key, expected in [(b"a", b"alpha"), (b"b", b"beta"),
+                (b"betam", b"betamax"), (b"c", b"gamma"), (b"zz", b"")]:
+            position = tagfiles.bisect_tag_lines(data, key, 0)
+            self.assertEqual(data[position:].split(b"\n")[0], expected)
+
+    def test_every_key_of_many_lines(self):
+        names = [("k%04d" % number).encode('ascii')
+                for number in range(0, 1000, 3)]
+        data = b"\n".join(names) + b"\n"
+        for name in names:
+            position = tagfiles.bisect_tag_lines(data, name, 0)
+            self.assertTrue(data[position:].startswith(name + b"\n"))
+
+
+class TestGenerateTagNames(unittest.TestCase):
+
+    def _helper_names(self, names, prefix, sort_order=None,
+            want_ignorecase=False):
+        data = _create_tag_data(names, sort_order)
+        return list(tagfiles.generate_tag_names(data, prefix,
+                want_ignorecase))
+
+    def test_sorted_file(self):
+        names = [b"Alpha", b"alpha", b"alpine", b"alpine", b"beta"]
+        self.assertEqual(
+                self._helper_names(names, b"alp", tagfiles.TAG_FILE_SORTED),
+                [b"alpha", b"alpine", b"alpine"])
+
+    def test_foldcase_file(self):
+        names = [b"Alpha", b"ALPINE", b"alps", b"beta"]
+        self.assertEqual(
+                self._helper_names(names, b"alp",
+                        tagfiles.TAG_FILE_FOLDCASE),
+                [b"alps"])
+        self.assertEqual(
+                self._helper_names(names, b"alp",
+                        tagfiles.TAG_FILE_FOLDCASE, want_ignorecase=True),
+                [b"Alpha", b"ALPINE", b"alps"])
+
+    def test_unsorted_file_is_scanned(self):
+        names = [b"beta", b"alpha", b"ALPINE"]
+        self.assertEqual(self._helper_names(names, b"alp"), [b"alpha"])
+        self.assertEqual(
+                self._helper_names(names, b"alp", want_ignorecase=True),
+                [b"alpha", b"ALPINE"])
+
+    def test_ignorecase_on_sorted_files_looks_up_the_case_variants(self):
+        names = sorted([b"beta", b"alpha", b"ALPINE", b"aLPs", b"Alp_x",
+                b"alP_Y", b"alq", b"Al"])
+        self.assertEqual(
+                self._helper_names(names, b"alp", tagfiles.TAG_FILE_SORTED,
+                        want_ignorecase=True),
+                [b"ALPINE", b"Alp_x", b"aLPs", b"alP_Y", b"alpha"])
+        with mock.patch.object(tagfiles, 'MAX_CASE_VARIANT_LETTERS', 1):
+            self.assertEqual(
+                    self._helper_names(names, b"alp_",
+                            tagfiles.TAG_FILE_SORTED, want_ignorecase=True),
+                    [b"Alp_x", b"alP_Y"])
+
+    def test_case_variants_of_the_leading_letters(self):
+        self.assertEqual(tagfiles.get_case_variants(b"a_1b"),
+                [b"A_1B", b"A_1b", b"a_1B", b"a_1b"])
+        with mock.patch.object(tagfiles, 'MAX_CASE_VARIANT_LETTERS', 1):
+            self.assertEqual(tagfiles.get_case_variants(b"_ab"),
+                    [b"_A", b"_a"])
+
+    def test_names_have_to_be_longer_than_the_prefix(self):
+        self.assertEqual(
+                self._helper_names([b"alp", b"alps"], b"alp",
+                        tagfiles.TAG_FILE_SORTED),
+                [b"alps"])
+
+
+class TestFindTagNames(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _helper_write_tags(self, file_name, data):
+        path = os.path.join(self.directory, file_name)
+        with open(path, 'wb') as file_object:
+            file_object.write(data)
+        return path
+
+    def test_unique_names_of_all_files(self):
+        paths = [self._helper_write_tags('tags', _create_tag_data(
+                        [b"alpha", b"alpine"], tagfiles.TAG_FILE_SORTED)),
+                os.path.join(self.directory, 'missing'),
+                self._helper_write_tags('empty', b""),
+                self._helper_write_tags('other', _create_tag_data(
+                        [b"alps", b"alpha"]))]
+        self.assertEqual(tagfiles.find_tag_names(paths, b"al"),
+                [b"alpha", b"alpine", b"alps"])
+
+    def test_limit(self):
+        path = self._helper_write_tags('tags', _create_tag_data(
+                [b"alpha", b"alpine", b"alps"], tagfiles.TAG_FILE_SORTED))
+        self.assertEqual(tagfiles.find_tag_names([path], b"al", limit=2),
+                [b"alpha", b"alpine"])
@@ -1,6 +1,12 @@
 # For the class PythonToVimStr (part of jedi-vim)
 # Licensed under the GNU LGPL v3 or later.
 # Copyright (C) 2012 David Halter <davidhalter88@gmail.com>.
+try:
+    unicode
+except NameError:
+    # Python 3
+    unicode = str
+
 class PythonToVimStr(unicode):
     """ Vim has a different string implementation of single quotes """
     __slots__ = []
@@ -10,5 +16,9 @@ class PythonToVimStr(unicode):
         # support is pretty bad. don't ask how I came up with this... It just
         # works...
         # It seems to be related to that bug: http://bugs.python.org/issue5876
-        s = self.encode('UTF-8')
+        if unicode is str:
+            # Python 3 Vim takes the str as it is
+            s = self
+        else:
+            s = self.encode('UTF-8')
         return '"%s"' % s.replace('\\', '\\\\').replace('"', r'\"')
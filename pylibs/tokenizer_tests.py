@@ -0,0 +1,58 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from pylibs import tokenizer
+
+
+class TokenizerTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_split_at_non_keyword_chars(self):
+        self.assertEqual(tokenizer.tokenize(u" a_1(b, c)\td ", u""),
+                u"a_1 b c d".split())
+
+    def test_additional_keyword_chars(self):
+        self.assertEqual(tokenizer.tokenize(u"a:b c-d e\\f", u":\\"),
+                [u"a:b", u"c", u"d", u"e\\f"])
+
+    def test_multibyte_letters_are_keyword_chars(self):
+        self.assertEqual(
+                tokenizer.tokenize(u"\u00fcber\u2014fu\u00df \u65e5\u672c",
+                        u""),
+                [u"\u00fcber", u"fu\u00df", u"\u65e5\u672c"])
+
+    def test_whitespace_as_keyword_char_falls_back_to_the_regex(self):
+        self.assertEqual(tokenizer.tokenize(u"a b,c", u" "),
+                [u"a b", u"c"])
+
+    def test_tables_are_cached_per_keyword_chars(self):
+        self.assertIs(tokenizer.get_translation_table(u":"),
+                tokenizer.get_translation_table(u":"))
+        self.assertIsNot(tokenizer.get_translation_table(u":"),
+                tokenizer.get_translation_table(u"-"))
+
+
+class TestTokenizeLines(unittest.TestCase):
+
+    def test_lines_do_not_join_keywords(self):
+        lines = [u"a b\u00fc".encode('utf-8'), b"c", b"", b"d"]
+        self.assertEqual(tokenizer.tokenize_lines(lines, 'utf-8', u""),
+                [u"a", u"b\u00fc", u"c", u"d"])
@@ -0,0 +1,79 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Strings from Vim with Python 2 and Python 3.
+
+Python 2 Vim passes buffer lines and the results of vim.eval as bytes in
+'encoding'.  Python 3 Vim passes them as str that it has decoded already,
+with the surrogateescape error handler for invalid bytes.  The helpers here
+only decode bytes, so with Python 3 the native strings are used as they are
+and no line is decoded on the Python side.
+"""
+
+# Whether Vim passes its strings decoded, which it does with Python 3
+VIM_PASSES_TEXT = str is not bytes
+
+# The error handler that Python 3 Vim decodes invalid bytes with.  Python 2
+# does not know it.
+TEXT_ERRORS = 'surrogateescape' if VIM_PASSES_TEXT else 'strict'
+
+
+class VimTextError(Exception):
+    """
+    The base exception for this module.
+    """
+
+def to_text(value, encoding):
+    """
+    Return the string value from Vim decoded from encoding unless it is
+    decoded already.
+    """
+    if isinstance(value, bytes):
+        return value.decode(encoding)
+    return value
+
+def to_bytes(value, encoding):
+    """
+    Return the string value from Vim encoded in encoding unless it is
+    encoded already.  For the byte indexes that Vim uses for columns.
+    """
+    if isinstance(value, bytes):
+        return value
+    return value.encode(encoding, TEXT_ERRORS)
+
+def join_chunks(chunks):
+    """
+    Return the chunks of a line from Vim joined to one line.
+    """
+    if VIM_PASSES_TEXT:
+        return u''.join(chunks)
+    return b''.join(chunks)
+
+def join_lines(lines, encoding):
+    """
+    Return the lines from Vim joined with line breaks as one decoded text.
+    """
+    if VIM_PASSES_TEXT:
+        return u'\n'.join(lines)
+    return b'\n'.join(lines).decode(encoding)
+
+def join_encoded_lines(lines):
+    """
+    Return the lines from Vim joined with line breaks as bytes.  Decoded lines
+    are encoded as UTF-8 and invalid bytes are restored, so the result only
+    depends on the content of the lines.
+    """
+    if VIM_PASSES_TEXT:
+        return u'\n'.join(lines).encode('utf-8', TEXT_ERRORS)
+    return b'\n'.join(lines)
@@ -0,0 +1,66 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import mock
+import unittest
+
+from pylibs import vimtext
+
+
+class VimTextTestsError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class TestVimText(unittest.TestCase):
+
+    def test_bytes_are_decoded(self):
+        self.assertEqual(vimtext.to_text(b"gr\xc3\xbc\xc3\x9fe", 'utf-8'),
+                u"gr\u00fc\u00dfe")
+
+    def test_text_is_not_decoded_again(self):
+        text = u"gr\u00fc\u00dfe"
+        self.assertIs(vimtext.to_text(text, 'latin1'), text)
+
+    def test_text_is_encoded_for_byte_indexes(self):
+        self.assertEqual(vimtext.to_bytes(u"gr\u00fc\u00dfe", 'utf-8'),
+                b"gr\xc3\xbc\xc3\x9fe")
+
+    def test_bytes_are_not_encoded_again(self):
+        data = b"gr\xfc\xdfe"
+        self.assertIs(vimtext.to_bytes(data, 'utf-8'), data)
+
+    @unittest.skipIf(str is bytes, "Python 2 has no surrogateescape")
+    def test_invalid_bytes_are_restored(self):
+        self.assertEqual(vimtext.to_bytes(u"a\udcffb", 'utf-8'), b"a\xffb")
+
+    def test_encoded_lines_are_joined(self):
+        with mock.patch.object(vimtext, 'VIM_PASSES_TEXT', False):
+            self.assertEqual(vimtext.join_chunks([b"ab ", b"cd"]), b"ab cd")
+            self.assertEqual(
+                    vimtext.join_lines([b"\xfcber", b"ab"], 'latin1'),
+                    u"\u00fcber\nab")
+            self.assertEqual(vimtext.join_encoded_lines([b"\xfc", b"ab"]),
+                    b"\xfc\nab")
+
+    def test_decoded_lines_are_joined(self):
+        with mock.patch.object(vimtext, 'VIM_PASSES_TEXT', True):
+            self.assertEqual(vimtext.join_chunks([u"ab ", u"cd"]), u"ab cd")
+            self.assertEqual(
+                    vimtext.join_lines([u"\u00fcber", u"ab"], 'latin1'),
+                    u"\u00fcber\nab")
+            self.assertEqual(
+                    vimtext.join_encoded_lines([u"\u00fc", u"ab"]),
+                    b"\xc3\xbc\nab")
@@ -0,0 +1,719 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A randomized differential test harness.
+
+Every faster way to produce completions has to return exactly what the
+reference regex implementation returns.  This module generates random buffers,
+dictionaries, keyword bases and configurations, runs the completion functions
+of localcomplete against them and compares the results of a reference engine
+with those of a candidate engine.
+
+An engine is a callable that takes a scenario and returns the list of matches.
+The run_* functions below are engines that run the actual completion functions.
+Their keyword arguments are merged into the Vim configuration of the scenario,
+so engines that are selected through the configuration can be compared with
+functools.partial.
+
+The scenarios come from DEFAULT_SEED, so every run compares the same ones.
+Set LOCALCOMPLETE_EQUIVALENCE_SEED to explore others or to reproduce a
+reported failure and LOCALCOMPLETE_EQUIVALENCE_ITERATIONS to change the
+amount of scenarios per comparison.
+"""
+
+import itertools
+import mock
+import os
+import random
+
+from pylibs import keywordindex
+from pylibs import localcomplete
+from tests.lc_testutils import VimMockFactory
+
+
+ENVIRONMENT_SEED = "LOCALCOMPLETE_EQUIVALENCE_SEED"
+ENVIRONMENT_ITERATIONS = "LOCALCOMPLETE_EQUIVALENCE_ITERATIONS"
+
+DEFAULT_ITERATIONS = 200
+DEFAULT_SEED = 4711
+
+# Every scenario gets fresh changedticks so that no cached state leaks from one
+# scenario into the next.
+CHANGEDTICKS = itertools.count(1)
+
+
+class LCEquivalenceError(Exception):
+    """
+    The base exception for this module.
+    """
+
+
+class VimBufferFake(list):
+    """
+    A list of lines with a buffer number like the buffers in vim.buffers
+    """
+    number = None
+
+
+def get_equivalence_seed():
+    """
+    Return the seed from the environment or DEFAULT_SEED.
+    """
+    return int(os.environ.get(ENVIRONMENT_SEED, DEFAULT_SEED))
+
+def get_equivalence_iterations():
+    return int(os.environ.get(ENVIRONMENT_ITERATIONS, DEFAULT_ITERATIONS))
+
+def unique_everseen(matches):
+    """
+    Remove duplicates from matches but keep the order of first occurrence.
+
+    Engines that look up unique keywords use this as normalization because
+    Vim drops duplicate completion items anyway.
+    """
+    seen = set()
+    result = []
+    for match in matches:
+        if match not in seen:
+            seen.add(match)
+            result.append(match)
+    return result
+
+
+class ScenarioGenerator(object):
+    """
+    Generate random completion scenarios.
+
+    Buffer scenarios are dictionaries with the keys buffers_content (a list of
+    buffers, each a list of utf-8 encoded lines), current_buffer_index,
+    current_line_index, keyword_base (unicode), keyword_chars (the resolved
+    additional keyword characters) and config (keyword arguments for
+    VimMockFactory).
+
+    Dictionary scenarios have the keys dictionary_lines (unicode),
+    keyword_base and config.
+    """
+
+    WORD_CHARS = (u"abcdeprizABCEPRIZ_019"
+            u"\u00fc\u00dc\u00df\u00e9\u00c9\u00f1\u03bb\u039b\u65e5")
+    PUNCTUATION = u"-:@#$.\\"
+    SEPARATORS = u" \t,;()\u2014\u00b7"
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def _word(self, max_length=8):
+        rnd = self.random
+        chars = [rnd.choice(self.WORD_CHARS)
+                for i in range(rnd.randint(1, max_length))]
+        # insert punctuation that might or might not be a keyword char
+        if rnd.random() < 0.3:
+            chars.insert(rnd.randint(0, len(chars)),
+                    rnd.choice(self.PUNCTUATION))
+        return u''.join(chars)
+
+    def _line(self, vocabulary):
+        rnd = self.random
+        parts = []
+        for i in range(rnd.randint(0, 8)):
+            parts.append(rnd.choice(vocabulary))
+            parts.append(rnd.choice(self.SEPARATORS) * rnd.randint(1, 2))
+        if parts and rnd.random() < 0.5:
+            parts.pop()
+        return u''.join(parts)
+
+    def _vocabulary(self):
+        # A small vocabulary with shared stems produces many matches
+        stems = [self._word(4) for i in range(self.random.randint(1, 4))]
+        return [self.random.choice(stems) + self._word(5)
+                for i in range(self.random.randint(3, 15))] + stems
+
+    def _keyword_chars_config(self):
+        """
+        Return (keyword_chars_config, iskeyword, resolved_keyword_chars)
+        """
+        rnd = self.random
+        chosen = u''.join(c for c in self.PUNCTUATION if rnd.random() < 0.3)
+        if rnd.random() < 0.2:
+            # Note: localcomplete takes the '@' entry literally
+            iskeyword = u','.join([u'@', u'48-57'] + list(chosen))
+            return (localcomplete.SPECIAL_VALUE_SELECT_VIM_KEYWORDS,
+                    iskeyword,
+                    u'@' + chosen)
+        return (chosen, u'', chosen)
+
+    def _spanning_keyword_base(self, lines, is_keyword_char):
+        """
+        Return a piece of a line from the start of a keyword to one to three
+        characters past its end, or a keyword with a separator appended if
+        the chosen keyword ends the line.
+        """
+        rnd = self.random
+        starts = [(line, index)
+                for line in lines
+                for index in range(len(line))
+                if is_keyword_char(line[index]) and (index == 0
+                        or not is_keyword_char(line[index - 1]))]
+        line, start = rnd.choice(starts)
+        end = start
+        while end < len(line) and is_keyword_char(line[end]):
+            end += 1
+        if end == len(line):
+            return line[start:] + rnd.choice(self.SEPARATORS)
+        return line[start:end + rnd.randint(1, 3)]
+
+    def _keyword_base(self, lines, is_keyword_char, want_other_chars=False):
+        """
+        Derive a keyword base from a random keyword in lines or make one up.
+        With want_other_chars, some keyword bases also contain characters
+        that are no keyword characters.
+        """
+        rnd = self.random
+        keywords = []
+        for line in lines:
+            keywords.extend(naive_tokenize(line, is_keyword_char))
+        if want_other_chars and keywords and rnd.random() < 0.2:
+            base = self._spanning_keyword_base(lines, is_keyword_char)
+        elif keywords and rnd.random() < 0.9:
+            keyword = rnd.choice(keywords)
+            base = keyword[:rnd.randint(1, len(keyword))]
+        else:
+            base = u''.join(rnd.choice(self.WORD_CHARS)
+                    for i in range(rnd.randint(1, 3)))
+        if rnd.random() < 0.3:
+            base = u''.join((c.swapcase() if rnd.random() < 0.5 else c)
+                    for c in base)
+        return base
+
+    def _count(self):
+        return self.random.choice([-1, -1, 0, 1, 2, 3, 5, 100])
+
+    def buffer_scenario(self):
+        rnd = self.random
+        vocabulary = self._vocabulary()
+        buffers_content = []
+        for i in range(rnd.randint(1, 4)):
+            buffers_content.append([self._line(vocabulary)
+                    for j in range(rnd.randint(1, 12))])
+        current_buffer_index = rnd.randrange(len(buffers_content))
+        current_lines = buffers_content[current_buffer_index]
+
+        keyword_chars_config, iskeyword, keyword_chars = (
+                self._keyword_chars_config())
+        is_keyword_char = naive_keyword_predicate(keyword_chars)
+        keyword_base = self._keyword_base(
+                [line for content in buffers_content for line in content],
+                is_keyword_char,
+                want_other_chars=True)
+
+        config = dict(
+                above_count=self._count(),
+                below_count=self._count(),
+                match_result_order=rnd.randint(1, 5),
+                want_ignorecase_local=rnd.randint(0, 1),
+                vim_ignorecase=rnd.randint(0, 1),
+                vim_infercase=rnd.randint(0, 1),
+                keyword_chars=keyword_chars_config.encode('utf-8'),
+                iskeyword=iskeyword.encode('utf-8'),
+                )
+        return dict(
+                buffers_content=[[line.encode('utf-8') for line in content]
+                        for content in buffers_content],
+                current_buffer_index=current_buffer_index,
+                current_line_index=rnd.randrange(len(current_lines)),
+                keyword_base=keyword_base,
+                keyword_chars=keyword_chars,
+                config=config)
+
+    def dictionary_scenario(self):
+        rnd = self.random
+        vocabulary = self._vocabulary()
+        dictionary_lines = [rnd.choice(vocabulary)
+                for i in range(rnd.randint(0, 30))]
+        keyword_base = self._keyword_base(
+                dictionary_lines, naive_keyword_predicate(self.PUNCTUATION))
+        config = dict(
+                want_ignorecase_dict=rnd.randint(0, 1),
+                vim_ignorecase=rnd.randint(0, 1),
+                vim_infercase=rnd.randint(0, 1),
+                )
+        return dict(
+                dictionary_lines=dictionary_lines,
+                keyword_base=keyword_base,
+                config=config)
+
+
+def check_equivalence(testcase,
+        make_scenario,
+        reference,
+        candidate,
+        normalize=None,
+        normalize_reference=None,
+        iterations=None,
+        seed=None):
+    """
+    Compare the results of the reference and candidate engines on random
+    scenarios.  Fail the testcase with a reproducible report on the first
+    difference.
+
+    make_scenario: is called with a ScenarioGenerator and returns a scenario
+    normalize: optionally applied to both results before the comparison
+    normalize_reference: optionally applied to the result of the reference
+    only, for candidates that have to produce it in exactly that order
+    """
+    if seed is None:
+        seed = get_equivalence_seed()
+    if iterations is None:
+        iterations = get_equivalence_iterations()
+    generator = ScenarioGenerator(seed)
+    for iteration in range(iterations):
+        scenario = make_scenario(generator)
+        expected_result = reference(scenario)
+        actual_result = candidate(scenario)
+        if normalize_reference is not None:
+            expected_result = normalize_reference(expected_result)
+        if normalize is not None:
+            expected_result = normalize(expected_result)
+            actual_result = normalize(actual_result)
+        if expected_result != actual_result:
+            testcase.fail("Engines differ (%s=%d, iteration %d)\n"
+                    "scenario: %r\nexpected: %r\nactual:   %r" % (
+                            ENVIRONMENT_SEED, seed, iteration,
+                            scenario, expected_result, actual_result))
+
+
+# Engines running localcomplete
+# -----------------------------
+
+def _merge_config(scenario, config_overrides):
+    config = dict(scenario['config'])
+    config.update(config_overrides)
+    return config
+
+def _capture_produced_matches(function, vim_mock):
+    """
+    Call the completion function with the vim mock and return the list of
+    matches that it wanted to transmit to Vim.
+    """
+    produce_mock = mock.Mock(spec_set=[], return_value=[])
+    with mock.patch.multiple(localcomplete,
+            produce_result_value=produce_mock,
+            vim=vim_mock):
+        function()
+    if produce_mock.call_count != 1:
+        raise LCEquivalenceError("No single result transmitted to Vim")
+    return produce_mock.call_args[0][0]
+
+def _get_buffer_scenario_vim_mock(scenario, config_overrides):
+    vim_buffers = []
+    for number, content in enumerate(scenario['buffers_content']):
+        vim_buffer = VimBufferFake(content)
+        vim_buffer.number = number + 1
+        vim_buffers.append(vim_buffer)
+    config = dict(
+            show_origin=0,
+            origin_note_local='equivalence',
+            origin_note_all_buffers='equivalence',
+            min_len_local=0,
+            min_len_all_buffer=0,
+            encoding='utf-8',
+            keyword_base=scenario['keyword_base'].encode('utf-8'),
+            want_keyword_index=0,
+            index_cache_max_megabytes=1,
+            want_warm_start_cache=0,
+            want_ignore_accents=0,
+            want_line_prefilter=0,
+            match_mode=1,
+            result_limit=0,
+            want_local_ranking=0,
+            want_visible_first=0,
+            want_line_token_cache=0,
+            want_shared_line_token_cache=0,
+            shared_line_token_cache_max_megabytes=1,
+            max_line_scan_bytes=0,
+            skip_buffer_line_bytes=0,
+            want_listed_buffers_only=0,
+            skip_buffer_types='',
+            want_same_filetype_only=0,
+            max_buffer_line_count=0,
+            want_recent_buffers_first=0,
+            want_unloaded_buffers=0,
+            )
+    config.update(_merge_config(scenario, config_overrides))
+    changedticks = dict((vim_buffer.number, next(CHANGEDTICKS))
+            for vim_buffer in vim_buffers)
+    vim_mock = VimMockFactory.get_mock(
+            buffer_content=vim_buffers[scenario['current_buffer_index']],
+            current_line_index=scenario['current_line_index'],
+            changedticks=changedticks,
+            **config)
+    vim_mock.buffers = vim_buffers
+    return vim_mock
+
+def run_local_matches(scenario, **config_overrides):
+    """
+    Run localcomplete.complete_local_matches on a buffer scenario.
+    """
+    vim_mock = _get_buffer_scenario_vim_mock(scenario, config_overrides)
+    return _capture_produced_matches(
+            localcomplete.complete_local_matches, vim_mock)
+
+def run_all_buffer_matches(scenario, **config_overrides):
+    """
+    Run localcomplete.complete_all_buffer_matches on a buffer scenario.
+    """
+    vim_mock = _get_buffer_scenario_vim_mock(scenario, config_overrides)
+    return _capture_produced_matches(
+            localcomplete.complete_all_buffer_matches, vim_mock)
+
+def get_visible_window(scenario):
+    """
+    Return the (first_index, last_index) of the lines that a window around
+    the current line shows.
+    """
+    current = scenario['current_line_index']
+    last = len(scenario['buffers_content'][
+            scenario['current_buffer_index']]) - 1
+    return (max(0, current - 2), min(last, current + 1))
+
+def run_visible_first_local_matches(scenario, **config_overrides):
+    """
+    Run localcomplete.complete_local_matches with the visible lines first.
+    """
+    first_index, last_index = get_visible_window(scenario)
+    return run_local_matches(scenario,
+            want_visible_first=1,
+            window_first_line=first_index + 1,
+            window_last_line=last_index + 1,
+            **config_overrides)
+
+def run_dictionary_matches(scenario, **config_overrides):
+    """
+    Run localcomplete.complete_dictionary_matches on a dictionary scenario.
+    """
+    config = dict(
+            show_origin=0,
+            origin_note_dict='equivalence',
+            encoding='utf-8',
+            dictionary='equivalence-dictionary',
+            result_limit=0,
+            keyword_base=scenario['keyword_base'].encode('utf-8'),
+            )
+    config.update(_merge_config(scenario, config_overrides))
+    vim_mock = VimMockFactory.get_mock(**config)
+    content = os.linesep.join(scenario['dictionary_lines'])
+    with mock.patch.object(localcomplete.codecs, 'open',
+            mock.mock_open(read_data=content)):
+        return _capture_produced_matches(
+                localcomplete.complete_dictionary_matches, vim_mock)
+
+
+# Naive engines
+# -------------
+#
+# Straightforward implementations of the documented behavior without regular
+# expressions.  They keep the harness honest and document what the reference
+# engine is expected to do.
+
+def naive_keyword_predicate(keyword_chars):
+    def is_keyword_char(char):
+        return char.isalnum() or char == u'_' or char in keyword_chars
+    return is_keyword_char
+
+def naive_tokenize(line, is_keyword_char):
+    """
+    Split a unicode line into maximal runs of keyword characters.
+    """
+    tokens = []
+    current = []
+    for char in line:
+        if is_keyword_char(char):
+            current.append(char)
+        elif current:
+            tokens.append(u''.join(current))
+            current = []
+    if current:
+        tokens.append(u''.join(current))
+    return tokens
+
+def naive_starts_with(word, keyword_base, want_ignorecase):
+    prefix = word[:len(keyword_base)]
+    if len(prefix) != len(keyword_base):
+        return False
+    if not want_ignorecase:
+        return prefix == keyword_base
+    return all(a.lower() == b.lower() for a, b in zip(prefix, keyword_base))
+
+def naive_apply_infercase(scenario, matches):
+    config = scenario['config']
+    if not (config['vim_ignorecase'] and config['vim_infercase']):
+        return matches
+    keyword_base = scenario['keyword_base']
+    return [keyword_base + match[len(keyword_base):] for match in matches]
+
+def naive_interleave(first, second):
+    result = []
+    for i in range(max(len(first), len(second))):
+        result.extend(first[i:i + 1])
+        result.extend(second[i:i + 1])
+    return result
+
+def naive_ordered_line_indexes(scenario):
+    config = scenario['config']
+    current = scenario['current_line_index']
+    last = len(scenario['buffers_content'][
+            scenario['current_buffer_index']]) - 1
+    first_index = (0 if config['above_count'] < 0
+            else max(0, current - config['above_count']))
+    last_index = (last if config['below_count'] < 0
+            else min(last, current + config['below_count']))
+    above = list(range(first_index, current))
+    below = list(range(current + 1, last_index + 1))
+    order = config['match_result_order']
+    if order == localcomplete.MATCH_ORDER_CENTERED:
+        return [current] + naive_interleave(above[::-1], below)
+    elif order == localcomplete.MATCH_ORDER_NORMAL:
+        return above + [current] + below
+    elif order == localcomplete.MATCH_ORDER_REVERSE:
+        return below[::-1] + [current] + above[::-1]
+    elif order == localcomplete.MATCH_ORDER_NORMAL_BELOW_FIRST:
+        return [current] + below + above
+    elif order == localcomplete.MATCH_ORDER_REVERSE_ABOVE_FIRST:
+        return [current] + above[::-1] + below[::-1]
+    raise LCEquivalenceError("Unknown order %r" % order)
+
+def naive_find_spanning_matches(line, keyword_base, is_keyword_char,
+        want_ignorecase):
+    """
+    Find a keyword base with other characters than keyword characters at
+    the start of a keyword or after another character, along with the
+    keyword characters that follow it.
+    """
+    matches = []
+    start = 0
+    while start + len(keyword_base) < len(line):
+        end = start + len(keyword_base)
+        if ((start == 0 or not is_keyword_char(line[start - 1]))
+                and naive_starts_with(
+                        line[start:], keyword_base, want_ignorecase)
+                and is_keyword_char(line[end])):
+            while end < len(line) and is_keyword_char(line[end]):
+                end += 1
+            matches.append(line[start:end])
+            start = end
+        else:
+            start += 1
+    return matches
+
+def naive_find_matches_in_lines(scenario, lines, want_ignorecase):
+    is_keyword_char = naive_keyword_predicate(scenario['keyword_chars'])
+    keyword_base = scenario['keyword_base']
+    matches = []
+    if not all(is_keyword_char(char) for char in keyword_base):
+        for line in lines:
+            matches.extend(naive_find_spanning_matches(line.decode('utf-8'),
+                    keyword_base, is_keyword_char, want_ignorecase))
+        return naive_apply_infercase(scenario, matches)
+    for line in lines:
+        for token in naive_tokenize(line.decode('utf-8'), is_keyword_char):
+            if (len(token) > len(keyword_base)
+                    and naive_starts_with(
+                            token, keyword_base, want_ignorecase)):
+                matches.append(token)
+    return naive_apply_infercase(scenario, matches)
+
+def naive_local_matches(scenario):
+    return naive_find_matches_in_lines(scenario,
+            naive_ordered_local_lines(scenario),
+            scenario['config']['want_ignorecase_local'])
+
+def naive_ranked_local_matches(scenario, result_limit=0):
+    """
+    Unique local matches stably sorted by the sum of their occurrence scores.
+    """
+    lines = scenario['buffers_content'][scenario['current_buffer_index']]
+    current = scenario['current_line_index']
+    scores = {}
+    for index in naive_ordered_line_indexes(scenario):
+        for match in naive_find_matches_in_lines(scenario, [lines[index]],
+                scenario['config']['want_ignorecase_local']):
+            scores[match] = scores.get(match, 0) + 1 + (
+                    localcomplete.RANK_PROXIMITY_SCORE
+                    // (1 + abs(index - current)))
+    ranked = sorted(unique_everseen(naive_local_matches(scenario)),
+            key=lambda match : -scores[match])
+    if result_limit:
+        ranked = ranked[:result_limit]
+    return ranked
+
+def naive_visible_first_local_matches(scenario, result_limit=0):
+    """
+    Local matches of the lines in the window and then of the other lines.
+    Reading lines stops when result_limit different matches are found.
+    """
+    lines = scenario['buffers_content'][scenario['current_buffer_index']]
+    first_index, last_index = get_visible_window(scenario)
+    indexes = naive_ordered_line_indexes(scenario)
+    visible = [i for i in indexes if first_index <= i <= last_index]
+    hidden = [i for i in indexes if not first_index <= i <= last_index]
+    raw_scenario = dict(scenario,
+            config=dict(scenario['config'], vim_infercase=0))
+    matches = []
+    for index in visible + hidden:
+        for match in naive_find_matches_in_lines(raw_scenario,
+                [lines[index]],
+                scenario['config']['want_ignorecase_local']):
+            if (result_limit and match not in matches
+                    and len(set(matches)) == result_limit):
+                return naive_apply_infercase(scenario, matches)
+            matches.append(match)
+    return naive_apply_infercase(scenario, matches)
+
+def naive_all_buffer_matches(scenario):
+    return naive_find_matches_in_lines(scenario,
+            naive_ordered_buffer_lines(scenario),
+            scenario['config']['want_ignorecase_local'])
+
+def naive_contains(word, keyword_base, want_ignorecase):
+    for start in range(len(word) - len(keyword_base) + 1):
+        if naive_starts_with(word[start:], keyword_base, want_ignorecase):
+            return True
+    return False
+
+def naive_substring_matcher(scenario):
+    keyword_base = scenario['keyword_base']
+    want_ignorecase = scenario['config']['want_ignorecase_local']
+    def is_match(token):
+        return (len(token) > len(keyword_base)
+                and naive_contains(token, keyword_base, want_ignorecase))
+    return is_match
+
+def naive_abbreviation_matcher(scenario):
+    # The segment definition itself is covered by the keywordindex tests.
+    keyword_base = scenario['keyword_base']
+    abbreviation = keywordindex.fold_case(keyword_base)
+    def is_match(token):
+        return (token != keyword_base
+                and keywordindex.get_initials(token) == abbreviation)
+    return is_match
+
+def naive_match_mode_matches(scenario, lines, make_matcher,
+        prefix_fallback):
+    """
+    Every keyword in the lines that the matcher accepts, without infercase.
+    Keyword bases that are no keywords fall back to prefix matches.
+    """
+    is_keyword_char = naive_keyword_predicate(scenario['keyword_chars'])
+    if not all(is_keyword_char(char) for char in scenario['keyword_base']):
+        return prefix_fallback(scenario)
+    is_match = make_matcher(scenario)
+    matches = []
+    for line in lines:
+        for token in naive_tokenize(line.decode('utf-8'), is_keyword_char):
+            if is_match(token):
+                matches.append(token)
+    return matches
+
+def naive_ordered_buffer_lines(scenario):
+    buffers_content = scenario['buffers_content']
+    current = scenario['current_buffer_index']
+    ordered = [buffers_content[current]] + naive_interleave(
+            buffers_content[:current][::-1], buffers_content[current + 1:])
+    return [line for content in ordered for line in content]
+
+def naive_ordered_local_lines(scenario):
+    lines = scenario['buffers_content'][scenario['current_buffer_index']]
+    return [lines[i] for i in naive_ordered_line_indexes(scenario)]
+
+def naive_all_buffer_substring_matches(scenario):
+    return naive_match_mode_matches(scenario,
+            naive_ordered_buffer_lines(scenario),
+            naive_substring_matcher,
+            naive_all_buffer_matches)
+
+def naive_local_substring_matches(scenario):
+    return naive_match_mode_matches(scenario,
+            naive_ordered_local_lines(scenario),
+            naive_substring_matcher,
+            naive_local_matches)
+
+def naive_all_buffer_abbreviation_matches(scenario):
+    return naive_match_mode_matches(scenario,
+            naive_ordered_buffer_lines(scenario),
+            naive_abbreviation_matcher,
+            naive_all_buffer_matches)
+
+def naive_local_abbreviation_matches(scenario):
+    return naive_match_mode_matches(scenario,
+            naive_ordered_local_lines(scenario),
+            naive_abbreviation_matcher,
+            naive_local_matches)
+
+def naive_is_subsequence(query, text):
+    remaining = iter(text)
+    return all(char in remaining for char in query)
+
+def naive_fuzzy_matches(scenario, lines, prefix_fallback, result_limit):
+    """
+    Unique keywords that contain the characters of the keyword base in order,
+    stably sorted by descending score.  The score definition is covered by
+    the keywordindex tests.
+    """
+    keyword_base = scenario['keyword_base']
+    is_keyword_char = naive_keyword_predicate(scenario['keyword_chars'])
+    if not all(is_keyword_char(char) for char in keyword_base):
+        return prefix_fallback(scenario)
+    if scenario['config']['want_ignorecase_local']:
+        fold = keywordindex.fold_case
+    else:
+        fold = lambda text : text
+    query = fold(keyword_base)
+    scored = []
+    for token in unique_everseen(token for line in lines
+            for token in naive_tokenize(line.decode('utf-8'),
+                    is_keyword_char)):
+        key = fold(token)
+        if len(key) > len(query) and naive_is_subsequence(query, key):
+            scored.append((keywordindex.score_fuzzy_match(query, key, token),
+                    token))
+    scored.sort(key=lambda pair : -pair[0])
+    if result_limit:
+        scored = scored[:result_limit]
+    return [token for score, token in scored]
+
+def naive_all_buffer_fuzzy_matches(scenario, result_limit=0):
+    return naive_fuzzy_matches(scenario,
+            naive_ordered_buffer_lines(scenario),
+            naive_all_buffer_matches,
+            result_limit)
+
+def naive_local_fuzzy_matches(scenario, result_limit=0):
+    return naive_fuzzy_matches(scenario,
+            naive_ordered_local_lines(scenario),
+            naive_local_matches,
+            result_limit)
+
+def naive_dictionary_matches(scenario):
+    keyword_base = scenario['keyword_base']
+    want_ignorecase = scenario['config']['want_ignorecase_dict']
+    is_word_char = naive_keyword_predicate(u'')
+    matches = []
+    for line in scenario['dictionary_lines']:
+        if not naive_starts_with(line, keyword_base, want_ignorecase):
+            continue
+        rest = line[len(keyword_base):]
+        word_chars = naive_tokenize(rest, is_word_char)
+        if word_chars and rest.startswith(word_chars[0]):
+            matches.append(line[:len(keyword_base)] + word_chars[0])
+    return naive_apply_infercase(scenario, matches)
@@ -0,0 +1,345 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import functools
+import mock
+import re
+import unittest
+
+
+# Import Test Utils
+from tests.lc_testutils import fix_vim_module
+
+# Import localcomplete
+fix_vim_module()
+from pylibs import localcomplete
+from pylibs import tokenizer
+from tests import lc_equivalence as eq
+
+
+def _buffer_scenario(generator):
+    return generator.buffer_scenario()
+
+def _dictionary_scenario(generator):
+    return generator.dictionary_scenario()
+
+
+class TestHarness(unittest.TestCase):
+    """
+    Test the harness itself.
+    """
+
+    def test_scenarios_are_reproducible_from_the_seed(self):
+        first = eq.ScenarioGenerator(17)
+        second = eq.ScenarioGenerator(17)
+        for i in range(10):
+            self.assertEqual(first.buffer_scenario(), second.buffer_scenario())
+            self.assertEqual(first.dictionary_scenario(),
+                    second.dictionary_scenario())
+
+    def test_differences_are_reported_with_the_seed(self):
+        def broken_engine(scenario):
+            return eq.naive_local_matches(scenario) + [u'broken']
+
+        with self.assertRaises(AssertionError) as context:
+            eq.check_equivalence(self,
+                    _buffer_scenario,
+                    eq.run_local_matches,
+                    broken_engine,
+                    iterations=1,
+                    seed=4711)
+        self.assertIn("%s=4711" % eq.ENVIRONMENT_SEED, str(context.exception))
+
+    def test_seed_is_fixed_unless_set_in_the_environment(self):
+        with mock.patch.dict('os.environ', clear=True):
+            self.assertEqual(eq.get_equivalence_seed(), eq.DEFAULT_SEED)
+        with mock.patch.dict('os.environ', {eq.ENVIRONMENT_SEED: '17'}):
+            self.assertEqual(eq.get_equivalence_seed(), 17)
+
+    def test_only_the_reference_is_normalized(self):
+        def duplicating_engine(scenario):
+            matches = eq.run_all_buffer_matches(scenario)
+            return matches + matches[:1]
+
+        with self.assertRaises(AssertionError):
+            eq.check_equivalence(self,
+                    _buffer_scenario,
+                    eq.run_all_buffer_matches,
+                    duplicating_engine,
+                    normalize_reference=eq.unique_everseen,
+                    iterations=20)
+
+    def test_unique_everseen_keeps_the_first_occurrence(self):
+        self.assertEqual(eq.unique_everseen(u"b a b c a".split()),
+                u"b a c".split())
+
+
+class TestReferenceMatchesNaiveEngines(unittest.TestCase):
+    """
+    The regex implementation has to agree with the documented behavior.
+    """
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.run_local_matches,
+                eq.naive_local_matches)
+
+    def test_all_buffer_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.run_all_buffer_matches,
+                eq.naive_all_buffer_matches)
+
+    def test_dictionary_matches(self):
+        eq.check_equivalence(self,
+                _dictionary_scenario,
+                eq.run_dictionary_matches,
+                eq.naive_dictionary_matches)
+
+
+class TestKeywordIndexEngine(unittest.TestCase):
+
+    def test_all_buffer_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.run_all_buffer_matches,
+                functools.partial(eq.run_all_buffer_matches,
+                        want_keyword_index=1),
+                normalize_reference=eq.unique_everseen)
+
+
+class TestSubstringEngine(unittest.TestCase):
+
+    def test_all_buffer_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_all_buffer_substring_matches,
+                functools.partial(eq.run_all_buffer_matches,
+                        match_mode=localcomplete.MATCH_MODE_SUBSTRING),
+                normalize_reference=eq.unique_everseen)
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_local_substring_matches,
+                functools.partial(eq.run_local_matches,
+                        match_mode=localcomplete.MATCH_MODE_SUBSTRING))
+
+
+class TestAbbreviationEngine(unittest.TestCase):
+
+    def test_all_buffer_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_all_buffer_abbreviation_matches,
+                functools.partial(eq.run_all_buffer_matches,
+                        match_mode=localcomplete.MATCH_MODE_ABBREVIATION),
+                normalize_reference=eq.unique_everseen)
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_local_abbreviation_matches,
+                functools.partial(eq.run_local_matches,
+                        match_mode=localcomplete.MATCH_MODE_ABBREVIATION))
+
+
+class TestFuzzyEngine(unittest.TestCase):
+
+    def test_all_buffer_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_all_buffer_fuzzy_matches,
+                functools.partial(eq.run_all_buffer_matches,
+                        match_mode=localcomplete.MATCH_MODE_FUZZY),
+                normalize_reference=eq.unique_everseen)
+
+    def test_all_buffer_matches_with_limit(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                functools.partial(eq.naive_all_buffer_fuzzy_matches,
+                        result_limit=3),
+                functools.partial(eq.run_all_buffer_matches,
+                        match_mode=localcomplete.MATCH_MODE_FUZZY,
+                        result_limit=3),
+                normalize_reference=eq.unique_everseen)
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_local_fuzzy_matches,
+                functools.partial(eq.run_local_matches,
+                        match_mode=localcomplete.MATCH_MODE_FUZZY))
+
+    def test_local_matches_with_limit(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                functools.partial(eq.naive_local_fuzzy_matches,
+                        result_limit=3),
+                functools.partial(eq.run_local_matches,
+                        match_mode=localcomplete.MATCH_MODE_FUZZY,
+                        result_limit=3))
+
+
+class TestLocalRankingEngine(unittest.TestCase):
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_ranked_local_matches,
+                functools.partial(eq.run_local_matches,
+                        want_local_ranking=1))
+
+    def test_local_matches_with_limit(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                functools.partial(eq.naive_ranked_local_matches,
+                        result_limit=2),
+                functools.partial(eq.run_local_matches,
+                        want_local_ranking=1,
+                        result_limit=2))
+
+
+class TestVisibleFirstEngine(unittest.TestCase):
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_visible_first_local_matches,
+                eq.run_visible_first_local_matches)
+
+    def test_local_matches_with_limit(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                functools.partial(eq.naive_visible_first_local_matches,
+                        result_limit=2),
+                functools.partial(eq.run_visible_first_local_matches,
+                        result_limit=2))
+
+
+class TestLineTokenCacheEngine(unittest.TestCase):
+    """
+    The scenarios reuse buffer numbers with other lines, so the cached
+    keywords of every line are checked against the searched lines.
+    """
+
+    def test_local_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.run_local_matches,
+                functools.partial(eq.run_local_matches,
+                        want_line_token_cache=1))
+
+    def test_visible_first_local_matches_with_limit(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                functools.partial(eq.naive_visible_first_local_matches,
+                        result_limit=2),
+                functools.partial(eq.run_visible_first_local_matches,
+                        want_line_token_cache=1,
+                        result_limit=2))
+
+
+class TestSharedLineTokenCacheEngine(unittest.TestCase):
+
+    def test_all_buffer_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.run_all_buffer_matches,
+                functools.partial(eq.run_all_buffer_matches,
+                        want_shared_line_token_cache=1))
+
+    def test_local_abbreviation_matches(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                eq.naive_local_abbreviation_matches,
+                functools.partial(eq.run_local_matches,
+                        want_shared_line_token_cache=1,
+                        match_mode=localcomplete.MATCH_MODE_ABBREVIATION))
+
+
+class TestLinePrefilterEngine(unittest.TestCase):
+
+    def test_local_matches(self):
+        # Small blocks, so that the short scenario buffers have several.
+        with mock.patch.object(localcomplete, 'LINE_BLOCK_SIZE', 2):
+            eq.check_equivalence(self,
+                    _buffer_scenario,
+                    eq.run_local_matches,
+                    functools.partial(eq.run_local_matches,
+                            want_line_prefilter=1))
+
+
+class TestLineChunkEngine(unittest.TestCase):
+    """
+    Searching tiny chunks of every line has to find the same matches as
+    searching whole lines.
+    """
+
+    def _helper_check(self, reference, candidate):
+        with mock.patch.object(localcomplete, 'LINE_CHUNK_BYTES', 3):
+            eq.check_equivalence(self,
+                    _buffer_scenario,
+                    reference,
+                    candidate)
+
+    def test_local_matches(self):
+        self._helper_check(eq.naive_local_matches, eq.run_local_matches)
+
+    def test_all_buffer_matches(self):
+        self._helper_check(eq.naive_all_buffer_matches,
+                eq.run_all_buffer_matches)
+
+    def test_ranked_local_matches(self):
+        self._helper_check(eq.naive_ranked_local_matches,
+                functools.partial(eq.run_local_matches,
+                        want_local_ranking=1))
+
+    def test_shared_line_tokens(self):
+        self._helper_check(eq.naive_all_buffer_matches,
+                functools.partial(eq.run_all_buffer_matches,
+                        want_shared_line_token_cache=1))
+
+    def test_line_token_cache(self):
+        self._helper_check(eq.naive_local_matches,
+                functools.partial(eq.run_local_matches,
+                        want_line_token_cache=1))
+
+    def test_local_abbreviation_matches(self):
+        self._helper_check(eq.naive_local_abbreviation_matches,
+                functools.partial(eq.run_local_matches,
+                        match_mode=localcomplete.MATCH_MODE_ABBREVIATION))
+
+
+def _regex_tokens(scenario):
+    needle = re.compile(r'[\w%s]+' % re.escape(scenario['keyword_chars']),
+            re.UNICODE)
+    return [token for content in scenario['buffers_content']
+            for line in content
+            for token in needle.findall(line.decode('utf-8'))]
+
+def _translated_tokens(scenario):
+    return [token for content in scenario['buffers_content']
+            for token in tokenizer.tokenize_lines(
+                    content, 'utf-8', scenario['keyword_chars'])]
+
+
+class TestTokenizerEngine(unittest.TestCase):
+
+    def test_tokens_equal_the_regex_definition(self):
+        eq.check_equivalence(self,
+                _buffer_scenario,
+                _regex_tokens,
+                _translated_tokens)
@@ -56,31 +56,75 @@ class VimMockFactory(object):
         origin_note_local = "g:localcomplete#OriginNoteLocalcomplete",
         origin_note_all_buffers = "g:localcomplete#OriginNoteAllBuffers",
         origin_note_dict = "g:localcomplete#OriginNoteDictionary",
+        origin_note_project = "g:localcomplete#OriginNoteProject",
+        origin_note_tags = "g:localcomplete#OriginNoteTags",
         iskeyword = "&iskeyword",
         encoding = "&encoding",
         keyword_base = "a:keyword_base",
         dictionary = "&dictionary",
         min_len_all_buffer = "localcomplete#getAllBufferMinPrefixLength()",
         min_len_local = "localcomplete#getLocalMinPrefixLength()",
-        keyword_chars = "localcomplete#getAdditionalKeywordChars()"
+        keyword_chars = "localcomplete#getAdditionalKeywordChars()",
+        want_keyword_index = "localcomplete#getWantKeywordIndex()",
+        want_line_prefilter = "localcomplete#getWantLinePrefilter()",
+        match_mode = "localcomplete#getMatchMode()",
+        result_limit = "localcomplete#getResultLimit()",
+        want_local_ranking = "localcomplete#getWantLocalRanking()",
+        want_visible_first = "localcomplete#getWantVisibleFirst()",
+        want_line_token_cache = "localcomplete#getWantLineTokenCache()",
+        want_shared_line_token_cache = (
+                "localcomplete#getWantSharedLineTokenCache()"),
+        shared_line_token_cache_max_megabytes = (
+                "localcomplete#getSharedLineTokenCacheMaxMegabytes()"),
+        window_first_line = "line('w0')",
+        window_last_line = "line('w$')",
+        max_line_scan_bytes = "localcomplete#getMaxLineScanBytes()",
+        skip_buffer_line_bytes = "localcomplete#getSkipBufferLineBytes()",
+        want_listed_buffers_only = (
+                "localcomplete#getWantListedBuffersOnly()"),
+        skip_buffer_types = "localcomplete#getSkipBufferTypes()",
+        want_same_filetype_only = "localcomplete#getWantSameFiletypeOnly()",
+        max_buffer_line_count = "localcomplete#getMaxBufferLineCount()",
+        want_recent_buffers_first = (
+                "localcomplete#getWantRecentBuffersFirst()"),
+        buffer_info = "localcomplete#getBufferInfo()",
+        want_unloaded_buffers = "localcomplete#getWantUnloadedBuffers()",
+        unloaded_buffer_files = "localcomplete#getUnloadedBufferFiles()",
+        min_len_project = "localcomplete#getProjectMinPrefixLength()",
+        min_len_tags = "localcomplete#getTagMinPrefixLength()",
+        tag_files = "tagfiles()",
+        project_root = "localcomplete#getProjectRoot()",
+        cache_directory = "localcomplete#getCacheDirectory()",
+        want_warm_start_cache = "localcomplete#getWantWarmStartCache()",
+        project_index_workers = "localcomplete#getProjectIndexWorkers()",
+        project_max_file_bytes = "localcomplete#getProjectMaxFileBytes()",
+        project_refresh_seconds = (
+                "localcomplete#getProjectRefreshSeconds()"),
+        vim_filetype = "&filetype",
+        index_cache_max_megabytes = (
+                "localcomplete#getIndexCacheMaxMegabytes()"),
+        want_ignore_accents = "localcomplete#getWantIgnoreAccents()"
     )
 
     @classmethod
     def get_mock(cls,
             buffer_content=None,
             current_line_index=None,
+            changedticks=None,
             **config):
         """
         Get a vim mock with the configuration according to the arguments.
 
         buffer_content: A list of lines in the current buffer
         current_line_index: An index into the buffer_content
+        changedticks: A mapping of buffer numbers to their b:changedtick
         **config: Vim configuration.  See ConfigMapping for possible keys and
                 what they mean.
         """
         factory_instance = cls(
                 current_line_index=current_line_index,
                 buffer_content=buffer_content,
+                changedticks=changedticks,
                 **config)
         vim_mock = mock.NonCallableMock(
                 spec_set=['eval', 'command', 'current', 'buffers'])
@@ -100,6 +144,7 @@ class VimMockFactory(object):
     def __init__(self,
             current_line_index=None,
             buffer_content=None,
+            changedticks=None,
             **config):
         """
         Internally used to hold state for closures.  Client code uses the
@@ -107,6 +152,7 @@ class VimMockFactory(object):
         """
         self.current_line_index = current_line_index
         self.buffer_content = buffer_content
+        self.changedticks = changedticks or {}
         self.eval_results = {}
 
         self._prepare_eval_results(config)
@@ -125,13 +171,24 @@ class VimMockFactory(object):
             self.eval_results["line('.')"] = self.current_line_index + 1
         if self.buffer_content is not None:
             self.eval_results["line('$')"] = len(self.buffer_content)
+        for buffer_number, changedtick in self.changedticks.items():
+            self.eval_results["getbufvar(%d, 'changedtick')"
+                    % buffer_number] = changedtick
 
     def eval_mocker(self, expression):
         """
         The side_effect for vim.eval
         """
         try:
-            return "%s" % str(self.eval_results[expression])
+            return self._to_vim_value(self.eval_results[expression])
         except KeyError:
             raise LCTestUtilsError("No eval result recorded for '%s'"
                     % expression)
+
+    def _to_vim_value(self, result):
+        """
+        Like vim.eval, return lists as lists and everything else as strings.
+        """
+        if isinstance(result, (list, tuple)):
+            return [self._to_vim_value(item) for item in result]
+        return "%s" % str(result)
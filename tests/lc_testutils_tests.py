@@ -77,3 +77,13 @@ class TestTests(unittest.TestCase):
         self.assertEqual(
                 vim_mock.eval("localcomplete#getLinesAboveCount()"),
                 "3")
+
+    def test_vim_eval_returns_lists_of_strings(self):
+        vim_mock = VimMockFactory.get_mock(buffer_info=[[3, 1, "help"]])
+        self.assertEqual(vim_mock.eval("localcomplete#getBufferInfo()"),
+                [["3", "1", "help"]])
+
+    def test_changedticks_are_available_per_buffer_number(self):
+        vim_mock = VimMockFactory.get_mock(changedticks={3: 17, 4: 1})
+        self.assertEqual(vim_mock.eval("getbufvar(3, 'changedtick')"), "17")
+        self.assertEqual(vim_mock.eval("getbufvar(4, 'changedtick')"), "1")
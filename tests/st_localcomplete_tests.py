@@ -24,6 +24,7 @@ from tests.lc_testutils import fix_vim_module
 
 # Import localcomplete
 fix_vim_module()
+from pylibs import indexcache
 from pylibs import localcomplete
 
 
@@ -49,6 +50,12 @@ class SystemTestCompleteLocalMatches(unittest.TestCase):
             encoding='utf-8',
             iskeyword='',
             keyword_chars='',
+            want_line_prefilter=0,
+            match_mode=localcomplete.MATCH_MODE_PREFIX,
+            want_local_ranking=0,
+            want_visible_first=0,
+            max_line_scan_bytes=0,
+            want_line_token_cache=0,
             )
 
         vim_mock_args = dict(vim_mock_defaults)
@@ -183,6 +190,7 @@ class SystemTestDictionarySearch(unittest.TestCase):
                 vim_infercase=1,
                 origin_note_dict="undertest",
                 dictionary="nonempty-valid",
+                result_limit=0,
                 )
 
         vim_mock_args = dict(vim_mock_defaults)
@@ -252,6 +260,20 @@ class SystemTestAllBufferSearch(unittest.TestCase):
             min_len_all_buffer=0,
             iskeyword='',
             keyword_chars='',
+            want_keyword_index=0,
+            index_cache_max_megabytes=1,
+            want_warm_start_cache=0,
+            want_ignore_accents=0,
+            want_shared_line_token_cache=0,
+            max_line_scan_bytes=0,
+            skip_buffer_line_bytes=0,
+            want_listed_buffers_only=0,
+            skip_buffer_types='',
+            want_same_filetype_only=0,
+            max_buffer_line_count=0,
+            want_recent_buffers_first=0,
+            want_unloaded_buffers=0,
+            match_mode=localcomplete.MATCH_MODE_PREFIX,
             )
 
         # setup a vim mock with explicit and default arguments
@@ -261,6 +283,8 @@ class SystemTestAllBufferSearch(unittest.TestCase):
 
         vim_mock = VimMockFactory.get_mock(
                 keyword_base=keyword_base,
+                changedticks=dict((index, 1)
+                        for index in range(len(buffers_content))),
                 **vim_mock_args)
 
         # Mock out vim_mock.buffers
@@ -281,6 +305,7 @@ class SystemTestAllBufferSearch(unittest.TestCase):
         # patch and yield
 
         with mock.patch.multiple(__name__ + '.localcomplete',
+                BUFFER_INDEX_CACHE=indexcache.IndexCache(0),
                 vim=vim_mock):
             yield vim_mock
 
@@ -331,3 +356,90 @@ class SystemTestAllBufferSearch(unittest.TestCase):
         result_command = (localcomplete.VIM_COMMAND_BUFFERCOMPLETE
                 % result_value)
         vim_mock.command.assert_called_once_with(result_command)
+
+    def test_search_in_keyword_indexes(self):
+        isolation_args = dict(
+                buffers_content = [
+                        "onea two onez".split(),
+                        "x y onez".split(),
+                        "",
+                        "a oneb c onea".split(),
+                        ],
+                current_buffer_index=1,
+                want_keyword_index=1,
+                keyword_base="one")
+        result_list = u"onez onea oneb".split()
+
+        produce_mock = mock.Mock(spec_set=[], return_value=[])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                produce_result_value=produce_mock):
+            with self._helper_isolate_sut(
+                    **isolation_args) as vim_mock:
+                localcomplete.complete_all_buffer_matches()
+
+        produce_mock.assert_called_once_with(result_list, mock.ANY)
+        self.assertEqual(vim_mock.command.call_count, 1)
+
+    def test_search_for_substrings(self):
+        isolation_args = dict(
+                buffers_content = [
+                        "getBufferRanges ranges".split(),
+                        "x y Ranges".split(),
+                        "",
+                        "setRanges RangesFor".split(),
+                        ],
+                current_buffer_index=1,
+                match_mode=localcomplete.MATCH_MODE_SUBSTRING,
+                keyword_base="Ranges")
+        result_list = u"getBufferRanges setRanges RangesFor".split()
+
+        produce_mock = mock.Mock(spec_set=[], return_value=[])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                produce_result_value=produce_mock):
+            with self._helper_isolate_sut(**isolation_args):
+                localcomplete.complete_all_buffer_matches()
+
+        produce_mock.assert_called_once_with(result_list, mock.ANY)
+
+    def test_search_for_abbreviations(self):
+        isolation_args = dict(
+                buffers_content = [
+                        "getBufferRanges ranges".split(),
+                        "x y gbr".split(),
+                        "",
+                        "get_buffer_ranges gotBigRange".split(),
+                        ],
+                current_buffer_index=1,
+                match_mode=localcomplete.MATCH_MODE_ABBREVIATION,
+                keyword_base="gbr")
+        result_list = u"getBufferRanges get_buffer_ranges gotBigRange".split()
+
+        produce_mock = mock.Mock(spec_set=[], return_value=[])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                produce_result_value=produce_mock):
+            with self._helper_isolate_sut(**isolation_args):
+                localcomplete.complete_all_buffer_matches()
+
+        produce_mock.assert_called_once_with(result_list, mock.ANY)
+
+    def test_fuzzy_search_with_result_limit(self):
+        isolation_args = dict(
+                buffers_content = [
+                        "get_buffer_ranges gabbro".split(),
+                        "x y gbr".split(),
+                        "",
+                        "gbrx garble".split(),
+                        ],
+                current_buffer_index=1,
+                match_mode=localcomplete.MATCH_MODE_FUZZY,
+                result_limit=2,
+                keyword_base="gbr")
+        result_list = u"gbrx get_buffer_ranges".split()
+
+        produce_mock = mock.Mock(spec_set=[], return_value=[])
+        with mock.patch.multiple(__name__ + '.localcomplete',
+                produce_result_value=produce_mock):
+            with self._helper_isolate_sut(**isolation_args):
+                localcomplete.complete_all_buffer_matches()
+
+        produce_mock.assert_called_once_with(result_list, mock.ANY)